@@ -0,0 +1,258 @@
+"""
+amortizacion.py — Cronogramas de pago (sistema francés) y carga en `pagos`
+Novacapital SAS
+
+Arquitectura:
+    calcular_cronogramas  Calcula con NumPy, de una vez, las cuotas de N
+                          préstamos (matriz préstamos × periodo): cuota fija,
+                          capital, interés, saldo y fecha de vencimiento
+    generar_pagos         Lee los préstamos desembolsados sin cuotas, calcula
+                          su cronograma e inserta las filas con INSERT
+                          multi-fila (executemany); lo usa la app al pasar un
+                          préstamo a 'desembolsado'
+    main                  Backfill por lotes de la cartera desembolsada
+
+Uso (backfill):
+    python amortizacion.py
+    python amortizacion.py --lote 5000
+"""
+
+import argparse
+import os
+import time
+from typing import Iterable, List, NamedTuple, Sequence
+
+import MySQLdb
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# valor_pagado arranca en 0 (no NULL): v_cartera_vigente y los KPIs de mora
+# restan valor_cuota - valor_pagado y un NULL anularía la resta.
+INSERT_PAGO = """
+    INSERT INTO pagos
+    (prestamo_id, numero_cuota, fecha_vencimiento, valor_cuota, valor_pagado,
+     capital, interes, saldo_pendiente, estado, dias_mora)
+    VALUES (%s, %s, %s, %s, 0, %s, %s, %s, 'pendiente', 0)
+"""
+
+# Préstamos desembolsados que aún no tienen cronograma. FOR UPDATE bloquea
+# las filas de préstamo: dos desembolsos simultáneos no duplican cuotas.
+SQL_PENDIENTES = """
+    SELECT p.id,
+           COALESCE(p.monto_aprobado, p.monto_solicitado) AS monto,
+           p.tasa_interes, p.plazo_meses,
+           DATE(COALESCE(p.fecha_desembolso, p.fecha_aprobacion, p.fecha_solicitud)) AS fecha
+    FROM prestamos p
+    WHERE p.estado = 'desembolsado'
+      AND p.plazo_meses > 0
+      AND NOT EXISTS (SELECT 1 FROM pagos pg WHERE pg.prestamo_id = p.id)
+"""
+
+
+class Cronogramas(NamedTuple):
+    """Cronogramas de N préstamos en forma de matriz (N × plazo máximo)."""
+    prestamo_ids: np.ndarray    # (N,)
+    plazos: np.ndarray          # (N,)
+    cuota: np.ndarray           # (N,) cuota fija de cada préstamo
+    valor_cuota: np.ndarray     # (N, K)
+    capital: np.ndarray         # (N, K)
+    interes: np.ndarray         # (N, K)
+    saldo: np.ndarray           # (N, K) saldo tras pagar la cuota
+    vencimiento: np.ndarray     # (N, K) datetime64[D]
+    validos: np.ndarray         # (N, K) bool: periodo k existe para el préstamo
+
+    def filas(self) -> List[tuple]:
+        """Filas para INSERT_PAGO (prestamo_id, numero_cuota, fecha, valor, capital, interés, saldo)."""
+        i, k = np.nonzero(self.validos)
+        return list(zip(
+            self.prestamo_ids[i].tolist(),
+            (k + 1).tolist(),
+            self.vencimiento[i, k].tolist(),
+            self.valor_cuota[i, k].tolist(),
+            self.capital[i, k].tolist(),
+            self.interes[i, k].tolist(),
+            self.saldo[i, k].tolist(),
+        ))
+
+
+def _centavos(valores: np.ndarray) -> np.ndarray:
+    return np.round(valores, 2)
+
+
+def cuota_fija(montos, tasas_pct, plazos) -> np.ndarray:
+    """
+    Cuota del sistema francés: P · r / (1 − (1 + r)^−n); P/n si la tasa es 0.
+    Se multiplica P por el factor ya calculado, igual que cotizador.py, para
+    que la cotización y el cronograma den exactamente la misma cuota.
+    """
+    P = np.asarray(montos, dtype=np.float64)
+    r = np.asarray(tasas_pct, dtype=np.float64) / 100.0
+    n = np.asarray(plazos, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cuota = P * np.where(r > 0, r / (1.0 - (1.0 + r) ** -n), 1.0 / n)
+    return _centavos(cuota)
+
+
+def fechas_vencimiento(fechas: np.ndarray, meses: int) -> np.ndarray:
+    """
+    Vencimientos mensuales (N × meses) a partir de cada fecha de desembolso,
+    conservando el día del mes y ajustando al último día en meses más cortos.
+    """
+    dias = fechas.astype('datetime64[D]')
+    mes_base = dias.astype('datetime64[M]')
+    dia = (dias - mes_base.astype('datetime64[D]')).astype(np.int64)[:, None]
+    mes = mes_base[:, None] + np.arange(1, meses + 1)
+    largo_mes = ((mes + 1).astype('datetime64[D]') - mes.astype('datetime64[D]')).astype(np.int64)
+    return mes.astype('datetime64[D]') + np.minimum(dia, largo_mes - 1)
+
+
+def calcular_cronogramas(prestamo_ids: Sequence[int], montos: Sequence[float],
+                         tasas_pct: Sequence[float], plazos: Sequence[int],
+                         fechas_desembolso: Sequence) -> Cronogramas:
+    """
+    Cronograma francés de varios préstamos a la vez. La tasa es mensual en
+    porcentaje (como `prestamos.tasa_interes`).
+
+    Todos los importes quedan en centavos: el saldo de cada periodo se
+    calcula en forma cerrada y se redondea, el capital es la diferencia de
+    saldos (suma exactamente el monto) y el interés completa la cuota fija.
+    La última cuota liquida el saldo restante, por lo que puede diferir en
+    centavos de las demás.
+    """
+    ids = np.asarray(prestamo_ids, dtype=np.int64)
+    P = np.asarray(montos, dtype=np.float64)
+    r = np.asarray(tasas_pct, dtype=np.float64) / 100.0
+    n = np.asarray(plazos, dtype=np.int64)
+    fechas = np.asarray(fechas_desembolso, dtype='datetime64[D]')
+    K = int(n.max()) if n.size else 0
+
+    cuota = cuota_fija(P, tasas_pct, n)
+    k = np.arange(1, K + 1)[None, :]
+    validos = k <= n[:, None]
+
+    # Saldo tras la cuota k: P(1+r)^k − C((1+r)^k − 1)/r  (P − Ck si r = 0)
+    factor = (1.0 + r[:, None]) ** k
+    with np.errstate(divide='ignore', invalid='ignore'):
+        saldo = np.where(r[:, None] > 0,
+                         P[:, None] * factor - cuota[:, None] * (factor - 1.0) / r[:, None],
+                         P[:, None] - cuota[:, None] * k)
+    saldo = np.where(k >= n[:, None], 0.0, np.maximum(_centavos(saldo), 0.0))
+    saldo_anterior = np.concatenate([P[:, None], saldo[:, :-1]], axis=1)
+
+    capital = _centavos(saldo_anterior - saldo)
+    interes = _centavos(cuota[:, None] - capital)
+    ultima = k == n[:, None]
+    interes = np.where(ultima, _centavos(saldo_anterior * r[:, None]), interes)
+    valor_cuota = _centavos(capital + interes)
+
+    ceros = ~validos
+    for matriz in (valor_cuota, capital, interes, saldo):
+        matriz[ceros] = 0.0
+
+    return Cronogramas(ids, n, cuota, valor_cuota, capital, interes, saldo,
+                       fechas_vencimiento(fechas, K), validos)
+
+
+def _tupla(fila) -> tuple:
+    return tuple(fila.values()) if isinstance(fila, dict) else tuple(fila)
+
+
+def cronogramas_de_filas(filas: Iterable) -> Cronogramas:
+    """Cronogramas a partir de filas (id, monto, tasa, plazo, fecha) de SQL_PENDIENTES."""
+    columnas = list(zip(*(_tupla(f) for f in filas))) or [(), (), (), (), ()]
+    ids, montos, tasas, plazos, fechas = columnas
+    return calcular_cronogramas(ids, [float(m) for m in montos], [float(t) for t in tasas],
+                                plazos, [np.datetime64(f, 'D') for f in fechas])
+
+
+def generar_pagos(cursor, prestamo_ids: Sequence[int] = None) -> int:
+    """
+    Inserta el cronograma de los préstamos desembolsados que no lo tienen
+    (todos, o solo `prestamo_ids`). No hace commit: la llamada decide la
+    transacción. Devuelve el número de cuotas insertadas.
+    """
+    query = SQL_PENDIENTES
+    params: List = []
+    if prestamo_ids is not None:
+        if not prestamo_ids:
+            return 0
+        query += f" AND p.id IN ({', '.join(['%s'] * len(prestamo_ids))})"
+        params = list(prestamo_ids)
+    cursor.execute(query + " FOR UPDATE", params)
+    filas = cursor.fetchall()
+    if not filas:
+        return 0
+    pagos = cronogramas_de_filas(filas).filas()
+    cursor.executemany(INSERT_PAGO, pagos)
+    return len(pagos)
+
+
+# ============================================================
+# BACKFILL DE LA CARTERA
+# ============================================================
+
+def conectar_bd():
+    """Conecta a la base de datos"""
+    try:
+        return MySQLdb.connect(
+            host=os.getenv('MYSQL_HOST', 'localhost'),
+            user=os.getenv('MYSQL_USER', 'novacapital'),
+            password=os.getenv('MYSQL_PASSWORD', 'Novacapital123$'),
+            db=os.getenv('MYSQL_DB', 'novacapital_db'),
+            charset='utf8mb4'
+        )
+    except Exception as e:
+        print(f"❌ Error al conectar: {str(e)}")
+        return None
+
+
+def backfill(db, lote: int = 2000) -> int:
+    """
+    Genera los cronogramas faltantes recorriendo los préstamos por id en
+    lotes de `lote`: una consulta, un cálculo vectorizado y un executemany
+    por lote, con commit por lote para que un corte no pierda lo avanzado.
+    """
+    cursor = db.cursor()
+    ultimo_id = 0
+    total = 0
+    while True:
+        cursor.execute(SQL_PENDIENTES + " AND p.id > %s ORDER BY p.id LIMIT %s FOR UPDATE",
+                       (ultimo_id, lote))
+        filas = cursor.fetchall()
+        if not filas:
+            break
+        pagos = cronogramas_de_filas(filas).filas()
+        cursor.executemany(INSERT_PAGO, pagos)
+        db.commit()
+        total += len(pagos)
+        ultimo_id = _tupla(filas[-1])[0]
+        print(f"  · {len(filas)} préstamos (hasta id {ultimo_id}): {len(pagos)} cuotas")
+    cursor.close()
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backfill de cronogramas de pago')
+    parser.add_argument('--lote', type=int, default=2000, help='préstamos por transacción')
+    args = parser.parse_args()
+
+    db = conectar_bd()
+    if not db:
+        return 1
+    try:
+        inicio = time.perf_counter()
+        total = backfill(db, args.lote)
+        print(f"✓ {total} cuotas generadas en {time.perf_counter() - inicio:.1f} s")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error en el backfill: {str(e)}")
+        return 1
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,317 @@
+"""
+analitica_cartera.py — Maduración y morosidad de la cartera en memoria
+Novacapital SAS
+
+Arquitectura:
+    cargar_cartera  Lee prestamos y pagos por bloques (keyset por id) con un
+                    cursor de tuplas y los guarda por columnas en arreglos
+                    NumPy: nada se recorre fila a fila en Python
+    Cartera         Los arreglos: dimensiones por préstamo (desembolso,
+                    monto, asesor, ciudad, entidad) y cuotas (vencimiento,
+                    pago, capital, saldo por cobrar)
+    analizar        Con una fecha de corte calcula días de mora por préstamo,
+                    buckets de maduración, PAR30/PAR90 (global y por mes de
+                    desembolso, asesor, ciudad y entidad empleadora),
+                    roll-rates contra el corte del mes anterior y curvas de
+                    cosecha (vintage) por mes de desembolso
+
+La app guarda el resultado en query_cache con las etiquetas de las tablas
+de origen, así que se recalcula solo cuando cambian los datos (o al día
+siguiente, porque la fecha de corte forma parte de la clave).
+"""
+
+import time
+from datetime import date
+from typing import Any, Dict, List, NamedTuple
+
+import MySQLdb.cursors
+import numpy as np
+
+from amortizacion import fechas_vencimiento
+
+BUCKETS = ('0-30', '31-60', '61-90', '90+')
+LIMITES_BUCKET = (30, 60, 90)        # días de mora: hasta 30, 31-60, 61-90, más de 90
+MAX_MOB = 24                         # meses de las curvas de cosecha
+MAX_GRUPOS = 20                      # filas por dimensión en el reporte
+EPOCA = np.datetime64('1970-01-01', 'D')
+
+SQL_PRESTAMOS = """
+    SELECT p.id,
+           DATEDIFF(COALESCE(p.fecha_desembolso, p.fecha_aprobacion, p.fecha_solicitud), '1970-01-01'),
+           COALESCE(p.monto_aprobado, p.monto_solicitado),
+           COALESCE(u.nombre, 'Sin asignar'),
+           COALESCE(NULLIF(LOWER(TRIM(c.ciudad)), ''), 'sin ciudad'),
+           COALESCE(NULLIF(LOWER(TRIM(c.entidad_empleadora)), ''), 'sin entidad')
+    FROM prestamos p
+    JOIN clientes c ON c.id = p.cliente_id
+    LEFT JOIN asignaciones_asesores aa ON aa.id = (
+        SELECT MAX(x.id) FROM asignaciones_asesores x
+        WHERE x.cliente_id = c.id AND x.activa = TRUE)
+    LEFT JOIN usuarios u ON u.id = aa.asesor_id
+    WHERE p.estado IN ('desembolsado', 'finalizado') AND p.id > %s
+    ORDER BY p.id
+    LIMIT %s
+"""
+
+# Fechas como días desde 1970-01-01 (0 = sin fecha de pago)
+SQL_PAGOS = """
+    SELECT id, prestamo_id,
+           DATEDIFF(fecha_vencimiento, '1970-01-01'),
+           COALESCE(DATEDIFF(fecha_pago, '1970-01-01'), 0),
+           capital,
+           valor_cuota - COALESCE(valor_pagado, 0),
+           estado = 'pagado'
+    FROM pagos
+    WHERE id > %s
+    ORDER BY id
+    LIMIT %s
+"""
+
+
+class Cartera(NamedTuple):
+    """Cartera por columnas. Las cuotas apuntan a su préstamo por posición."""
+    prestamo_id: np.ndarray     # (P,) ordenado
+    desembolso: np.ndarray      # (P,) días desde 1970-01-01
+    monto: np.ndarray           # (P,)
+    dimensiones: Dict[str, np.ndarray]   # asesor / ciudad / entidad: (P,) object
+    cuota_prestamo: np.ndarray  # (C,) índice del préstamo
+    vencimiento: np.ndarray     # (C,) días desde 1970-01-01
+    pagada_el: np.ndarray       # (C,) día del pago; inf si no está pagada
+    capital: np.ndarray         # (C,)
+    por_cobrar: np.ndarray      # (C,) valor_cuota − valor_pagado de las no pagadas
+
+
+def _bloques(conn, sql: str, bloque: int):
+    """Recorre una consulta por keyset sobre la primera columna (id)."""
+    cursor = conn.cursor(MySQLdb.cursors.Cursor)
+    try:
+        ultimo = 0
+        while True:
+            cursor.execute(sql, (ultimo, bloque))
+            filas = cursor.fetchall()
+            if not filas:
+                break
+            yield list(zip(*filas))
+            ultimo = filas[-1][0]
+    finally:
+        cursor.close()
+
+
+def _numeros(columna, dtype=np.float64) -> np.ndarray:
+    return np.fromiter((float(v) for v in columna), dtype=dtype, count=len(columna))
+
+
+def cargar_cartera(conn, bloque: int = 50000) -> Cartera:
+    """Carga préstamos desembolsados/finalizados y sus cuotas en arreglos NumPy."""
+    ids, desembolso, monto = [], [], []
+    asesor, ciudad, entidad = [], [], []
+    for cols in _bloques(conn, SQL_PRESTAMOS, bloque):
+        ids.append(np.asarray(cols[0], dtype=np.int64))
+        desembolso.append(np.asarray(cols[1], dtype=np.int64))
+        monto.append(_numeros(cols[2]))
+        asesor.extend(cols[3])
+        ciudad.extend(cols[4])
+        entidad.extend(cols[5])
+
+    vacio_i = np.zeros(0, dtype=np.int64)
+    prestamo_id = np.concatenate(ids) if ids else vacio_i
+    orden = np.argsort(prestamo_id, kind='stable')   # ya viene por id; por si acaso
+
+    cuota_id, venc, pago, capital, por_cobrar, pagada = [], [], [], [], [], []
+    for cols in _bloques(conn, SQL_PAGOS, bloque):
+        cuota_id.append(np.asarray(cols[1], dtype=np.int64))
+        venc.append(np.asarray(cols[2], dtype=np.int64))
+        pago.append(np.asarray(cols[3], dtype=np.int64))
+        capital.append(_numeros(cols[4]))
+        por_cobrar.append(_numeros(cols[5]))
+        pagada.append(np.asarray(cols[6], dtype=bool))
+
+    def unir(partes, dtype):
+        return np.concatenate(partes) if partes else np.zeros(0, dtype=dtype)
+
+    prestamo_id = prestamo_id[orden]
+    cuota_id = unir(cuota_id, np.int64)
+    # Posición del préstamo de cada cuota; se descartan las de préstamos fuera de cartera
+    if len(prestamo_id):
+        posicion = np.minimum(np.searchsorted(prestamo_id, cuota_id), len(prestamo_id) - 1)
+        de_cartera = prestamo_id[posicion] == cuota_id
+    else:
+        posicion = np.zeros(len(cuota_id), dtype=np.int64)
+        de_cartera = np.zeros(len(cuota_id), dtype=bool)
+
+    venc = unir(venc, np.int64)
+    pago = unir(pago, np.int64)
+    pagada = unir(pagada, bool)
+    # Pagada sin fecha registrada: se toma como pagada a tiempo
+    pagada_el = np.where(pagada, np.where(pago > 0, pago, venc), np.inf)
+
+    return Cartera(
+        prestamo_id=prestamo_id,
+        desembolso=unir(desembolso, np.int64)[orden],
+        monto=unir(monto, np.float64)[orden],
+        dimensiones={
+            'asesor': np.asarray(asesor, dtype=object)[orden],
+            'ciudad': np.asarray(ciudad, dtype=object)[orden],
+            'entidad': np.asarray(entidad, dtype=object)[orden],
+        },
+        cuota_prestamo=posicion[de_cartera],
+        vencimiento=venc[de_cartera],
+        pagada_el=pagada_el[de_cartera],
+        capital=unir(capital, np.float64)[de_cartera],
+        por_cobrar=np.where(pagada, 0.0, unir(por_cobrar, np.float64))[de_cartera],
+    )
+
+
+# ============================================================
+# CÁLCULOS
+# ============================================================
+
+def dias_mora(cartera: Cartera, corte) -> np.ndarray:
+    """
+    Días de mora de cada préstamo en `corte` (días desde 1970-01-01, escalar
+    o uno por cuota): los de su cuota impaga más antigua ya vencida.
+    """
+    impaga = cartera.pagada_el > corte
+    atraso = np.where(impaga & (cartera.vencimiento < corte), corte - cartera.vencimiento, 0)
+    dpd = np.zeros(len(cartera.prestamo_id), dtype=np.int64)
+    np.maximum.at(dpd, cartera.cuota_prestamo, atraso.astype(np.int64))
+    return dpd
+
+
+def saldo_capital(cartera: Cartera, corte: int) -> np.ndarray:
+    """Capital pendiente de cada préstamo en `corte` (capital de las cuotas no pagadas)."""
+    pendiente = np.where(cartera.pagada_el > corte, cartera.capital, 0.0)
+    return np.bincount(cartera.cuota_prestamo, weights=pendiente,
+                       minlength=len(cartera.prestamo_id))
+
+
+def bucket(dpd: np.ndarray) -> np.ndarray:
+    """Índice de BUCKETS para cada préstamo según sus días de mora."""
+    return np.searchsorted(LIMITES_BUCKET, dpd, side='left')
+
+
+def _par(saldo: np.ndarray, dpd: np.ndarray, dias: int) -> float:
+    total = saldo.sum()
+    return round(100 * saldo[dpd > dias].sum() / total, 2) if total else 0.0
+
+
+def _por_grupo(etiquetas: np.ndarray, saldo: np.ndarray, dpd: np.ndarray,
+               activos: np.ndarray) -> List[Dict[str, Any]]:
+    """Saldo, préstamos y PAR30/PAR90 por valor de una dimensión."""
+    if not activos.any():
+        return []
+    grupos, idx = np.unique(etiquetas[activos], return_inverse=True)
+    s, d = saldo[activos], dpd[activos]
+    n = len(grupos)
+    prestamos = np.bincount(idx, minlength=n)
+    total = np.bincount(idx, weights=s, minlength=n)
+    en_30 = np.bincount(idx, weights=np.where(d > 30, s, 0.0), minlength=n)
+    en_90 = np.bincount(idx, weights=np.where(d > 90, s, 0.0), minlength=n)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        par30 = np.where(total > 0, 100 * en_30 / total, 0.0)
+        par90 = np.where(total > 0, 100 * en_90 / total, 0.0)
+    orden = np.argsort(-total, kind='stable')[:MAX_GRUPOS]
+    return [{
+        'grupo': str(grupos[i]),
+        'prestamos': int(prestamos[i]),
+        'saldo': round(float(total[i]), 2),
+        'par30': round(float(par30[i]), 2),
+        'par90': round(float(par90[i]), 2),
+    } for i in orden]
+
+
+def _roll_rates(antes: np.ndarray, ahora: np.ndarray) -> List[List[float]]:
+    """Matriz (en %) de paso entre buckets: fila = bucket anterior, columna = actual."""
+    k = len(BUCKETS)
+    conteo = np.bincount(antes * k + ahora, minlength=k * k).reshape(k, k).astype(np.float64)
+    filas = conteo.sum(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pct = np.where(filas > 0, 100 * conteo / filas, 0.0)
+    return np.round(pct, 1).tolist()
+
+
+def _vintages(cartera: Cartera, hoy: int, max_mob: int) -> List[Dict[str, Any]]:
+    """
+    Curva por mes de desembolso: % del monto desembolsado del mes con más
+    de 30 días de mora en cada mes de maduración (MOB). None donde la
+    cosecha aún no llega a ese MOB.
+    """
+    if not len(cartera.prestamo_id):
+        return []
+    fechas = EPOCA + cartera.desembolso
+    meses = fechas.astype('datetime64[M]')
+    cohortes, idx = np.unique(meses, return_inverse=True)
+    n = len(cohortes)
+    prestamos = np.bincount(idx, minlength=n)
+    monto = np.bincount(idx, weights=cartera.monto, minlength=n)
+    corte_mob = (fechas_vencimiento(fechas, max_mob) - EPOCA).astype(np.int64)   # (P, MOB)
+
+    curvas = np.full((n, max_mob), np.nan)
+    for m in range(max_mob):
+        corte = corte_mob[:, m]
+        observado = corte <= hoy
+        if not observado.any():
+            break
+        dpd = dias_mora(cartera, corte[cartera.cuota_prestamo])
+        en_mora = np.bincount(idx, weights=np.where(observado & (dpd > 30), cartera.monto, 0.0),
+                              minlength=n)
+        base = np.bincount(idx, weights=np.where(observado, cartera.monto, 0.0), minlength=n)
+        # Solo cohortes completas en este MOB (todos sus préstamos observados)
+        completa = base >= monto - 0.005
+        with np.errstate(divide='ignore', invalid='ignore'):
+            curvas[:, m] = np.where(completa & (base > 0), 100 * en_mora / base, np.nan)
+
+    return [{
+        'cohorte': str(cohortes[i]),
+        'prestamos': int(prestamos[i]),
+        'monto': round(float(monto[i]), 2),
+        'curva': [None if np.isnan(v) else round(float(v), 2) for v in curvas[i]],
+    } for i in range(n)]
+
+
+def analizar(cartera: Cartera, corte: date = None, max_mob: int = MAX_MOB) -> Dict[str, Any]:
+    """Reporte de maduración y morosidad de la cartera a la fecha de corte."""
+    inicio = time.perf_counter()
+    corte = corte or date.today()
+    hoy = int((np.datetime64(corte, 'D') - EPOCA).astype(np.int64))
+    mes_antes = int((np.datetime64(corte, 'D') - np.timedelta64(30, 'D') - EPOCA).astype(np.int64))
+
+    dpd = dias_mora(cartera, hoy)
+    saldo = saldo_capital(cartera, hoy)
+    activos = (saldo > 0) & (cartera.desembolso <= hoy)
+    b = bucket(dpd)
+
+    k = len(BUCKETS)
+    prestamos_b = np.bincount(b[activos], minlength=k)
+    saldo_b = np.bincount(b[activos], weights=saldo[activos], minlength=k)
+    saldo_total = float(saldo[activos].sum())
+
+    # Roll-rates: préstamos vivos hace 30 días y su bucket entonces y ahora
+    saldo_antes = saldo_capital(cartera, mes_antes)
+    vivos_antes = (saldo_antes > 0) & (cartera.desembolso <= mes_antes)
+    b_antes = bucket(dias_mora(cartera, mes_antes))
+
+    mes_desembolso = (EPOCA + cartera.desembolso).astype('datetime64[M]').astype(str).astype(object)
+    dimensiones = dict(cartera.dimensiones, mes_desembolso=mes_desembolso)
+
+    return {
+        'corte': corte.isoformat(),
+        'prestamos': int(activos.sum()),
+        'cuotas': int(len(cartera.vencimiento)),
+        'saldo_total': round(saldo_total, 2),
+        'par30': _par(saldo[activos], dpd[activos], 30),
+        'par90': _par(saldo[activos], dpd[activos], 90),
+        'buckets': [{
+            'bucket': nombre,
+            'prestamos': int(prestamos_b[i]),
+            'saldo': round(float(saldo_b[i]), 2),
+            'porcentaje': round(100 * float(saldo_b[i]) / saldo_total, 2) if saldo_total else 0.0,
+        } for i, nombre in enumerate(BUCKETS)],
+        'por_cobrar_vencido': round(float(cartera.por_cobrar[
+            (cartera.vencimiento < hoy) & (cartera.pagada_el > hoy)].sum()), 2),
+        'roll_rates': _roll_rates(b_antes[vivos_antes], b[vivos_antes]),
+        'por_dimension': {nombre: _por_grupo(valores, saldo, dpd, activos)
+                          for nombre, valores in dimensiones.items()},
+        'vintages': _vintages(cartera, hoy, max_mob),
+        'segundos': round(time.perf_counter() - inicio, 3),
+    }
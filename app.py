@@ -1,12 +1,28 @@
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify, flash
-from flask_mysqldb import MySQL
+from flask import Flask, Response, render_template, request, redirect, url_for, session, jsonify, flash
+from amortizacion import generar_pagos
+from analitica_cartera import analizar, cargar_cartera
+from busqueda_clientes import condicion_busqueda
+from cache import query_cache
+from cotizador import (CotizacionInvalida, ParametrosPrestamo, cotizar, cuadricula,
+                        cuota_mensual, montos_en_rango)
+from db_pool import PooledMySQL
+from difusion import GestorDifusion
+from exportaciones import (EXPORTACIONES, FORMATOS, ConexionPrestada, consulta, exportar,
+                           nombre_archivo, seleccionar_columnas)
+from metricas import metricas, init_app as init_metricas
 import bcrypt
+import json
 import os
-from datetime import datetime
+import time
+from datetime import date, datetime
 from functools import wraps
 from dotenv import load_dotenv
 from datetime import datetime
-from logger import auth_logger, loan_logger, admin_logger
+from secuencia_prestamos import siguiente_numero
+from sql_instrumentacion import SQLInstrumentacion
+from logger import JSONLLogger, decode_cursor, encode_cursor, merge_recent, query_logs, auth_logger, loan_logger, admin_logger
+from log_analytics import auth_analytics
+from log_stream import log_follower
 
 # Cargar variables de entorno
 load_dotenv()
@@ -24,12 +40,84 @@ app.config['MYSQL_PASSWORD'] = os.getenv('MYSQL_PASSWORD', 'Novacapital123$')
 app.config['MYSQL_DB'] = os.getenv('MYSQL_DB', 'novacapital_db')
 app.config['MYSQL_CURSORCLASS'] = 'DictCursor'
 
+# Pool de conexiones (se reutilizan entre peticiones en lugar de reconectar)
+app.config['DB_POOL_MIN'] = int(os.getenv('DB_POOL_MIN', 2))
+app.config['DB_POOL_MAX'] = int(os.getenv('DB_POOL_MAX', 10))
+app.config['DB_POOL_MAX_LIFETIME'] = float(os.getenv('DB_POOL_MAX_LIFETIME', 1800))
+app.config['DB_POOL_TIMEOUT'] = float(os.getenv('DB_POOL_TIMEOUT', 5))
+
+# Caché de KPIs y listas de referencia (segundos de vida por entrada)
+query_cache.ttl = float(os.getenv('CACHE_TTL', 60))
+query_cache.max_entries = int(os.getenv('CACHE_MAX_ENTRIES', 256))
+# La analítica de cartera es costosa y se invalida al cambiar préstamos/pagos:
+# el TTL solo acota lo que tardan en verla otros procesos (p. ej. jobs batch)
+ANALITICA_TTL = float(os.getenv('ANALITICA_TTL', 900))
+
 # Configuración de sesiones
 app.config['PERMANENT_SESSION_LIFETIME'] = 3600  # 1 hora
 app.config['SESSION_COOKIE_HTTPONLY'] = True
 
-# Inicializar MySQL
-mysql = MySQL(app)
+# Inicializar MySQL (cada petición toma prestada una conexión del pool)
+mysql = PooledMySQL(app)
+
+# Instrumentación SQL: cabeceras X-DB-Queries / X-DB-Time-Ms, consultas
+# lentas en logs/queries.jsonl y aviso de N+1 por petición
+sql_instrumentacion = SQLInstrumentacion(
+    app,
+    lenta_ms=float(os.getenv('SQL_SLOW_MS', 200)),
+    n_mas_1=int(os.getenv('SQL_N_PLUS_ONE', 10)),
+)
+mysql.envolver = sql_instrumentacion.envolver
+
+# Métricas Prometheus por proceso en /metrics (solo desde METRICS_ALLOW)
+init_metricas(app, metricas)
+METRICS_ALLOW = {ip.strip() for ip in os.getenv('METRICS_ALLOW', '127.0.0.1,::1').split(',') if ip.strip()}
+
+def _metricas_pool():
+    if mysql.pool is None:
+        return []
+    stats = mysql.pool.stats()
+    return [
+        ('db_pool_connections', 'Conexiones del pool por estado', 'gauge', (('state', 'idle'),), stats['idle']),
+        ('db_pool_connections', 'Conexiones del pool por estado', 'gauge', (('state', 'in_use'),), stats['in_use']),
+        ('db_pool_checkouts_total', 'Conexiones prestadas por el pool', 'counter', (), stats['checkouts']),
+        ('db_pool_wait_seconds_total', 'Tiempo total esperando una conexión libre', 'counter', (), stats['wait_seconds_total']),
+        ('db_pool_timeouts_total', 'Esperas de conexión que agotaron el tiempo', 'counter', (), stats['timeouts']),
+    ]
+
+def _metricas_cache():
+    stats = query_cache.stats()
+    return [
+        ('query_cache_requests_total', 'Lecturas de la caché de consultas', 'counter', (('result', 'hit'),), stats['hits']),
+        ('query_cache_requests_total', 'Lecturas de la caché de consultas', 'counter', (('result', 'miss'),), stats['misses']),
+        ('query_cache_requests_total', 'Lecturas de la caché de consultas', 'counter', (('result', 'coalesced'),), stats['coalesced']),
+        ('query_cache_stale_loads_total', 'Cargas descartadas por una invalidación concurrente', 'counter', (), stats['stale_loads']),
+        ('query_cache_entries', 'Entradas en la caché de consultas', 'gauge', (), stats['entries']),
+    ]
+
+metricas.registrar_fuente(_metricas_pool)
+metricas.registrar_fuente(_metricas_cache)
+
+# Difusión de notificaciones por segmento (en segundo plano, por bloques)
+gestor_difusion = GestorDifusion(mysql.get_pool, bloque=int(os.getenv('DIFUSION_BLOQUE', 1000)))
+gestor_difusion.al_terminar = lambda d: admin_logger.log_difusion(
+    d.id, d.enviados, d.total, d.segmento, d.estado, d.admin_id, d.ip
+)
+
+# Escritura de logs JSONL en segundo plano (fuera del hilo de la petición)
+if os.getenv('LOG_BACKGROUND', 'False') == 'True':
+    for _logger in (auth_logger, loan_logger, admin_logger):
+        _logger.start_background(
+            max_queue=int(os.getenv('LOG_QUEUE_MAX', 10000)),
+            batch_size=int(os.getenv('LOG_BATCH_SIZE', 500)),
+            flush_interval=float(os.getenv('LOG_FLUSH_INTERVAL', 0.5)),
+            overflow=os.getenv('LOG_OVERFLOW', 'block'),
+        )
+
+# Rotación de logs en segmentos comprimidos ('gzip' o 'zstd')
+JSONLLogger.COMPRESSION = os.getenv('LOG_COMPRESSION', 'gzip')
+JSONLLogger.ENCODING = os.getenv('LOG_ENCODING', 'jsonl')   # 'msgpack' = segmentos compactos
+JSONLLogger.MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', JSONLLogger.MAX_BYTES))
 
 # ================================
 # DECORADORES
@@ -82,7 +170,8 @@ def crear_usuario(nombres, email, password, tipo_documento, numero_documento,
             cursor.close()
             return None, "El número de documento ya está registrado"
 
-        password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+        with metricas.medir_bcrypt('hashpw'):
+            password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
         password_hash_str = password_hash.decode('utf-8')
 
         query_usuario = """
@@ -107,6 +196,7 @@ def crear_usuario(nombres, email, password, tipo_documento, numero_documento,
 
         mysql.connection.commit()
         cursor.close()
+        query_cache.invalidate('clientes', 'asesores')
         return usuario_id, None
 
     except Exception as e:
@@ -145,7 +235,10 @@ def verificar_credenciales(email, password):
         print(f"DEBUG: Verificando password para {email}")
         print(f"DEBUG: Hash length: {len(password_hash_db)}")
         
-        if bcrypt.checkpw(password.encode('utf-8'), password_hash_db):
+        with metricas.medir_bcrypt('checkpw'):
+            password_ok = bcrypt.checkpw(password.encode('utf-8'), password_hash_db)
+        
+        if password_ok:
             print(f"DEBUG: Password correcta para {email}")
             return usuario, None
         else:
@@ -171,16 +264,24 @@ def obtener_cliente_por_usuario(usuario_id):
         print(f"Error al obtener cliente: {str(e)}")
         return None
 
+def obtener_parametros_prestamo():
+    """Tasa base y límites de monto/plazo de configuracion_sistema (cacheados)"""
+    def consultar():
+        cursor = mysql.connection.cursor()
+        cursor.execute("SELECT clave, valor FROM configuracion_sistema WHERE categoria = 'prestamos'")
+        valores = {fila['clave']: fila['valor'] for fila in cursor.fetchall()}
+        cursor.close()
+        return ParametrosPrestamo.desde_configuracion(valores)
+
+    return query_cache.get_or_load(('parametros_prestamo',), consultar, tags=('configuracion',))
+
 def crear_solicitud_prestamo(cliente_id, datos_solicitud):
     """Crea una nueva solicitud de préstamo"""
     try:
         cursor = mysql.connection.cursor()
         
-        # Generar número de préstamo único
-        year = datetime.now().year
-        cursor.execute("SELECT COUNT(*) as total FROM prestamos WHERE YEAR(fecha_solicitud) = %s", (year,))
-        count = cursor.fetchone()['total']
-        numero_prestamo = f"PRE{year}{(count + 1):05d}"
+        # Generar número de préstamo único (contador atómico por año)
+        numero_prestamo = siguiente_numero(cursor)
         
         # Insertar préstamo
         query = """
@@ -194,7 +295,7 @@ def crear_solicitud_prestamo(cliente_id, datos_solicitud):
             cliente_id,
             numero_prestamo,
             datos_solicitud.get('monto_solicitado'),
-            1.9,  # Tasa por defecto
+            datos_solicitud.get('tasa_interes'),
             datos_solicitud.get('plazo_meses'),
             datos_solicitud.get('cuota_mensual', 0),
             datos_solicitud.get('observaciones', ''),
@@ -227,6 +328,7 @@ def crear_solicitud_prestamo(cliente_id, datos_solicitud):
         
         mysql.connection.commit()
         cursor.close()
+        query_cache.invalidate('prestamos', 'clientes')
         
         return numero_prestamo, prestamo_id, None
         
@@ -234,44 +336,309 @@ def crear_solicitud_prestamo(cliente_id, datos_solicitud):
         mysql.connection.rollback()
         return None, None, f"Error al crear solicitud: {str(e)}"
 
-def obtener_estadisticas_dashboard():
-    """Obtiene las estadísticas para el dashboard"""
+# Filas por sentencia en operaciones masivas (IN (...) y executemany)
+BLOQUE_MASIVO = 1000
+
+def asignar_asesor_a_clientes(asesor_id, cliente_ids):
+    """
+    Asigna `asesor_id` a muchos clientes en una sola transacción: por bloques,
+    desactiva las asignaciones activas con un UPDATE ... IN (...) e inserta
+    las nuevas con executemany. Genera una notificación resumen por asesor
+    afectado (no una por cliente).
+    Devuelve (asignados, {asesor_anterior: clientes}, error).
+    """
     try:
         cursor = mysql.connection.cursor()
-        
-        stats = {}
-        
-        # Total clientes activos
-        cursor.execute("SELECT COUNT(*) as total FROM clientes WHERE estado = 'activo'")
-        stats['clientes_activos'] = cursor.fetchone()['total']
-        
-        # Préstamos activos
-        cursor.execute("SELECT COUNT(*) as total FROM prestamos WHERE estado = 'desembolsado'")
-        stats['prestamos_activos'] = cursor.fetchone()['total']
-        
-        # Cartera vigente
-        cursor.execute("""
-            SELECT COALESCE(SUM(monto_aprobado), 0) as total 
-            FROM prestamos 
-            WHERE estado = 'desembolsado'
-        """)
-        stats['cartera_vigente'] = cursor.fetchone()['total']
-        
-        # Cartera en mora
+
         cursor.execute("""
-            SELECT COALESCE(SUM(valor_cuota - valor_pagado), 0) as total 
-            FROM pagos 
-            WHERE estado IN ('mora', 'vencido')
-        """)
-        stats['cartera_mora'] = cursor.fetchone()['total']
-        
+            SELECT id, nombre FROM usuarios
+            WHERE id = %s AND rol = 'asesor' AND activo = TRUE
+        """, (asesor_id,))
+        asesor = cursor.fetchone()
+        if not asesor:
+            cursor.close()
+            return 0, {}, "El asesor no existe o está inactivo"
+
+        previos = {}
+        asignados = 0
+        for i in range(0, len(cliente_ids), BLOQUE_MASIVO):
+            bloque = cliente_ids[i:i + BLOQUE_MASIVO]
+            marcadores = ', '.join(['%s'] * len(bloque))
+
+            # Asesores actuales del bloque (para las notificaciones y el log)
+            cursor.execute(f"""
+                SELECT c.id, aa.asesor_id
+                FROM clientes c
+                LEFT JOIN asignaciones_asesores aa ON aa.id = (
+                    SELECT MAX(x.id) FROM asignaciones_asesores x
+                    WHERE x.cliente_id = c.id AND x.activa = TRUE)
+                WHERE c.id IN ({marcadores})
+            """, bloque)
+            actuales = {}
+            for fila in cursor.fetchall():
+                actuales.setdefault(fila['id'], fila['asesor_id'])
+            # Los que ya tienen este asesor no cambian
+            mover = [cid for cid, actual in actuales.items() if actual != asesor['id']]
+            if not mover:
+                continue
+            for cid in mover:
+                previos[actuales[cid]] = previos.get(actuales[cid], 0) + 1
+
+            marcadores = ', '.join(['%s'] * len(mover))
+            cursor.execute(f"""
+                UPDATE asignaciones_asesores
+                SET activa = FALSE, fecha_desasignacion = NOW()
+                WHERE activa = TRUE AND cliente_id IN ({marcadores})
+            """, mover)
+            cursor.executemany("""
+                INSERT INTO asignaciones_asesores
+                (cliente_id, asesor_id, activa, notas)
+                VALUES (%s, %s, TRUE, 'Asignación masiva desde panel admin')
+            """, [(cid, asesor['id']) for cid in mover])
+            asignados += len(mover)
+
+        if asignados:
+            notificaciones = [(
+                asesor['id'], 'Nuevos clientes asignados',
+                f'Se te han asignado {asignados} clientes'
+            )]
+            notificaciones += [(
+                anterior, 'Clientes reasignados',
+                f'{n} de tus clientes fueron reasignados a {asesor["nombre"]}'
+            ) for anterior, n in previos.items() if anterior]
+            cursor.executemany("""
+                INSERT INTO notificaciones
+                (usuario_id, titulo, mensaje, tipo)
+                VALUES (%s, %s, %s, 'info')
+            """, notificaciones)
+
+        mysql.connection.commit()
         cursor.close()
-        return stats
+        if asignados:
+            query_cache.invalidate('asesores')
+        return asignados, previos, None
+
+    except Exception as e:
+        mysql.connection.rollback()
+        return 0, {}, f"Error en la asignación masiva: {str(e)}"
+
+# KPIs de clientes, préstamos, mora y asesores en una sola consulta:
+# una agregación condicional por tabla, unidas en una única fila
+SQL_ESTADISTICAS = """
+    SELECT c.total_clientes, c.clientes_activos,
+           p.total_prestamos, p.solicitudes_pendientes, p.en_revision,
+           p.aprobados, p.rechazados, p.prestamos_activos, p.cartera_vigente,
+           m.cartera_mora, u.total_asesores
+    FROM (SELECT COUNT(*) AS total_clientes,
+                 COUNT(CASE WHEN estado = 'activo' THEN 1 END) AS clientes_activos
+          FROM clientes) c
+    CROSS JOIN (SELECT COUNT(*) AS total_prestamos,
+                       COUNT(CASE WHEN estado = 'solicitado' THEN 1 END) AS solicitudes_pendientes,
+                       COUNT(CASE WHEN estado = 'en_analisis' THEN 1 END) AS en_revision,
+                       COUNT(CASE WHEN estado = 'aprobado' THEN 1 END) AS aprobados,
+                       COUNT(CASE WHEN estado = 'rechazado' THEN 1 END) AS rechazados,
+                       COUNT(CASE WHEN estado = 'desembolsado' THEN 1 END) AS prestamos_activos,
+                       COALESCE(SUM(CASE WHEN estado = 'desembolsado' THEN monto_aprobado END), 0) AS cartera_vigente
+                FROM prestamos) p
+    CROSS JOIN (SELECT COALESCE(SUM(valor_cuota - COALESCE(valor_pagado, 0)), 0) AS cartera_mora
+                FROM pagos
+                WHERE estado IN ('mora', 'vencido')) m
+    CROSS JOIN (SELECT COUNT(*) AS total_asesores
+                FROM usuarios
+                WHERE rol = 'asesor' AND activo = TRUE) u
+"""
+
+def _consultar_estadisticas():
+    cursor = mysql.connection.cursor()
+    cursor.execute(SQL_ESTADISTICAS)
+    stats = cursor.fetchone()
+    cursor.close()
+    stats['cartera_vigente'] = float(stats['cartera_vigente'])
+    stats['cartera_mora'] = float(stats['cartera_mora'])
+    return stats
+
+def obtener_estadisticas_dashboard():
+    """Obtiene todas las estadísticas de los dashboards en un solo viaje a la BD (cacheadas)"""
+    try:
+        stats = query_cache.get_or_load(('estadisticas_dashboard',), _consultar_estadisticas,
+                                        tags=('clientes', 'prestamos', 'pagos', 'asesores'))
+        return dict(stats)
         
     except Exception as e:
         print(f"Error al obtener estadísticas: {str(e)}")
         return {}
 
+def obtener_asesores_activos():
+    """Asesores activos con su número de clientes asignados (cacheado)"""
+    def consultar():
+        cursor = mysql.connection.cursor()
+        cursor.execute("""
+            SELECT u.id, u.nombre, u.email,
+                   COUNT(aa.cliente_id) as total_clientes
+            FROM usuarios u
+            LEFT JOIN asignaciones_asesores aa ON aa.asesor_id = u.id AND aa.activa = TRUE
+            WHERE u.rol = 'asesor' AND u.activo = TRUE
+            GROUP BY u.id, u.nombre, u.email
+            ORDER BY u.nombre
+        """)
+        asesores = cursor.fetchall()
+        cursor.close()
+        return asesores
+
+    return query_cache.get_or_load(('asesores_activos',), consultar, tags=('asesores',))
+
+def obtener_analitica_cartera():
+    """Maduración, PAR y cosechas de la cartera a hoy (cacheado hasta el próximo cambio)"""
+    corte = date.today()
+
+    def consultar():
+        return analizar(cargar_cartera(mysql.connection), corte)
+
+    return query_cache.get_or_load(('analitica_cartera', corte.isoformat()), consultar,
+                                   tags=('prestamos', 'pagos', 'clientes', 'asesores'),
+                                   ttl=ANALITICA_TTL)
+
+def filtros_clientes(buscar='', estado='', asesor_filter=''):
+    """
+    Condiciones del listado de clientes (buscar, estado, asesor) sobre los
+    alias `c` (clientes) y `aa` (asignación activa). Devuelve el fragmento
+    para el WHERE, sus parámetros y la búsqueda usada (o None).
+    """
+    condiciones = ''
+    params = []
+
+    # FULLTEXT para nombres/email, prefijo para documentos
+    busqueda = condicion_busqueda(buscar) if buscar.strip() else None
+    if busqueda:
+        condiciones += f" AND {busqueda.condicion}"
+        params.extend(busqueda.params)
+
+    if estado:
+        condiciones += " AND c.estado = %s"
+        params.append(estado)
+
+    if asesor_filter == 'sin_asignar':
+        condiciones += " AND aa.asesor_id IS NULL"
+    elif asesor_filter:
+        condiciones += " AND aa.asesor_id = %s"
+        params.append(asesor_filter)
+
+    return condiciones, params, busqueda
+
+def filtros_solicitudes(estado=''):
+    """Condiciones del listado de solicitudes/préstamos sobre el alias `p`."""
+    if estado:
+        return " AND p.estado = %s", [estado]
+    return '', []
+
+def filtros_pagos(estado='', numero_prestamo='', vence_desde='', vence_hasta=''):
+    """Condiciones del extracto de pagos (alias `pg` y `p`)."""
+    condiciones = ''
+    params = []
+    if estado:
+        condiciones += " AND pg.estado = %s"
+        params.append(estado)
+    if numero_prestamo:
+        condiciones += " AND p.numero_prestamo = %s"
+        params.append(numero_prestamo)
+    if vence_desde:
+        condiciones += " AND pg.fecha_vencimiento >= %s"
+        params.append(vence_desde)
+    if vence_hasta:
+        condiciones += " AND pg.fecha_vencimiento <= %s"
+        params.append(vence_hasta)
+    return condiciones, params
+
+# ================================
+# PAGINACIÓN POR CURSOR (KEYSET)
+# ================================
+TAMANOS_PAGINA = (25, 50, 100, 200)
+
+def codificar_keyset(fecha, registro_id):
+    """
+    Cursor de página legible en la URL: AAAAMMDDHHMMSS-id. Las columnas de
+    fecha de la paginación son NOT NULL (un NULL saldría de todo rango).
+    """
+    return f"{fecha:%Y%m%d%H%M%S}-{registro_id}"
+
+def decodificar_keyset(valor):
+    """Inverso de codificar_keyset; un cursor inválido equivale a la primera página"""
+    try:
+        fecha, registro_id = valor.split('-', 1)
+        return datetime.strptime(fecha, '%Y%m%d%H%M%S'), int(registro_id)
+    except (AttributeError, ValueError):
+        return None
+
+def codificar_relevancia(relevancia, registro_id):
+    """Cursor de una búsqueda ordenada por relevancia: <relevancia exacta>_id"""
+    return f"{float(relevancia)!r}_{registro_id}"
+
+def decodificar_relevancia(valor):
+    """Inverso de codificar_relevancia; un cursor inválido equivale a la primera página"""
+    try:
+        relevancia, registro_id = valor.rsplit('_', 1)
+        return float(relevancia), int(registro_id)
+    except (AttributeError, ValueError):
+        return None
+
+def leer_paginacion():
+    """Lee de la query string el tamaño de página y los cursores despues/antes"""
+    try:
+        tamano = int(request.args.get('por_pagina', 50))
+    except ValueError:
+        tamano = 50
+    if tamano not in TAMANOS_PAGINA:
+        tamano = 50
+    return (tamano,
+            decodificar_keyset(request.args.get('despues')),
+            decodificar_keyset(request.args.get('antes')))
+
+def consulta_keyset(cursor, query, params, col_fecha, col_id, tamano, despues=None, antes=None,
+                    having=False, codificar=codificar_keyset):
+    """
+    Ejecuta `query` (que termina en su WHERE) paginando por (col_fecha, col_id),
+    más recientes primero. Cada página se lee con un rango sobre el índice
+    en lugar de OFFSET, así su costo no crece con el número de filas y las
+    inserciones concurrentes no desplazan las páginas siguientes.
+
+    Con having=True la primera columna es un alias calculado en el SELECT
+    (p. ej. la relevancia de una búsqueda) y el rango va en un HAVING.
+
+    Devuelve (filas, cursor_anterior, cursor_siguiente); un cursor es None
+    cuando no hay más filas en esa dirección.
+    """
+    params = list(params)
+    enlace = ' HAVING' if having else ' AND'
+    if antes:
+        query += f"{enlace} ({col_fecha} > %s OR ({col_fecha} = %s AND {col_id} > %s))"
+        params.extend([antes[0], antes[0], antes[1]])
+        orden = 'ASC'
+    else:
+        if despues:
+            query += f"{enlace} ({col_fecha} < %s OR ({col_fecha} = %s AND {col_id} < %s))"
+            params.extend([despues[0], despues[0], despues[1]])
+        orden = 'DESC'
+    query += f" ORDER BY {col_fecha} {orden}, {col_id} {orden} LIMIT %s"
+    params.append(tamano + 1)
+
+    cursor.execute(query, params)
+    filas = list(cursor.fetchall())
+    hay_mas = len(filas) > tamano
+    filas = filas[:tamano]
+    if antes:
+        filas.reverse()
+    if not filas:
+        return filas, None, None
+
+    clave_fecha = col_fecha.split('.')[-1]
+    clave_id = col_id.split('.')[-1]
+    primera, ultima = filas[0], filas[-1]
+    anterior = (codificar(primera[clave_fecha], primera[clave_id])
+                if (hay_mas if antes else despues) else None)
+    siguiente = (codificar(ultima[clave_fecha], ultima[clave_id])
+                 if (antes or hay_mas) else None)
+    return filas, anterior, siguiente
+
 # ================================
 # RUTAS PRINCIPALES
 # ================================
@@ -470,11 +837,23 @@ def solicitud():
                 flash('Error: No se encontró información del cliente', 'error')
                 return redirect(url_for('solicitud'))
             
+            # La cuota se calcula aquí con la tasa configurada, no se toma del navegador
+            parametros = obtener_parametros_prestamo()
+            try:
+                monto = float(request.form.get('monto_solicitado', ''))
+                plazo = int(request.form.get('plazo_meses', ''))
+                parametros.validar(monto, plazo)
+            except (ValueError, TypeError) as e:
+                mensaje = str(e) if isinstance(e, CotizacionInvalida) else 'Monto o plazo inválido'
+                flash(f'Error: {mensaje}', 'error')
+                return redirect(url_for('solicitud'))
+
             # Recopilar datos del formulario
             datos_solicitud = {
-                'monto_solicitado': request.form.get('monto_solicitado'),
-                'plazo_meses': request.form.get('plazo_meses'),
-                'cuota_mensual': request.form.get('cuota_estimada', '0').replace('$', '').replace(',', ''),
+                'monto_solicitado': monto,
+                'plazo_meses': plazo,
+                'tasa_interes': parametros.tasa,
+                'cuota_mensual': cuota_mensual(monto, plazo, parametros.tasa),
                 'observaciones': request.form.get('observaciones', ''),
                 'cuenta_bancaria': request.form.get('cuenta_bancaria', ''),
                 'banco': request.form.get('banco', ''),
@@ -525,6 +904,19 @@ def solicitud():
     
     return render_template('solicitud.html', user=user_data, cliente=cliente)
 
+@app.route('/api/cotizacion')
+@login_required
+def api_cotizacion():
+    """Cuota, intereses y resumen anual de un préstamo con la tasa configurada"""
+    try:
+        monto = float(request.args.get('monto', ''))
+        plazo = int(request.args.get('plazo', ''))
+        return jsonify(cotizar(monto, plazo, obtener_parametros_prestamo()))
+    except CotizacionInvalida as e:
+        return jsonify({'error': str(e)}), 400
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Monto o plazo inválido'}), 400
+
 @app.route('/solicitud-exitosa')
 @login_required
 def solicitud_exitosa():
@@ -545,30 +937,8 @@ def admin_dashboard():
         cursor = mysql.connection.cursor()
         
         # Estadísticas generales
-        stats = {}
-        
-        # Total clientes
-        cursor.execute("SELECT COUNT(*) as total FROM clientes")
-        stats['total_clientes'] = cursor.fetchone()['total']
-        
-        cursor.execute("SELECT COUNT(*) as total FROM clientes WHERE estado = 'activo'")
-        stats['clientes_activos'] = cursor.fetchone()['total']
-        
-        # Solicitudes pendientes
-        cursor.execute("SELECT COUNT(*) as total FROM prestamos WHERE estado = 'solicitado'")
-        stats['solicitudes_pendientes'] = cursor.fetchone()['total']
-        
-        # Préstamos activos
-        cursor.execute("SELECT COUNT(*) as total FROM prestamos WHERE estado = 'desembolsado'")
-        stats['prestamos_activos'] = cursor.fetchone()['total']
-        
-        # Cartera total
-        cursor.execute("SELECT COALESCE(SUM(monto_aprobado), 0) as total FROM prestamos WHERE estado = 'desembolsado'")
-        stats['cartera_total'] = cursor.fetchone()['total']
-        
-        # Total asesores activos
-        cursor.execute("SELECT COUNT(*) as total FROM usuarios WHERE rol = 'asesor' AND activo = TRUE")
-        stats['total_asesores'] = cursor.fetchone()['total']
+        stats = obtener_estadisticas_dashboard()
+        stats['cartera_total'] = stats.get('cartera_vigente', 0)
         
         # Solicitudes recientes
         cursor.execute("""
@@ -633,67 +1003,67 @@ def admin_clientes():
         estado = request.args.get('estado', '')
         asesor_filter = request.args.get('asesor', '')
         
-        # Query base
-        query = """
-            SELECT c.*,
+        por_pagina, despues, antes = leer_paginacion()
+
+        condiciones, params, busqueda = filtros_clientes(buscar, estado, asesor_filter)
+        relevancia = busqueda.relevancia if busqueda else None
+        columna_relevancia = f" {relevancia} AS relevancia," if relevancia else ""
+
+        # Query base: los conteos de préstamos se calculan solo para las
+        # filas de la página (subconsultas por cliente, sin GROUP BY global).
+        # La asignación activa se une por su id (la más reciente), así un
+        # cliente con más de una asignación activa no aparece repetido.
+        query = f"""
+            SELECT c.*,{columna_relevancia}
                    u.email as usuario_email,
                    a.nombre as asesor_nombre,
-                   COUNT(DISTINCT p.id) as total_prestamos,
-                   SUM(CASE WHEN p.estado = 'solicitado' THEN 1 ELSE 0 END) as solicitudes_pendientes
+                   (SELECT COUNT(*) FROM prestamos p
+                    WHERE p.cliente_id = c.id) as total_prestamos,
+                   (SELECT COUNT(*) FROM prestamos p
+                    WHERE p.cliente_id = c.id AND p.estado = 'solicitado') as solicitudes_pendientes
             FROM clientes c
             LEFT JOIN usuarios u ON c.usuario_id = u.id
-            LEFT JOIN asignaciones_asesores aa ON aa.cliente_id = c.id AND aa.activa = TRUE
+            LEFT JOIN asignaciones_asesores aa ON aa.id = (
+                SELECT MAX(x.id) FROM asignaciones_asesores x
+                WHERE x.cliente_id = c.id AND x.activa = TRUE)
             LEFT JOIN usuarios a ON a.id = aa.asesor_id
-            LEFT JOIN prestamos p ON p.cliente_id = c.id
             WHERE 1=1
         """
 
-        params = []
-
         # Aplicar filtros
-        if buscar:
-            query += """ AND (c.nombres LIKE %s OR c.apellidos LIKE %s
-                           OR c.numero_documento LIKE %s OR c.email LIKE %s)"""
-            like_buscar = f'%{buscar}%'
-            params.extend([like_buscar, like_buscar, like_buscar, like_buscar])
-
-        if estado:
-            query += " AND c.estado = %s"
-            params.append(estado)
-
-        if asesor_filter == 'sin_asignar':
-            query += " AND aa.asesor_id IS NULL"
-        elif asesor_filter:
-            query += " AND aa.asesor_id = %s"
-            params.append(asesor_filter)
-        
-        query += " GROUP BY c.id, u.email, a.nombre ORDER BY c.fecha_registro DESC"
-        
-        cursor.execute(query, params)
-        clientes = cursor.fetchall()
+        query += condiciones
+
+        if relevancia:
+            # Con búsqueda: los más relevantes primero, paginado por (relevancia, id)
+            clientes, pagina_anterior, pagina_siguiente = consulta_keyset(
+                cursor, query, busqueda.params_relevancia + params, 'relevancia', 'c.id',
+                por_pagina, decodificar_relevancia(request.args.get('despues')),
+                decodificar_relevancia(request.args.get('antes')),
+                having=True, codificar=codificar_relevancia
+            )
+        else:
+            clientes, pagina_anterior, pagina_siguiente = consulta_keyset(
+                cursor, query, params, 'c.fecha_registro', 'c.id',
+                por_pagina, despues, antes
+            )
+        cursor.close()
         
-        # Obtener total de clientes
-        cursor.execute("SELECT COUNT(*) as total FROM clientes")
-        total_clientes = cursor.fetchone()['total']
+        # Totales generales (no solo los de la página)
+        kpis = obtener_estadisticas_dashboard()
         
         # Obtener lista de asesores para filtros
-        cursor.execute("""
-            SELECT u.id, u.nombre, u.email,
-                   COUNT(aa.cliente_id) as total_clientes
-            FROM usuarios u
-            LEFT JOIN asignaciones_asesores aa ON aa.asesor_id = u.id AND aa.activa = TRUE
-            WHERE u.rol = 'asesor' AND u.activo = TRUE
-            GROUP BY u.id, u.nombre, u.email
-            ORDER BY u.nombre
-        """)
-        asesores = cursor.fetchall()
-        
-        cursor.close()
+        asesores = obtener_asesores_activos()
         
         return render_template('admin/clientes.html',
                              clientes=clientes,
-                             total_clientes=total_clientes,
-                             asesores=asesores)
+                             total_clientes=kpis.get('total_clientes', 0),
+                             kpis=kpis,
+                             asesores=asesores,
+                             por_pagina=por_pagina,
+                             tamanos_pagina=TAMANOS_PAGINA,
+                             pagina_anterior=pagina_anterior,
+                             pagina_siguiente=pagina_siguiente,
+                             por_relevancia=bool(relevancia))
         
     except Exception as e:
         flash(f'Error al cargar clientes: {str(e)}', 'error')
@@ -746,6 +1116,7 @@ def asignar_asesor():
         
         mysql.connection.commit()
         cursor.close()
+        query_cache.invalidate('asesores')
 
         admin_logger.log_asignar_asesor(
             int(cliente_id), int(asesor_id),
@@ -761,6 +1132,58 @@ def asignar_asesor():
     return redirect(url_for('admin_clientes'))
 
 
+@app.route('/admin/asignar-asesor-masivo', methods=['POST'])
+@admin_required
+def asignar_asesor_masivo():
+    """Asigna un asesor a muchos clientes: los seleccionados o todos los del filtro"""
+    asesor_id = request.form.get('asesor_id')
+    if not asesor_id:
+        flash('Selecciona el asesor destino', 'error')
+        return redirect(url_for('admin_clientes'))
+
+    try:
+        cliente_ids = sorted({int(cid) for cid in request.form.getlist('cliente_ids')
+                              for cid in cid.split(',') if cid.strip()})
+    except ValueError:
+        flash('Lista de clientes inválida', 'error')
+        return redirect(url_for('admin_clientes'))
+
+    filtros = {k: request.form.get(k, '') for k in ('buscar', 'estado', 'asesor')}
+    if request.form.get('modo') == 'filtro':
+        # Todos los clientes que cumplen los filtros del listado
+        condiciones, params, _ = filtros_clientes(filtros['buscar'], filtros['estado'], filtros['asesor'])
+        cursor = mysql.connection.cursor()
+        cursor.execute(f"""
+            SELECT c.id
+            FROM clientes c
+            LEFT JOIN asignaciones_asesores aa ON aa.id = (
+                SELECT MAX(x.id) FROM asignaciones_asesores x
+                WHERE x.cliente_id = c.id AND x.activa = TRUE)
+            WHERE 1=1 {condiciones}
+        """, params)
+        cliente_ids = sorted({fila['id'] for fila in cursor.fetchall()})
+        cursor.close()
+
+    if not cliente_ids:
+        flash('No hay clientes para asignar', 'error')
+        return redirect(url_for('admin_clientes', **filtros))
+
+    asignados, previos, error = asignar_asesor_a_clientes(asesor_id, cliente_ids)
+    if error:
+        flash(error, 'error')
+    else:
+        if asignados:
+            admin_logger.log_asignacion_masiva(
+                int(asesor_id), asignados, previos,
+                session.get('user_id'), request.remote_addr
+            )
+        flash(f'{asignados} clientes asignados correctamente'
+              + (f' ({len(cliente_ids) - asignados} sin cambios)' if asignados < len(cliente_ids) else ''),
+              'success')
+
+    return redirect(url_for('admin_clientes', **filtros))
+
+
 @app.route('/admin/enviar-notificacion', methods=['POST'])
 @admin_required
 def enviar_notificacion():
@@ -802,6 +1225,40 @@ def enviar_notificacion():
     
     return redirect(url_for('admin_clientes'))
 
+@app.route('/admin/notificaciones/difusion', methods=['POST'])
+@admin_required
+def admin_difusion():
+    """Inicia el envío de una notificación a todo un segmento de clientes"""
+    titulo = (request.form.get('titulo') or '').strip()
+    mensaje = (request.form.get('mensaje') or '').strip()
+    tipo = request.form.get('tipo', 'info')
+    if not titulo or not mensaje:
+        return jsonify({'error': 'Título y mensaje son obligatorios'}), 400
+    if tipo not in ('info', 'success', 'warning', 'error'):
+        return jsonify({'error': 'Tipo de notificación inválido'}), 400
+
+    segmento = {k: (request.form.get(k) or '').strip()
+                for k in ('estado', 'ciudad', 'asesor', 'estado_prestamo')}
+    try:
+        difusion = gestor_difusion.iniciar(segmento, titulo, mensaje, tipo,
+                                           session.get('user_id'), request.remote_addr)
+    except Exception as e:
+        return jsonify({'error': f'No se pudo iniciar la difusión: {str(e)}'}), 500
+    return jsonify(difusion.progreso()), 202
+
+
+@app.route('/admin/notificaciones/difusion/<int:difusion_id>')
+@admin_required
+def admin_difusion_progreso(difusion_id):
+    """Progreso de una difusión: total, enviados y estado (desde la BD, en cualquier worker)"""
+    cursor = mysql.connection.cursor()
+    difusion = gestor_difusion.obtener(cursor, difusion_id)
+    cursor.close()
+    if difusion is None:
+        return jsonify({'error': 'Difusión no encontrada'}), 404
+    return jsonify(difusion.progreso())
+
+
 @app.route('/admin/solicitudes')
 @admin_required
 def admin_solicitudes():
@@ -809,21 +1266,16 @@ def admin_solicitudes():
     try:
         cursor = mysql.connection.cursor()
         estado_filter = request.args.get('estado', '')
+        por_pagina, despues, antes = leer_paginacion()
 
         # Stats de cartera
-        stats = {}
-        try:
-            cursor.execute("SELECT COUNT(*) as t FROM prestamos WHERE estado='solicitado'")
-            stats['pendientes'] = cursor.fetchone()['t']
-            cursor.execute("SELECT COUNT(*) as t FROM prestamos WHERE estado='desembolsado'")
-            stats['desembolsados'] = cursor.fetchone()['t']
-            cursor.execute("SELECT COALESCE(SUM(monto_aprobado),0) as t FROM prestamos WHERE estado='desembolsado'")
-            stats['cartera'] = float(cursor.fetchone()['t'])
-            cursor.execute("SELECT COUNT(*) as t FROM prestamos")
-            stats['total'] = cursor.fetchone()['t']
-        except Exception as e:
-            print(f'ERR stats: {e}')
-            stats = {'pendientes':0,'desembolsados':0,'cartera':0.0,'total':0}
+        kpis = obtener_estadisticas_dashboard()
+        stats = {
+            'pendientes': kpis.get('solicitudes_pendientes', 0),
+            'desembolsados': kpis.get('prestamos_activos', 0),
+            'cartera': kpis.get('cartera_vigente', 0.0),
+            'total': kpis.get('total_prestamos', 0),
+        }
 
         query = """
             SELECT p.*,
@@ -835,23 +1287,28 @@ def admin_solicitudes():
                    a.nombre as asesor_nombre
             FROM prestamos p
             JOIN clientes c ON p.cliente_id = c.id
-            LEFT JOIN asignaciones_asesores aa ON aa.cliente_id = c.id AND aa.activa = TRUE
+            LEFT JOIN asignaciones_asesores aa ON aa.id = (
+                SELECT MAX(x.id) FROM asignaciones_asesores x
+                WHERE x.cliente_id = c.id AND x.activa = TRUE)
             LEFT JOIN usuarios a ON a.id = aa.asesor_id
             WHERE 1=1
         """
-        params = []
-        if estado_filter:
-            query += " AND p.estado = %s"
-            params.append(estado_filter)
-        query += " ORDER BY p.fecha_solicitud DESC LIMIT 200"
-        cursor.execute(query, params)
-        solicitudes = cursor.fetchall()
+        condiciones, params = filtros_solicitudes(estado_filter)
+        query += condiciones
+        solicitudes, pagina_anterior, pagina_siguiente = consulta_keyset(
+            cursor, query, params, 'p.fecha_solicitud', 'p.id',
+            por_pagina, despues, antes
+        )
         cursor.close()
 
         return render_template('admin/solicitudes.html',
                                solicitudes=solicitudes,
                                stats=stats,
-                               estado_filter=estado_filter)
+                               estado_filter=estado_filter,
+                               por_pagina=por_pagina,
+                               tamanos_pagina=TAMANOS_PAGINA,
+                               pagina_anterior=pagina_anterior,
+                               pagina_siguiente=pagina_siguiente)
 
     except Exception as e:
         flash(f'Error al cargar solicitudes: {str(e)}', 'error')
@@ -899,8 +1356,15 @@ def admin_cambiar_estado_prestamo():
             f"UPDATE prestamos SET estado = %s{campos_extra} WHERE id = %s",
             params
         )
+
+        # Al desembolsar se genera el cronograma de cuotas en la misma transacción
+        cuotas_generadas = 0
+        if nuevo_estado == 'desembolsado':
+            cuotas_generadas = generar_pagos(cursor, [int(prestamo_id)])
+
         mysql.connection.commit()
         cursor.close()
+        query_cache.invalidate('prestamos', 'pagos')
 
         loan_logger.log_cambio_estado(
             int(prestamo_id), numero_prestamo,
@@ -908,7 +1372,10 @@ def admin_cambiar_estado_prestamo():
             session.get('user_id'), request.remote_addr
         )
 
-        flash('Estado del préstamo actualizado correctamente.', 'success')
+        if cuotas_generadas:
+            flash(f'Estado del préstamo actualizado. Cronograma de {cuotas_generadas} cuotas generado.', 'success')
+        else:
+            flash('Estado del préstamo actualizado correctamente.', 'success')
     except Exception as e:
         flash(f'Error al cambiar el estado: {str(e)}', 'error')
 
@@ -1123,6 +1590,7 @@ def crear_asesor():
         if error:
             flash(error, 'error')
         else:
+            query_cache.invalidate('asesores')
             admin_logger.log_crear_asesor(
                 usuario_id, nombre, email,
                 session.get('user_id'), request.remote_addr
@@ -1158,6 +1626,7 @@ def toggle_asesor(asesor_id):
         
         mysql.connection.commit()
         cursor.close()
+        query_cache.invalidate('asesores')
 
         admin_logger.log_toggle_asesor(
             asesor_id, nuevo_estado,
@@ -1176,8 +1645,13 @@ def toggle_asesor(asesor_id):
 @app.route('/admin/reportes')
 @admin_required
 def admin_reportes():
-    """Página de reportes"""
-    return render_template('admin/reportes.html')
+    """Página de reportes con la analítica de cartera"""
+    try:
+        cartera = obtener_analitica_cartera()
+    except Exception as e:
+        flash(f'Error al calcular la analítica de cartera: {str(e)}', 'error')
+        cartera = None
+    return render_template('admin/reportes.html', cartera=cartera)
 
 @app.route('/admin/prestamos')
 @admin_required
@@ -1201,17 +1675,26 @@ def admin_configuracion():
 def admin_logs():
     """Visor de registros de log JSONL"""
     tipo = request.args.get('tipo', 'todos')
-
-    if tipo == 'auth':
-        entradas = auth_logger.read_last(200)
-    elif tipo == 'loans':
-        entradas = loan_logger.read_last(200)
-    elif tipo == 'admin':
-        entradas = admin_logger.read_last(200)
-    else:
-        todos = auth_logger.read_all() + loan_logger.read_all() + admin_logger.read_all()
+    desde = request.args.get('desde', '')
+    hasta = request.args.get('hasta', '')
+    antes = request.args.get('antes', '')
+    siguiente = None
+
+    loggers = {'auth': auth_logger, 'loans': loan_logger, 'admin': admin_logger}
+
+    if desde or hasta:
+        # Solo se abren los segmentos rotados que se solapan con el rango
+        seleccion = [loggers[tipo]] if tipo in loggers else list(loggers.values())
+        todos = []
+        for lg in seleccion:
+            todos.extend(lg.read_filtered(desde=desde, hasta=hasta, limite=200))
         todos.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
         entradas = todos[:200]
+    elif tipo in loggers:
+        entradas = loggers[tipo].read_last(200)
+    else:
+        # Mezcla perezosa de los tres logs, paginada con el cursor opaco 'antes'
+        entradas, siguiente = merge_recent(loggers, 200, cursor=antes or None)
 
     totales = {
         'auth':  auth_logger.total(),
@@ -1223,10 +1706,232 @@ def admin_logs():
     return render_template('admin/logs.html',
                            entradas=entradas,
                            tipo=tipo,
+                           desde=desde,
+                           hasta=hasta,
+                           antes=antes,
+                           siguiente=siguiente,
                            totales=totales,
                            now=datetime.now())
 
 
+@app.route('/admin/logs/stream')
+@admin_required
+def admin_logs_stream():
+    """
+    Server-Sent Events: envía las líneas nuevas de los logs a medida que se
+    escriben. Cada conexión dura a lo sumo LOG_STREAM_MAX_SEGUNDOS para no
+    retener un worker indefinidamente; EventSource reconecta solo y con
+    Last-Event-ID se reenvía lo escrito durante la reconexión.
+    """
+    tipo = request.args.get('tipo', 'todos')
+    event = request.args.get('event') or None
+    desde = decode_cursor(request.headers.get('Last-Event-ID'))
+    duracion = float(os.getenv('LOG_STREAM_MAX_SEGUNDOS', 300))
+
+    def evento(origen, seq, entrada, posiciones):
+        posiciones[origen] = seq + 1
+        return (f'id: {encode_cursor(posiciones)}\n'
+                f'data: {json.dumps(dict(entrada, log=origen), ensure_ascii=False)}\n\n')
+
+    def generar():
+        # La suscripción se toma al empezar a enviar: si la respuesta nunca
+        # se itera no queda un suscriptor huérfano
+        sub = log_follower.subscribe(None if tipo == 'todos' else tipo, event)
+        try:
+            yield 'retry: 3000\n\n'
+            posiciones = dict(sub.inicio, **{k: v for k, v in desde.items() if k in sub.inicio})
+            for origen, seq, entrada in log_follower.replay(sub, desde):
+                yield evento(origen, seq, entrada, posiciones)
+            posiciones.update(sub.inicio)
+            fin = time.monotonic() + duracion
+            while time.monotonic() < fin:
+                item = sub.get(timeout=min(15, max(fin - time.monotonic(), 0.1)))
+                if item is None:
+                    yield ': ping\n\n'   # mantiene viva la conexión
+                    continue
+                yield evento(*item, posiciones)
+        finally:
+            log_follower.unsubscribe(sub)
+
+    return Response(generar(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/admin/api/logs')
+@admin_required
+def admin_api_logs():
+    """Consulta JSON de los logs con filtros, rango de fechas y cursor opaco"""
+    tipo = request.args.get('tipo', 'todos')
+    loggers = {'auth': auth_logger, 'loans': loan_logger, 'admin': admin_logger}
+    if tipo in loggers:
+        loggers = {tipo: loggers[tipo]}
+    elif tipo != 'todos':
+        return jsonify({'error': f'Tipo de log inválido: {tipo}'}), 400
+
+    filtros = {
+        'event': request.args.get('event'),
+        'ip': request.args.get('ip'),
+        'email': request.args.get('email'),
+    }
+    try:
+        for campo in ('user_id', 'prestamo_id'):
+            valor = request.args.get(campo)
+            filtros[campo] = int(valor) if valor else None
+        limite = min(max(int(request.args.get('limite', 100)), 1), 500)
+    except ValueError:
+        return jsonify({'error': 'Parámetros numéricos inválidos'}), 400
+
+    entradas, siguiente = query_logs(
+        loggers, filtros,
+        desde=request.args.get('desde'),
+        hasta=request.args.get('hasta'),
+        cursor=request.args.get('cursor'),
+        limite=limite,
+    )
+    return jsonify({'entradas': entradas, 'siguiente': siguiente})
+
+
+@app.route('/admin/logs/exportar')
+@admin_required
+def admin_logs_exportar():
+    """Descarga la historia completa de un log en JSONL (sin cargarla en memoria)"""
+    loggers = {'auth': auth_logger, 'loans': loan_logger, 'admin': admin_logger}
+    tipo = request.args.get('tipo', 'auth')
+    if tipo not in loggers:
+        flash('Tipo de log inválido', 'error')
+        return redirect(url_for('admin_logs'))
+    return Response(loggers[tipo].export_jsonl(),
+                    mimetype='application/x-ndjson',
+                    headers={'Content-Disposition': f'attachment; filename={tipo}.jsonl'})
+
+
+@app.route('/admin/api/seguridad/resumen')
+@admin_required
+def admin_api_seguridad_resumen():
+    """Resumen de intentos de login: tasa de fallos por minuto y principales IPs/emails"""
+    try:
+        minutos = min(max(int(request.args.get('minutos', 60)), 1), auth_analytics.retencion_minutos)
+        top = min(max(int(request.args.get('top', 10)), 1), 100)
+    except ValueError:
+        return jsonify({'error': 'Parámetros numéricos inválidos'}), 400
+
+    # Los contadores los actualiza un hilo en segundo plano; aquí solo se leen
+    auth_analytics.start(float(os.getenv('ANALYTICS_INTERVAL', 30)))
+    auth_analytics.refresh()
+    return jsonify(auth_analytics.summary(minutos, top))
+
+
+@app.route('/admin/api/db/pool')
+@admin_required
+def admin_api_db_pool():
+    """Estado del pool de conexiones: tamaño, préstamos y tiempos de espera"""
+    return jsonify(mysql.get_pool().stats())
+
+
+@app.route('/metrics')
+def metrics():
+    """Métricas en formato de texto Prometheus para el scraper local"""
+    if request.remote_addr not in METRICS_ALLOW:
+        return Response('Forbidden\n', status=403, mimetype='text/plain')
+    return Response(metricas.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
+@app.route('/admin/api/reportes/cartera')
+@admin_required
+def admin_api_cartera():
+    """Analítica de cartera completa en JSON (buckets, roll-rates, PAR, cosechas)"""
+    try:
+        return jsonify(obtener_analitica_cartera())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/admin/exportar/<entidad>')
+@admin_required
+def admin_exportar(entidad):
+    """
+    Extracto completo en CSV o XLSX (?formato=) por streaming, con columnas a
+    elección (?columnas=a,b) y los mismos filtros que los listados.
+    """
+    formato = request.args.get('formato', 'csv')
+    if entidad not in EXPORTACIONES or formato not in FORMATOS:
+        return jsonify({'error': 'Extracto o formato no disponible'}), 404
+    try:
+        columnas = seleccionar_columnas(entidad, request.args.get('columnas', ''))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if entidad == 'clientes':
+        condiciones, params, _ = filtros_clientes(
+            request.args.get('buscar', ''), request.args.get('estado', ''),
+            request.args.get('asesor', ''))
+    elif entidad == 'prestamos':
+        condiciones, params = filtros_solicitudes(request.args.get('estado', ''))
+    else:
+        condiciones, params = filtros_pagos(
+            request.args.get('estado', ''), request.args.get('prestamo', ''),
+            request.args.get('vence_desde', ''), request.args.get('vence_hasta', ''))
+
+    admin_logger.log_exportacion(entidad, formato, columnas, request.args.to_dict(),
+                                 session.get('user_id'), request.remote_addr)
+
+    # Conexión propia: la respuesta se genera después de que la vista retorna
+    try:
+        prestada = ConexionPrestada(mysql.get_pool())
+    except Exception as e:
+        return jsonify({'error': f'Base de datos no disponible: {str(e)}'}), 503
+    try:
+        archivo = nombre_archivo(entidad, formato)
+        respuesta = Response(
+            exportar(prestada, consulta(entidad, columnas, condiciones), params,
+                     columnas, formato, hoja=entidad),
+            mimetype=FORMATOS[formato],
+            headers={'Content-Disposition': f'attachment; filename="{archivo}"',
+                     'X-Accel-Buffering': 'no'},
+        )
+        # Se devuelve al cerrar la respuesta aunque el generador no llegue a correr
+        respuesta.call_on_close(prestada.liberar)
+    except Exception:
+        prestada.liberar()
+        raise
+    return respuesta
+
+
+@app.route('/admin/api/cotizador/cuadricula')
+@admin_required
+def admin_api_cuadricula():
+    """
+    Matriz monto × plazo de cuotas para asesores. Montos como lista
+    (?montos=1000000,5000000) o rango (?desde=&hasta=&paso=); plazos
+    opcionales (?plazos=12,24,36).
+    """
+    try:
+        if request.args.get('montos'):
+            montos = [float(m) for m in request.args['montos'].split(',') if m.strip()]
+        else:
+            parametros = obtener_parametros_prestamo()
+            montos = montos_en_rango(
+                float(request.args.get('desde', parametros.monto_minimo)),
+                float(request.args.get('hasta', parametros.monto_maximo)),
+                float(request.args.get('paso', 1000000)),
+            )
+        argumentos = {}
+        if request.args.get('plazos'):
+            argumentos['plazos'] = [int(p) for p in request.args['plazos'].split(',') if p.strip()]
+        return jsonify(cuadricula(montos, obtener_parametros_prestamo(), **argumentos))
+    except CotizacionInvalida as e:
+        return jsonify({'error': str(e)}), 400
+    except ValueError:
+        return jsonify({'error': 'Parámetros inválidos'}), 400
+
+
+@app.route('/admin/api/cache')
+@admin_required
+def admin_api_cache():
+    """Estadísticas de la caché de consultas: aciertos, fallos y entradas"""
+    return jsonify(query_cache.stats())
+
+
 # ================================
 # MANEJADORES DE ERRORES
 # ================================
@@ -0,0 +1,111 @@
+"""
+Benchmark de la búsqueda de clientes - Novacapital
+Compara la búsqueda anterior (LIKE '%término%') con la búsqueda indexada
+(FULLTEXT para nombres/email, prefijo para documentos) sobre la BD real.
+
+Uso:
+    python benchmark_busqueda.py
+    python benchmark_busqueda.py --terminos "juan" "gomez perez" 1023 --repeticiones 20
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+import MySQLdb
+import MySQLdb.cursors
+from dotenv import load_dotenv
+
+from busqueda_clientes import condicion_busqueda
+
+load_dotenv()
+
+TERMINOS = ['maria', 'gomez', 'juan carlos', 'gmail.com', '1023', '80123456']
+
+
+def conectar_bd():
+    """Conecta a la base de datos"""
+    try:
+        return MySQLdb.connect(
+            host=os.getenv('MYSQL_HOST', 'localhost'),
+            user=os.getenv('MYSQL_USER', 'novacapital'),
+            password=os.getenv('MYSQL_PASSWORD', 'Novacapital123$'),
+            db=os.getenv('MYSQL_DB', 'novacapital_db'),
+            charset='utf8mb4',
+            cursorclass=MySQLdb.cursors.DictCursor
+        )
+    except Exception as e:
+        print(f"❌ Error al conectar: {str(e)}")
+        return None
+
+
+def construir_consulta(termino, modo, limite):
+    """Misma consulta de filtrado que admin_clientes, solo con los ids"""
+    busqueda = condicion_busqueda(termino, modo)
+    query = f"SELECT c.id FROM clientes c WHERE {busqueda.condicion}"
+    params = list(busqueda.params)
+    if busqueda.relevancia:
+        query += f" ORDER BY {busqueda.relevancia} DESC, c.fecha_registro DESC, c.id DESC"
+        params += busqueda.params_relevancia
+    else:
+        query += " ORDER BY c.fecha_registro DESC, c.id DESC"
+    query += " LIMIT %s"
+    params.append(limite)
+    return busqueda.modo, query, params
+
+
+def medir(cursor, query, params, repeticiones):
+    """Mediana en milisegundos de `repeticiones` ejecuciones y filas devueltas"""
+    tiempos = []
+    filas = 0
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        cursor.execute(query, params)
+        filas = len(cursor.fetchall())
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos), filas
+
+
+def plan(cursor, query, params):
+    """Tipo de acceso y filas estimadas según EXPLAIN"""
+    cursor.execute("EXPLAIN " + query, params)
+    fila = cursor.fetchone()
+    return f"{fila.get('type')}/{fila.get('key') or '-'} ~{fila.get('rows')} filas"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark LIKE vs FULLTEXT en la búsqueda de clientes')
+    parser.add_argument('--terminos', nargs='+', default=TERMINOS)
+    parser.add_argument('--repeticiones', type=int, default=10)
+    parser.add_argument('--limite', type=int, default=50, help='tamaño de página')
+    args = parser.parse_args()
+
+    db = conectar_bd()
+    if not db:
+        return 1
+    try:
+        cursor = db.cursor()
+        cursor.execute("SELECT COUNT(*) AS total FROM clientes")
+        print(f"📊 {cursor.fetchone()['total']} clientes, {args.repeticiones} repeticiones por consulta\n")
+        print(f"{'término':<20} {'modo':<10} {'ms (mediana)':>12} {'filas':>6}  plan")
+        for termino in args.terminos:
+            resultados = {}
+            for modo in ('like', 'fulltext'):
+                nombre, query, params = construir_consulta(termino, modo, args.limite)
+                ms, filas = medir(cursor, query, params, args.repeticiones)
+                resultados[modo] = ms
+                print(f"{termino:<20} {nombre:<10} {ms:>12.2f} {filas:>6}  {plan(cursor, query, params)}")
+            if resultados['fulltext'] > 0:
+                print(f"{'':<20} {'→ mejora':<10} {resultados['like'] / resultados['fulltext']:>11.1f}x\n")
+        cursor.close()
+    except Exception as e:
+        print(f"❌ Error en el benchmark: {str(e)}")
+        return 1
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,79 @@
+"""
+busqueda_clientes.py — Búsqueda de clientes por nombre, email o documento
+Novacapital SAS
+
+Arquitectura:
+    condicion_busqueda  Traduce el término de `buscar` a una condición SQL
+                        que usa índices:
+                          - documento numérico -> prefijo sobre el índice
+                            único de numero_documento (exactos primero)
+                          - nombres / email    -> MATCH ... AGAINST sobre
+                            idx_fulltext_clientes, ordenado por relevancia
+                          - modo 'like'        -> búsqueda anterior con
+                            LIKE '%término%' (referencia para el benchmark)
+"""
+
+import re
+from typing import List, NamedTuple, Optional
+
+# innodb_ft_min_token_size por defecto: palabras más cortas no se indexan
+MIN_TOKEN = 3
+
+_PALABRA = re.compile(r'\w+', re.UNICODE)
+_DOCUMENTO = re.compile(r'^[\d.\s-]+$')
+
+COLUMNAS_FULLTEXT = 'c.nombres, c.apellidos, c.email'
+
+
+class Busqueda(NamedTuple):
+    condicion: str                  # fragmento para el WHERE
+    params: List[str]
+    relevancia: Optional[str]       # expresión para ORDER BY ... DESC
+    params_relevancia: List[str]
+    modo: str
+
+
+def es_documento(termino: str) -> bool:
+    """True si el término es un número de documento (admite puntos y guiones)."""
+    return bool(_DOCUMENTO.match(termino)) and any(ch.isdigit() for ch in termino)
+
+
+def expresion_booleana(termino: str) -> str:
+    """
+    Expresión IN BOOLEAN MODE: cada palabra es obligatoria y se busca por
+    prefijo ('+juan* +gomez*'). Los operadores del término se descartan al
+    partirlo en palabras, y las palabras bajo MIN_TOKEN se omiten porque el
+    índice no las contiene.
+    """
+    palabras = [p for p in _PALABRA.findall(termino.lower()) if len(p) >= MIN_TOKEN]
+    return ' '.join(f'+{p}*' for p in palabras)
+
+
+def _busqueda_like(termino: str) -> Busqueda:
+    like = f'%{termino}%'
+    return Busqueda(
+        """(c.nombres LIKE %s OR c.apellidos LIKE %s
+            OR c.numero_documento LIKE %s OR c.email LIKE %s)""",
+        [like, like, like, like], None, [], 'like'
+    )
+
+
+def condicion_busqueda(termino: str, modo: str = 'fulltext') -> Busqueda:
+    """Condición de búsqueda de clientes para el término dado."""
+    termino = termino.strip()
+    if modo == 'like':
+        return _busqueda_like(termino)
+
+    if es_documento(termino):
+        digitos = re.sub(r'\D', '', termino)
+        return Busqueda(
+            'c.numero_documento LIKE %s', [digitos + '%'],
+            '(c.numero_documento = %s)', [digitos], 'documento'
+        )
+
+    expresion = expresion_booleana(termino)
+    if not expresion:
+        # Solo palabras cortas: el índice FULLTEXT no puede responder
+        return _busqueda_like(termino)
+    match = f'MATCH({COLUMNAS_FULLTEXT}) AGAINST (%s IN BOOLEAN MODE)'
+    return Busqueda(match, [expresion], match, [expresion], 'fulltext')
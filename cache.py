@@ -0,0 +1,141 @@
+"""
+cache.py — Caché en proceso para consultas de lectura frecuente
+Novacapital SAS
+
+Arquitectura:
+    QueryCache  Caché TTL + LRU indexada por (consulta, parámetros). Cada
+                entrada lleva etiquetas con las tablas de las que depende,
+                y las rutas que escriben invalidan por etiqueta. Una sola
+                carga en vuelo por clave (los demás hilos la esperan).
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Tuple
+
+
+class _Carga:
+    """Carga en curso de una clave: los hilos que llegan después la esperan."""
+
+    def __init__(self, version: Tuple[int, ...]):
+        self.version = version
+        self.listo = threading.Event()
+        self.ok = False
+        self.valor: Any = None
+
+
+class QueryCache:
+    """
+    Caché TTL + LRU con invalidación explícita por etiquetas.
+
+    - Cada entrada expira a los `ttl` segundos, lo que acota cuánto puede
+      quedar desactualizado otro worker que no vio la invalidación.
+    - Con más de `max_entries` entradas se descarta la menos usada.
+    - invalidate('prestamos') borra toda entrada etiquetada con 'prestamos'.
+    - Si el cargador lanza una excepción no se guarda nada.
+    - Cada etiqueta tiene un contador de generación que invalidate()
+      incrementa: si cambió mientras el cargador corría, el valor se
+      devuelve pero no se guarda (podría ser anterior a la escritura).
+    - Single-flight: con varias peticiones sin acierto para la misma clave
+      solo una ejecuta el cargador y las demás esperan su resultado.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # clave -> (expira_en, etiquetas, valor), en orden de uso
+        self._data: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._generaciones: Dict[str, int] = {}   # etiqueta -> generación
+        self._generacion = 0                      # invalidate() sin etiquetas
+        self._cargas: Dict[Hashable, _Carga] = {}
+        self.metrics = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0,
+                        'invalidations': 0, 'coalesced': 0, 'stale_loads': 0}
+
+    def _version(self, tags: Tuple[str, ...]) -> Tuple[int, ...]:
+        return (self._generacion,) + tuple(self._generaciones.get(t, 0) for t in tags)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any],
+                    tags: Iterable[str] = (), ttl: float = None) -> Any:
+        """Devuelve el valor cacheado de `key` o lo calcula con `loader()`."""
+        tags = tuple(tags)
+        while True:
+            ahora = time.monotonic()
+            with self._lock:
+                item = self._data.get(key)
+                if item is not None:
+                    if item[0] > ahora:
+                        self._data.move_to_end(key)
+                        self.metrics['hits'] += 1
+                        return item[2]
+                    del self._data[key]
+                    self.metrics['expired'] += 1
+                version = self._version(tags)
+                carga = self._cargas.get(key)
+                if carga is None or carga.version != version:
+                    # Sin carga en vuelo, o la que hay empezó antes de una invalidación
+                    carga = self._cargas[key] = _Carga(version)
+                    propia = True
+                    self.metrics['misses'] += 1
+                else:
+                    propia = False
+                    self.metrics['coalesced'] += 1
+
+            if not propia:
+                carga.listo.wait()
+                if carga.ok:
+                    return carga.valor
+                continue   # el cargador falló: este hilo lo reintenta
+
+            try:
+                # fuera del candado: la consulta no bloquea a otros hilos
+                carga.valor = loader()
+                carga.ok = True
+            finally:
+                with self._lock:
+                    if self._cargas.get(key) is carga:
+                        del self._cargas[key]
+                    if carga.ok:
+                        if self._version(tags) == version:
+                            expira = time.monotonic() + (self.ttl if ttl is None else ttl)
+                            self._data[key] = (expira, frozenset(tags), carga.valor)
+                            self._data.move_to_end(key)
+                            while len(self._data) > self.max_entries:
+                                self._data.popitem(last=False)
+                                self.metrics['evictions'] += 1
+                        else:
+                            self.metrics['stale_loads'] += 1
+                carga.listo.set()
+            return carga.valor
+
+    def invalidate(self, *tags: str) -> int:
+        """Elimina las entradas con alguna de las etiquetas (todas si no se indica)."""
+        with self._lock:
+            if tags:
+                for t in tags:
+                    self._generaciones[t] = self._generaciones.get(t, 0) + 1
+                claves = [k for k, (_, etiquetas, _) in self._data.items()
+                          if etiquetas.intersection(tags)]
+            else:
+                self._generacion += 1
+                claves = list(self._data)
+            for k in claves:
+                del self._data[k]
+            self.metrics['invalidations'] += len(claves)
+            return len(claves)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.metrics)
+            consultas = stats['hits'] + stats['misses']
+            stats.update(entries=len(self._data), max_entries=self.max_entries, ttl=self.ttl,
+                         hit_ratio=round(stats['hits'] / consultas, 4) if consultas else 0.0)
+        return stats
+
+
+# ============================================================
+# INSTANCIA GLOBAL
+# ============================================================
+
+query_cache = QueryCache()
@@ -0,0 +1,149 @@
+"""
+cotizador.py — Cotización de préstamos en el servidor
+Novacapital SAS
+
+Arquitectura:
+    ParametrosPrestamo  Tasa mensual y límites de monto/plazo leídos de
+                        configuracion_sistema (la app los cachea)
+    factor_anualidad    r / (1 − (1 + r)^−n) memoizado por (tasa, plazo): la
+                        cuota de cualquier monto es monto × factor
+    cotizar             Cuota, intereses totales y resumen anual de un préstamo
+                        (el mismo cronograma que se genera al desembolsar)
+    cuadricula          Matriz monto × plazo de cuotas e intereses en una sola
+                        operación vectorizada, para los asesores
+"""
+
+from datetime import date
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Sequence
+
+import numpy as np
+
+from amortizacion import calcular_cronogramas
+
+PLAZOS_OFRECIDOS = (6, 12, 18, 24, 36, 48, 60, 72)
+MAX_MONTOS_CUADRICULA = 200
+
+
+class CotizacionInvalida(ValueError):
+    """Monto o plazo fuera de los límites configurados."""
+
+
+class ParametrosPrestamo(NamedTuple):
+    tasa: float             # % mensual
+    monto_minimo: float
+    monto_maximo: float
+    plazo_minimo: int
+    plazo_maximo: int
+
+    @classmethod
+    def desde_configuracion(cls, valores: Mapping[str, Any]) -> 'ParametrosPrestamo':
+        """A partir de {clave: valor} de configuracion_sistema (con valores por defecto)."""
+        def numero(clave, defecto):
+            try:
+                return float(valores.get(clave, defecto))
+            except (TypeError, ValueError):
+                return defecto
+        return cls(
+            tasa=numero('tasa_interes_base', 1.9),
+            monto_minimo=numero('monto_minimo', 1000000),
+            monto_maximo=numero('monto_maximo', 50000000),
+            plazo_minimo=int(numero('plazo_minimo', 6)),
+            plazo_maximo=int(numero('plazo_maximo', 72)),
+        )
+
+    def validar(self, monto: float, plazo: int) -> None:
+        if not self.monto_minimo <= monto <= self.monto_maximo:
+            raise CotizacionInvalida(
+                f'El monto debe estar entre ${self.monto_minimo:,.0f} y ${self.monto_maximo:,.0f}')
+        if not self.plazo_minimo <= plazo <= self.plazo_maximo:
+            raise CotizacionInvalida(
+                f'El plazo debe estar entre {self.plazo_minimo} y {self.plazo_maximo} meses')
+
+
+@lru_cache(maxsize=4096)
+def factor_anualidad(tasa_pct: float, plazo: int) -> float:
+    """Cuota por peso prestado con tasa mensual `tasa_pct` (%) a `plazo` meses."""
+    r = tasa_pct / 100.0
+    if r == 0:
+        return 1.0 / plazo
+    return r / (1.0 - (1.0 + r) ** -plazo)
+
+
+def cuota_mensual(monto: float, plazo: int, tasa_pct: float) -> float:
+    """Cuota fija en centavos (igual a la del cronograma de amortizacion.py)."""
+    return round(monto * factor_anualidad(tasa_pct, plazo), 2)
+
+
+def cotizar(monto: float, plazo: int, parametros: ParametrosPrestamo,
+            fecha: date = None) -> Dict[str, Any]:
+    """Cotización completa de un préstamo; lanza CotizacionInvalida fuera de límites."""
+    parametros.validar(monto, plazo)
+    fecha = fecha or date.today()
+    c = calcular_cronogramas([0], [monto], [parametros.tasa], [plazo], [fecha])
+    capital, interes = c.capital[0, :plazo], c.interes[0, :plazo]
+
+    # Resumen por año del crédito (bloques de 12 cuotas)
+    anio = np.arange(plazo) // 12
+    capital_anual = np.bincount(anio, weights=capital)
+    interes_anual = np.bincount(anio, weights=interes)
+    saldo_anual = c.saldo[0, np.minimum((np.arange(len(capital_anual)) + 1) * 12, plazo) - 1]
+
+    return {
+        'monto': round(float(monto), 2),
+        'plazo_meses': plazo,
+        'tasa_mensual': parametros.tasa,
+        'cuota': float(c.cuota[0]),
+        'ultima_cuota': float(c.valor_cuota[0, plazo - 1]),
+        'total_intereses': round(float(interes.sum()), 2),
+        'total_pagar': round(float(c.valor_cuota[0, :plazo].sum()), 2),
+        'primer_vencimiento': c.vencimiento[0, 0].item().isoformat(),
+        'resumen_anual': [{
+            'anio': i + 1,
+            'capital': round(float(capital_anual[i]), 2),
+            'interes': round(float(interes_anual[i]), 2),
+            'saldo': round(float(saldo_anual[i]), 2),
+        } for i in range(len(capital_anual))],
+    }
+
+
+def cuadricula(montos: Sequence[float], parametros: ParametrosPrestamo,
+               plazos: Iterable[int] = PLAZOS_OFRECIDOS) -> Dict[str, Any]:
+    """
+    Cuotas e intereses totales (cuota × plazo − monto) de cada combinación
+    monto × plazo: un vector de factores memoizados por plazo y un producto
+    exterior con los montos. Los montos y plazos fuera de los límites
+    configurados se descartan.
+    """
+    plazos = sorted({int(p) for p in plazos
+                     if parametros.plazo_minimo <= int(p) <= parametros.plazo_maximo})
+    montos = sorted({float(m) for m in montos
+                     if parametros.monto_minimo <= float(m) <= parametros.monto_maximo})
+    if len(montos) > MAX_MONTOS_CUADRICULA:
+        raise CotizacionInvalida(f'Máximo {MAX_MONTOS_CUADRICULA} montos por cuadrícula')
+    if not montos or not plazos:
+        raise CotizacionInvalida('No hay montos o plazos dentro de los límites configurados')
+
+    m = np.asarray(montos)
+    n = np.asarray(plazos)
+    factores = np.fromiter((factor_anualidad(parametros.tasa, p) for p in plazos),
+                           dtype=np.float64, count=len(plazos))
+    cuotas = np.round(m[:, None] * factores[None, :], 2)
+    intereses = np.round(cuotas * n[None, :] - m[:, None], 2)
+    return {
+        'tasa_mensual': parametros.tasa,
+        'montos': montos,
+        'plazos': plazos,
+        'cuotas': cuotas.tolist(),
+        'total_intereses': intereses.tolist(),
+    }
+
+
+def montos_en_rango(desde: float, hasta: float, paso: float) -> List[float]:
+    """Montos desde..hasta (inclusive) cada `paso`, acotados a MAX_MONTOS_CUADRICULA."""
+    if paso <= 0 or hasta < desde:
+        raise CotizacionInvalida('Rango de montos inválido')
+    cantidad = int((hasta - desde) // paso) + 1
+    if cantidad > MAX_MONTOS_CUADRICULA:
+        raise CotizacionInvalida(f'Máximo {MAX_MONTOS_CUADRICULA} montos por cuadrícula')
+    return (desde + paso * np.arange(cantidad)).tolist()
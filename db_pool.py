@@ -0,0 +1,241 @@
+"""
+db_pool.py — Pool de conexiones MySQL
+Novacapital SAS
+
+Arquitectura:
+    ConnectionPool  Pool acotado de conexiones MySQLdb (mín/máx, verificación
+                    al prestar, vida máxima y métricas de espera)
+    PooledMySQL     Integración con Flask: misma interfaz que flask_mysqldb
+                    (`mysql.connection`), pero la conexión de cada petición
+                    se toma del pool y se devuelve al terminar
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+import MySQLdb
+import MySQLdb.cursors
+from flask import g
+
+
+class PoolTimeout(Exception):
+    """No se obtuvo una conexión libre dentro del tiempo de espera."""
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones MySQLdb reutilizables.
+
+    - Mantiene al menos `min_size` conexiones abiertas y nunca más de
+      `max_size` en total, lo que también acota la concurrencia contra MySQL.
+    - Al prestar una conexión la verifica con ping() y la reemplaza si está
+      caída o si superó `max_lifetime` segundos de vida.
+    - Si no hay conexiones libres espera hasta `timeout` segundos y luego
+      lanza PoolTimeout; los tiempos de espera quedan en las métricas.
+    """
+
+    def __init__(self, connect_kwargs: Dict[str, Any], min_size: int = 2,
+                 max_size: int = 10, max_lifetime: float = 1800,
+                 timeout: float = 5.0):
+        self.connect_kwargs = connect_kwargs
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+        self._idle: deque = deque()              # (conexión, creada_en)
+        self._in_use: Dict[int, float] = {}      # id(conexión) -> creada_en
+        self._pending = 0                        # abriéndose o verificándose fuera del lock
+        self._cond = threading.Condition()
+        self.metrics = {
+            'checkouts': 0, 'created': 0, 'discarded': 0, 'failed_health_checks': 0,
+            'waits': 0, 'wait_seconds_total': 0.0, 'wait_seconds_max': 0.0, 'timeouts': 0,
+        }
+        with self._cond:
+            for _ in range(min_size):
+                try:
+                    self._idle.append(self._connect())
+                    self.metrics['created'] += 1
+                except MySQLdb.Error:
+                    break   # la BD puede no estar lista aún; se reintenta al prestar
+
+    @property
+    def size(self) -> int:
+        return len(self._idle) + len(self._in_use) + self._pending
+
+    def _connect(self):
+        return MySQLdb.connect(**self.connect_kwargs), time.monotonic()
+
+    @staticmethod
+    def _close(conn) -> None:
+        try:
+            conn.close()
+        except MySQLdb.Error:
+            pass
+
+    @staticmethod
+    def _ping(conn) -> bool:
+        try:
+            conn.ping()
+            return True
+        except MySQLdb.Error:
+            return False
+
+    # --- préstamo y devolución ---
+
+    def acquire(self):
+        """
+        Presta una conexión sana; espera si el pool está en su máximo.
+
+        El lock solo protege la contabilidad: la conexión candidata se retira
+        de las libres con el lock tomado (su lugar queda reservado en
+        `_pending`) y el ping, el cierre o la conexión nueva se hacen fuera,
+        así una conexión lenta o caída no frena a los demás préstamos.
+        """
+        inicio = time.monotonic()
+        esperó = False
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, created = self._idle.pop()
+                elif self.size < self.max_size:
+                    conn, created = None, None
+                else:
+                    restante = self.timeout - (time.monotonic() - inicio)
+                    if restante <= 0:
+                        self.metrics['timeouts'] += 1
+                        raise PoolTimeout(f'Sin conexiones libres tras {self.timeout:.1f}s '
+                                          f'(máximo {self.max_size})')
+                    esperó = True
+                    self._cond.wait(restante)
+                    continue
+
+                nueva = conn is None
+                self._pending += 1
+                self._cond.release()
+                vencida = sana = False
+                try:
+                    if nueva:
+                        conn, created = self._connect()
+                        sana = True
+                    else:
+                        vencida = time.monotonic() - created > self.max_lifetime
+                        sana = not vencida and self._ping(conn)
+                        if not sana:
+                            self._close(conn)
+                finally:
+                    self._cond.acquire()
+                    self._pending -= 1
+                    if not sana:
+                        self._cond.notify()   # el lugar reservado quedó libre
+
+                if sana:
+                    if nueva:
+                        self.metrics['created'] += 1
+                    break
+                self.metrics['discarded'] += 1
+                if not vencida:
+                    self.metrics['failed_health_checks'] += 1
+
+            self._in_use[id(conn)] = created
+            self.metrics['checkouts'] += 1
+            if esperó:
+                espera = time.monotonic() - inicio
+                self.metrics['waits'] += 1
+                self.metrics['wait_seconds_total'] += espera
+                self.metrics['wait_seconds_max'] = max(self.metrics['wait_seconds_max'], espera)
+            return conn
+
+    def release(self, conn, broken: bool = False) -> None:
+        """Devuelve una conexión al pool (o la descarta si quedó inservible)."""
+        with self._cond:
+            created = self._in_use.pop(id(conn), None)
+            if created is None:
+                return
+            descartar = broken or time.monotonic() - created > self.max_lifetime
+            if descartar:
+                self.metrics['discarded'] += 1
+            else:
+                self._idle.append((conn, created))
+            self._cond.notify()
+        if descartar:
+            self._close(conn)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            stats = dict(self.metrics)
+            stats.update(size=self.size, idle=len(self._idle), in_use=len(self._in_use),
+                         min_size=self.min_size, max_size=self.max_size)
+        return stats
+
+
+class PooledMySQL:
+    """
+    Reemplazo de flask_mysqldb.MySQL respaldado por un ConnectionPool.
+
+    `mysql.connection` toma una conexión del pool la primera vez que se usa
+    en la petición y la devuelve al pool en el teardown del contexto,
+    deshaciendo lo que haya quedado sin confirmar. Si se asigna `envolver`
+    (conexión -> proxy), la petición recibe el proxy en lugar de la conexión.
+    """
+
+    def __init__(self, app=None):
+        self.pool: Optional[ConnectionPool] = None
+        self.envolver = None
+        self._pool_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        self.app = app
+        app.teardown_appcontext(self.teardown)
+
+    def _crear_pool(self) -> ConnectionPool:
+        cfg = self.app.config
+        kwargs = {
+            'host': cfg.get('MYSQL_HOST', 'localhost'),
+            'user': cfg.get('MYSQL_USER'),
+            'password': cfg.get('MYSQL_PASSWORD'),
+            'database': cfg.get('MYSQL_DB'),
+            'port': int(cfg.get('MYSQL_PORT', 3306)),
+            'charset': cfg.get('MYSQL_CHARSET', 'utf8mb4'),
+            'autocommit': False,
+        }
+        if cfg.get('MYSQL_CURSORCLASS'):
+            kwargs['cursorclass'] = getattr(MySQLdb.cursors, cfg['MYSQL_CURSORCLASS'])
+        return ConnectionPool(
+            kwargs,
+            min_size=int(cfg.get('DB_POOL_MIN', 2)),
+            max_size=int(cfg.get('DB_POOL_MAX', 10)),
+            max_lifetime=float(cfg.get('DB_POOL_MAX_LIFETIME', 1800)),
+            timeout=float(cfg.get('DB_POOL_TIMEOUT', 5)),
+        )
+
+    def get_pool(self) -> ConnectionPool:
+        if self.pool is None:
+            with self._pool_lock:
+                if self.pool is None:
+                    self.pool = self._crear_pool()
+        return self.pool
+
+    @property
+    def connection(self):
+        """Conexión de la petición actual (prestada del pool bajo demanda)."""
+        proxy = g.get('_db_proxy')
+        if proxy is None:
+            conn = g._db_conn = self.get_pool().acquire()
+            proxy = g._db_proxy = self.envolver(conn) if self.envolver else conn
+        return proxy
+
+    def teardown(self, exception) -> None:
+        g.pop('_db_proxy', None)
+        conn = g.pop('_db_conn', None)
+        if conn is None:
+            return
+        broken = False
+        try:
+            conn.rollback()   # nada sin confirmar vuelve al pool
+        except MySQLdb.Error:
+            broken = True
+        self.pool.release(conn, broken=broken)
@@ -0,0 +1,288 @@
+"""
+difusion.py — Envío masivo de notificaciones a un segmento de clientes
+Novacapital SAS
+
+Arquitectura:
+    Difusion        Un envío (fila de `difusiones`): segmento, mensaje y
+                    progreso (total, enviados, estado)
+    GestorDifusion  Crea la difusión en la BD (id AUTO_INCREMENT) y la ejecuta
+                    en un hilo con su propia conexión del pool: fija los
+                    destinatarios en `difusiones_destinatarios` con un solo
+                    INSERT ... SELECT y luego envía por bloques. Cada bloque
+                    inserta las notificaciones y marca sus destinatarios como
+                    enviados en la misma transacción, así que una difusión
+                    cortada se retoma sin duplicar ni perder mensajes.
+
+El estado vive en la BD: cualquier worker responde el progreso, y una
+difusión cuyo worker dejó de reportar (latido vencido) la retoma otro worker
+al consultarla o al iniciar una nueva.
+"""
+
+import json
+import os
+import socket
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import MySQLdb.cursors
+
+INSERT_NOTIFICACION = """
+    INSERT INTO notificaciones
+    (usuario_id, titulo, mensaje, tipo, leida)
+    VALUES (%s, %s, %s, %s, FALSE)
+"""
+
+INSERT_DIFUSION = """
+    INSERT INTO difusiones
+    (titulo, mensaje, tipo, segmento, admin_id, ip, trabajador, latido)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, NOW())
+"""
+
+SELECT_DIFUSION = """
+    SELECT id, titulo, mensaje, tipo, segmento, estado, total, enviados, error,
+           admin_id, ip, TIMESTAMPDIFF(SECOND, inicio, COALESCE(fin, NOW())) AS segundos,
+           (estado IN ('pendiente', 'en_curso')
+            AND latido < NOW() - INTERVAL %s SECOND) AS huerfana
+    FROM difusiones
+    WHERE id = %s
+"""
+
+# Toma la difusión si es propia o si su worker dejó de dar señales
+RECLAMAR = """
+    UPDATE difusiones
+    SET estado = 'en_curso', trabajador = %s, latido = NOW()
+    WHERE id = %s AND estado IN ('pendiente', 'en_curso')
+      AND (trabajador = %s OR latido < NOW() - INTERVAL %s SECOND)
+"""
+
+HUERFANAS = """
+    SELECT id FROM difusiones
+    WHERE estado IN ('pendiente', 'en_curso') AND latido < NOW() - INTERVAL %s SECOND
+"""
+
+# Destinatarios pendientes del bloque; SKIP LOCKED: si dos workers retoman la
+# misma difusión, cada uno envía bloques distintos
+BLOQUE_PENDIENTE = """
+    SELECT usuario_id FROM difusiones_destinatarios
+    WHERE difusion_id = %s AND enviado = FALSE
+    ORDER BY usuario_id
+    LIMIT %s
+    FOR UPDATE SKIP LOCKED
+"""
+
+
+def consulta_segmento(segmento: Dict[str, str]) -> Tuple[str, List[Any]]:
+    """
+    Consulta de destinatarios (usuario_id) de un segmento: estado y ciudad
+    del cliente, asesor asignado (id o 'sin_asignar') y estado de préstamo.
+    """
+    query = """
+        SELECT DISTINCT c.usuario_id
+        FROM clientes c
+        LEFT JOIN asignaciones_asesores aa ON aa.id = (
+            SELECT MAX(x.id) FROM asignaciones_asesores x
+            WHERE x.cliente_id = c.id AND x.activa = TRUE)
+        WHERE c.usuario_id IS NOT NULL
+    """
+    params: List[Any] = []
+    if segmento.get('estado'):
+        query += " AND c.estado = %s"
+        params.append(segmento['estado'])
+    if segmento.get('ciudad'):
+        query += " AND c.ciudad = %s"
+        params.append(segmento['ciudad'])
+    if segmento.get('asesor') == 'sin_asignar':
+        query += " AND aa.asesor_id IS NULL"
+    elif segmento.get('asesor'):
+        query += " AND aa.asesor_id = %s"
+        params.append(segmento['asesor'])
+    if segmento.get('estado_prestamo'):
+        query += """ AND EXISTS (SELECT 1 FROM prestamos p
+                                 WHERE p.cliente_id = c.id AND p.estado = %s)"""
+        params.append(segmento['estado_prestamo'])
+    return query, params
+
+
+class Difusion:
+    """Estado de un envío masivo, leído de `difusiones`."""
+
+    def __init__(self, fila: Dict[str, Any]):
+        self.id = fila['id']
+        segmento = fila.get('segmento') or {}
+        self.segmento = json.loads(segmento) if isinstance(segmento, (str, bytes)) else segmento
+        self.titulo = fila.get('titulo')
+        self.mensaje = fila.get('mensaje')
+        self.tipo = fila.get('tipo')
+        self.admin_id = fila.get('admin_id')
+        self.ip = fila.get('ip')
+        self.estado = fila['estado']    # pendiente | en_curso | completada | error
+        self.total: Optional[int] = fila.get('total')
+        self.enviados = int(fila.get('enviados') or 0)
+        self.error: Optional[str] = fila.get('error')
+        self.segundos = int(fila.get('segundos') or 0)
+        self.huerfana = bool(fila.get('huerfana'))
+
+    def progreso(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'estado': self.estado,
+            'segmento': self.segmento,
+            'total': self.total,
+            'enviados': self.enviados,
+            'porcentaje': round(100 * self.enviados / self.total, 1) if self.total else
+                          (100.0 if self.estado == 'completada' else 0.0),
+            'segundos': self.segundos,
+            'error': self.error,
+        }
+
+
+class GestorDifusion:
+    """
+    Lanza, sigue y retoma las difusiones. `obtener_pool` devuelve el
+    ConnectionPool de la app; cada ejecución toma una conexión propia y la
+    devuelve al terminar. Una difusión sin latido durante `latido_vencido`
+    segundos se considera abandonada (worker reciclado o caído).
+    """
+
+    def __init__(self, obtener_pool: Callable, bloque: int = 1000, latido_vencido: int = 120):
+        self.obtener_pool = obtener_pool
+        self.bloque = bloque
+        self.latido_vencido = latido_vencido
+        self._activas: set = set()      # ids que ejecuta este proceso
+        self._lock = threading.Lock()
+        self.al_terminar: Optional[Callable[[Difusion], None]] = None
+
+    @property
+    def trabajador(self) -> str:
+        return f'{socket.gethostname()}:{os.getpid()}'
+
+    def _con_conexion(self, funcion: Callable) -> Any:
+        pool = self.obtener_pool()
+        conn = pool.acquire()
+        roto = False
+        try:
+            return funcion(conn, conn.cursor(MySQLdb.cursors.DictCursor))
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                roto = True
+            raise
+        finally:
+            pool.release(conn, broken=roto)
+
+    def iniciar(self, segmento: Dict[str, str], titulo: str, mensaje: str,
+                tipo: str = 'info', admin_id: int = None, ip: str = None) -> Difusion:
+        def crear(conn, cursor):
+            cursor.execute(INSERT_DIFUSION, (titulo, mensaje, tipo, json.dumps(segmento),
+                                             admin_id, ip, self.trabajador))
+            difusion_id = cursor.lastrowid
+            conn.commit()
+            cursor.execute(SELECT_DIFUSION, (self.latido_vencido, difusion_id))
+            difusion = Difusion(cursor.fetchone())
+            cursor.execute(HUERFANAS, (self.latido_vencido,))
+            huerfanas = [fila['id'] for fila in cursor.fetchall()]
+            cursor.close()
+            return difusion, huerfanas
+
+        difusion, huerfanas = self._con_conexion(crear)
+        for difusion_id in [difusion.id] + huerfanas:
+            self._lanzar(difusion_id)
+        return difusion
+
+    def obtener(self, cursor, difusion_id: int) -> Optional[Difusion]:
+        """Progreso desde la BD (cualquier worker); retoma la difusión si quedó abandonada."""
+        cursor.execute(SELECT_DIFUSION, (self.latido_vencido, difusion_id))
+        fila = cursor.fetchone()
+        if fila is None:
+            return None
+        difusion = Difusion(fila)
+        if difusion.huerfana:
+            self._lanzar(difusion.id)
+        return difusion
+
+    def _lanzar(self, difusion_id: int) -> None:
+        with self._lock:
+            if difusion_id in self._activas:
+                return
+            self._activas.add(difusion_id)
+        threading.Thread(target=self._ejecutar, args=(difusion_id,),
+                         name=f'difusion-{difusion_id}', daemon=True).start()
+
+    def _ejecutar(self, difusion_id: int) -> None:
+        try:
+            self._con_conexion(lambda conn, cursor: self._enviar(conn, cursor, difusion_id))
+        except Exception as e:
+            try:
+                self._con_conexion(lambda conn, cursor: self._terminar(
+                    conn, cursor, difusion_id, 'error', str(e)[:500]))
+            except Exception:
+                pass   # sin BD: el latido vence y la difusión se retoma después
+        finally:
+            with self._lock:
+                self._activas.discard(difusion_id)
+
+    def _enviar(self, conn, cursor, difusion_id: int) -> None:
+        trabajador = self.trabajador
+        cursor.execute(RECLAMAR, (trabajador, difusion_id, trabajador, self.latido_vencido))
+        conn.commit()
+        if cursor.rowcount != 1:
+            return   # terminada, o la ejecuta otro worker con latido vigente
+
+        cursor.execute("SELECT titulo, mensaje, tipo, segmento, total FROM difusiones WHERE id = %s",
+                       (difusion_id,))
+        fila = cursor.fetchone()
+        if fila['total'] is None:
+            # Destinatarios fijados una sola vez (INSERT IGNORE: repetible si se cortó aquí)
+            query, params = consulta_segmento(json.loads(fila['segmento']))
+            cursor.execute(f"""
+                INSERT IGNORE INTO difusiones_destinatarios (difusion_id, usuario_id)
+                SELECT %s, d.usuario_id FROM ({query}) d
+            """, [difusion_id] + params)
+            cursor.execute("""
+                UPDATE difusiones
+                SET total = (SELECT COUNT(*) FROM difusiones_destinatarios WHERE difusion_id = %s),
+                    latido = NOW()
+                WHERE id = %s
+            """, (difusion_id, difusion_id))
+            conn.commit()
+
+        while True:
+            cursor.execute(BLOQUE_PENDIENTE, (difusion_id, self.bloque))
+            usuarios = [f['usuario_id'] for f in cursor.fetchall()]
+            if not usuarios:
+                conn.commit()
+                break
+            cursor.executemany(INSERT_NOTIFICACION, [
+                (uid, fila['titulo'], fila['mensaje'], fila['tipo']) for uid in usuarios])
+            marcadores = ', '.join(['%s'] * len(usuarios))
+            cursor.execute(f"""
+                UPDATE difusiones_destinatarios SET enviado = TRUE
+                WHERE difusion_id = %s AND usuario_id IN ({marcadores})
+            """, [difusion_id] + usuarios)
+            cursor.execute("""
+                UPDATE difusiones SET enviados = enviados + %s, latido = NOW()
+                WHERE id = %s
+            """, (len(usuarios), difusion_id))
+            conn.commit()   # notificaciones y marca de enviado en la misma transacción
+
+        # Bloques aún tomados por otro worker: ese worker la cierra
+        cursor.execute("""
+            SELECT COUNT(*) AS pendientes FROM difusiones_destinatarios
+            WHERE difusion_id = %s AND enviado = FALSE
+        """, (difusion_id,))
+        if cursor.fetchone()['pendientes'] == 0:
+            self._terminar(conn, cursor, difusion_id, 'completada')
+        cursor.close()
+
+    def _terminar(self, conn, cursor, difusion_id: int, estado: str, error: str = None) -> None:
+        cursor.execute("""
+            UPDATE difusiones SET estado = %s, error = %s, fin = NOW()
+            WHERE id = %s AND estado IN ('pendiente', 'en_curso')
+        """, (estado, error, difusion_id))
+        cerrada = cursor.rowcount == 1
+        conn.commit()
+        if cerrada and self.al_terminar:
+            # Solo quien la cierra deja el registro de auditoría
+            cursor.execute(SELECT_DIFUSION, (self.latido_vencido, difusion_id))
+            self.al_terminar(Difusion(cursor.fetchone()))
@@ -0,0 +1,337 @@
+"""
+exportaciones.py — Extractos completos en CSV / XLSX por streaming
+Novacapital SAS
+
+Arquitectura:
+    EXPORTACIONES   Columnas permitidas (nombre -> expresión SQL), tablas y
+                    orden de cada extracto: clientes, prestamos y pagos
+    consulta        SELECT con las columnas pedidas y las condiciones de los
+                    mismos filtros que los listados
+    exportar        Generador que lee con un cursor sin buffer (SSCursor) y
+                    produce el archivo por trozos: la memoria no depende del
+                    número de filas y el primer byte sale de inmediato
+    filas_csv       Serializa a CSV (UTF-8 con BOM para Excel)
+    filas_xlsx      Serializa a XLSX con zipfile en modo streaming y celdas
+                    inlineStr, sin dependencias externas
+
+La exportación usa su propia conexión del pool (no la de la petición): la
+respuesta se sigue enviando después de que la vista retorna. La conexión va
+en una ConexionPrestada que se devuelve al cerrar la respuesta, aunque el
+generador nunca llegue a ejecutarse (HEAD, cliente que corta antes).
+"""
+
+import csv
+import io
+import threading
+import zipfile
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterable, Iterator, List, NamedTuple, Sequence
+from xml.sax.saxutils import escape
+
+import MySQLdb.cursors
+
+FILAS_POR_TROZO = 500
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+class Exportacion(NamedTuple):
+    columnas: 'OrderedDict[str, str]'   # nombre en el archivo -> expresión SQL
+    desde: str                          # FROM ... JOIN ...
+    orden: str                          # ORDER BY (debe poder leerse de un índice)
+
+
+EXPORTACIONES = {
+    'clientes': Exportacion(
+        columnas=OrderedDict([
+            ('id', 'c.id'),
+            ('tipo_documento', 'c.tipo_documento'),
+            ('numero_documento', 'c.numero_documento'),
+            ('nombres', 'c.nombres'),
+            ('apellidos', 'c.apellidos'),
+            ('email', 'c.email'),
+            ('celular', 'c.celular'),
+            ('telefono', 'c.telefono'),
+            ('direccion', 'c.direccion'),
+            ('ciudad', 'c.ciudad'),
+            ('departamento', 'c.departamento'),
+            ('tipo_cliente', 'c.tipo_cliente'),
+            ('entidad_empleadora', 'c.entidad_empleadora'),
+            ('salario_mensual', 'c.salario_mensual'),
+            ('estado', 'c.estado'),
+            ('fecha_registro', 'c.fecha_registro'),
+            ('asesor', 'u.nombre'),
+        ]),
+        desde="""clientes c
+            LEFT JOIN asignaciones_asesores aa ON aa.id = (
+                SELECT MAX(x.id) FROM asignaciones_asesores x
+                WHERE x.cliente_id = c.id AND x.activa = TRUE)
+            LEFT JOIN usuarios u ON u.id = aa.asesor_id""",
+        orden='c.fecha_registro DESC, c.id DESC',
+    ),
+    'prestamos': Exportacion(
+        columnas=OrderedDict([
+            ('id', 'p.id'),
+            ('numero_prestamo', 'p.numero_prestamo'),
+            ('cliente_documento', 'c.numero_documento'),
+            ('cliente_nombres', 'c.nombres'),
+            ('cliente_apellidos', 'c.apellidos'),
+            ('monto_solicitado', 'p.monto_solicitado'),
+            ('monto_aprobado', 'p.monto_aprobado'),
+            ('tasa_interes', 'p.tasa_interes'),
+            ('plazo_meses', 'p.plazo_meses'),
+            ('cuota_mensual', 'p.cuota_mensual'),
+            ('estado', 'p.estado'),
+            ('fecha_solicitud', 'p.fecha_solicitud'),
+            ('fecha_aprobacion', 'p.fecha_aprobacion'),
+            ('fecha_desembolso', 'p.fecha_desembolso'),
+            ('banco', 'p.banco'),
+            ('cuenta_bancaria', 'p.cuenta_bancaria'),
+            ('asesor', 'a.nombre'),
+        ]),
+        desde="""prestamos p
+            JOIN clientes c ON p.cliente_id = c.id
+            LEFT JOIN asignaciones_asesores aa ON aa.id = (
+                SELECT MAX(x.id) FROM asignaciones_asesores x
+                WHERE x.cliente_id = c.id AND x.activa = TRUE)
+            LEFT JOIN usuarios a ON a.id = aa.asesor_id""",
+        orden='p.fecha_solicitud DESC, p.id DESC',
+    ),
+    'pagos': Exportacion(
+        columnas=OrderedDict([
+            ('id', 'pg.id'),
+            ('numero_prestamo', 'p.numero_prestamo'),
+            ('cliente_documento', 'c.numero_documento'),
+            ('numero_cuota', 'pg.numero_cuota'),
+            ('fecha_vencimiento', 'pg.fecha_vencimiento'),
+            ('fecha_pago', 'pg.fecha_pago'),
+            ('valor_cuota', 'pg.valor_cuota'),
+            ('valor_pagado', 'pg.valor_pagado'),
+            ('capital', 'pg.capital'),
+            ('interes', 'pg.interes'),
+            ('saldo_pendiente', 'pg.saldo_pendiente'),
+            ('estado', 'pg.estado'),
+            ('dias_mora', 'pg.dias_mora'),
+        ]),
+        desde="""pagos pg
+            JOIN prestamos p ON p.id = pg.prestamo_id
+            JOIN clientes c ON c.id = p.cliente_id""",
+        orden='pg.id',
+    ),
+}
+
+
+def seleccionar_columnas(entidad: str, pedidas: str = '') -> List[str]:
+    """Columnas pedidas (?columnas=a,b) validadas contra la lista permitida; todas si no hay."""
+    permitidas = EXPORTACIONES[entidad].columnas
+    nombres = [c.strip() for c in pedidas.split(',') if c.strip()]
+    invalidas = [c for c in nombres if c not in permitidas]
+    if invalidas:
+        raise ValueError(f"Columnas no disponibles: {', '.join(invalidas)}")
+    return nombres or list(permitidas)
+
+
+def consulta(entidad: str, columnas: Sequence[str], condiciones: str = '') -> str:
+    """SELECT del extracto; `condiciones` empieza con ' AND ...' como en los listados."""
+    definicion = EXPORTACIONES[entidad]
+    campos = ', '.join(f'{definicion.columnas[c]} AS `{c}`' for c in columnas)
+    return (f"SELECT {campos} FROM {definicion.desde} "
+            f"WHERE 1=1{condiciones} ORDER BY {definicion.orden}")
+
+
+# ============================================================
+# SERIALIZACIÓN
+# ============================================================
+
+def _texto(valor) -> str:
+    if valor is None:
+        return ''
+    if isinstance(valor, datetime):
+        return valor.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(valor, date):
+        return valor.isoformat()
+    return str(valor)
+
+
+def filas_csv(columnas: Sequence[str], filas: Iterable[tuple]) -> Iterator[bytes]:
+    """CSV por trozos de FILAS_POR_TROZO filas."""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    buffer.write('\ufeff')   # BOM: Excel abre el CSV como UTF-8
+    escritor.writerow(columnas)
+    n = 0
+    for fila in filas:
+        escritor.writerow([_texto(v) for v in fila])
+        n += 1
+        if n % FILAS_POR_TROZO == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+class _Salida:
+    """Destino no posicionable para zipfile: acumula lo escrito hasta que se retira."""
+
+    def __init__(self):
+        self._partes: List[bytes] = []
+
+    def write(self, datos) -> int:
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self) -> None:
+        pass
+
+    def retirar(self) -> bytes:
+        datos = b''.join(self._partes)
+        self._partes.clear()
+        return datos
+
+
+_XLSX_FIJOS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="{hoja}" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'),
+}
+
+
+def _celda(valor) -> str:
+    if valor is None:
+        return '<c/>'
+    if isinstance(valor, (int, float, Decimal)):
+        return f'<c><v>{valor}</v></c>'
+    return f'<c t="inlineStr"><is><t>{escape(_texto(valor))}</t></is></c>'
+
+
+def filas_xlsx(columnas: Sequence[str], filas: Iterable[tuple], hoja: str = 'Datos') -> Iterator[bytes]:
+    """XLSX mínimo (una hoja) escrito por trozos con zipfile sobre un destino no posicionable."""
+    salida = _Salida()
+    with zipfile.ZipFile(salida, 'w', zipfile.ZIP_DEFLATED) as archivo:
+        for nombre, contenido in _XLSX_FIJOS.items():
+            archivo.writestr(nombre, contenido.replace('{hoja}', escape(hoja)))
+        yield salida.retirar()
+
+        # El tamaño no se conoce de antemano y puede superar 2 GiB: ZIP64 desde el inicio
+        with archivo.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as xml:
+            xml.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                      b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                      b'<sheetData>')
+            xml.write(('<row>' + ''.join(_celda(c) for c in columnas) + '</row>').encode('utf-8'))
+            n = 0
+            for fila in filas:
+                xml.write(('<row>' + ''.join(_celda(v) for v in fila) + '</row>').encode('utf-8'))
+                n += 1
+                if n % FILAS_POR_TROZO == 0:
+                    datos = salida.retirar()
+                    if datos:
+                        yield datos
+            xml.write(b'</sheetData></worksheet>')
+    yield salida.retirar()
+
+
+# ============================================================
+# LECTURA SIN BUFFER
+# ============================================================
+
+def _filas(cursor) -> Iterator[tuple]:
+    """Filas de un SSCursor en lotes de FILAS_POR_TROZO (el servidor las envía a demanda)."""
+    while True:
+        lote = cursor.fetchmany(FILAS_POR_TROZO)
+        if not lote:
+            return
+        yield from lote
+
+
+class ConexionPrestada:
+    """
+    Conexión del pool para una respuesta en streaming. liberar() la devuelve
+    una sola vez (se llama al terminar el generador y al cerrar la
+    respuesta): sana si no se usó o si la lectura terminó, descartada si
+    quedaron filas sin leer en el servidor.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.conn = pool.acquire()
+        self.usada = False
+        self.completa = False
+        self._devuelta = False
+        self._lock = threading.Lock()
+
+    def liberar(self) -> None:
+        with self._lock:
+            if self._devuelta:
+                return
+            self._devuelta = True
+        sana = not self.usada or self.completa
+        if self.usada and self.completa:
+            try:
+                cursor = self.conn.cursor()
+                cursor.execute("SET SESSION net_write_timeout = DEFAULT")
+                cursor.close()
+                self.conn.rollback()
+            except MySQLdb.Error:
+                sana = False
+        self.pool.release(self.conn, broken=not sana)
+
+
+def exportar(prestada: ConexionPrestada, query: str, params: Sequence, columnas: Sequence[str],
+             formato: str = 'csv', hoja: str = 'Datos') -> Iterator[bytes]:
+    """
+    Genera el archivo leyendo fila a fila de la conexión prestada con
+    SSCursor y la devuelve al terminar. Si el cliente corta la descarga
+    quedan filas sin leer en el servidor: la conexión se descarta en vez de
+    drenarlas.
+    """
+    prestada.usada = True
+    try:
+        cursor = prestada.conn.cursor(MySQLdb.cursors.SSCursor)
+        # El cliente puede tardar en leer: margen para que MySQL no corte el envío
+        cursor.execute("SET SESSION net_write_timeout = 600")
+        cursor.execute(query, params)
+        filas = _filas(cursor)
+        if formato == 'xlsx':
+            yield from filas_xlsx(columnas, filas, hoja)
+        else:
+            yield from filas_csv(columnas, filas)
+        cursor.close()
+        prestada.completa = True
+    finally:
+        prestada.liberar()
+
+
+def nombre_archivo(entidad: str, formato: str) -> str:
+    return f"{entidad}_{datetime.now():%Y%m%d_%H%M%S}.{formato}"
+
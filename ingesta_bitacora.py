@@ -0,0 +1,157 @@
+"""
+Ingesta por lotes de los logs JSONL en la tabla `bitacora` - Novacapital
+Ejecutable desde cron: lee solo las líneas nuevas de auth/loans/admin.jsonl
+y las inserta en bloques multi-fila, sin escrituras a BD en cada petición.
+
+Reanudación idempotente: cada fila guarda su log de origen (`modulo`) y su
+número de secuencia (`log_seq`) bajo una clave única, de modo que el punto
+de control es MAX(log_seq) por log y reintentar un bloque nunca duplica.
+"""
+
+import argparse
+import json
+import os
+
+import MySQLdb
+from dotenv import load_dotenv
+
+from logger import JSONLLogger, auth_logger, loan_logger, admin_logger
+
+load_dotenv()
+
+LOGGERS = {'auth': auth_logger, 'loans': loan_logger, 'admin': admin_logger}
+
+# Tabla afectada según el evento (por defecto, según el log de origen)
+TABLAS = {
+    'auth': 'usuarios',
+    'loans': 'prestamos',
+    'admin': 'usuarios',
+    'asignar_asesor': 'clientes',
+}
+
+INSERT_BITACORA = """
+    INSERT IGNORE INTO bitacora
+    (usuario_id, accion, modulo, tabla_afectada, registro_id, descripcion,
+     ip_address, fecha, log_seq)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+
+def conectar_bd():
+    """Conecta a la base de datos"""
+    try:
+        return MySQLdb.connect(
+            host=os.getenv('MYSQL_HOST', 'localhost'),
+            user=os.getenv('MYSQL_USER', 'novacapital'),
+            password=os.getenv('MYSQL_PASSWORD', 'Novacapital123$'),
+            db=os.getenv('MYSQL_DB', 'novacapital_db'),
+            charset='utf8mb4'
+        )
+    except Exception as e:
+        print(f"❌ Error al conectar: {str(e)}")
+        return None
+
+
+def asegurar_esquema(cursor):
+    """Agrega a `bitacora` las columnas e índices de la ingesta si faltan"""
+    cursor.execute("SHOW COLUMNS FROM bitacora LIKE 'log_seq'")
+    if not cursor.fetchone():
+        print("🔧 Preparando tabla bitacora para la ingesta...")
+        cursor.execute("ALTER TABLE bitacora MODIFY usuario_id INT NULL")
+        cursor.execute("ALTER TABLE bitacora ADD COLUMN log_seq BIGINT NULL")
+        cursor.execute("ALTER TABLE bitacora ADD UNIQUE KEY uk_bitacora_log (modulo, log_seq)")
+        cursor.execute("ALTER TABLE bitacora ADD KEY idx_bitacora_fecha (fecha)")
+        cursor.execute("ALTER TABLE bitacora ADD KEY idx_bitacora_accion (accion, fecha)")
+
+
+def punto_de_control(cursor, modulo):
+    """Siguiente secuencia a ingerir para un log (usa la clave única)"""
+    cursor.execute("SELECT MAX(log_seq) FROM bitacora WHERE modulo = %s", (modulo,))
+    ultimo = cursor.fetchone()[0]
+    return 0 if ultimo is None else ultimo + 1
+
+
+def a_fila(modulo, seq, entrada):
+    """Convierte un registro JSONL en una fila de bitacora"""
+    event = entrada.get('event', '')
+    registro_id = (entrada.get('prestamo_id') or entrada.get('objetivo_id')
+                   or entrada.get('user_id'))
+    return [
+        entrada.get('user_id'),
+        event[:100],
+        modulo,
+        TABLAS.get(event, TABLAS[modulo]),
+        registro_id,
+        json.dumps(entrada, ensure_ascii=False),
+        entrada.get('ip'),
+        entrada.get('timestamp', '').replace('T', ' ') or None,
+        seq,
+    ]
+
+
+def insertar_bloque(cursor, filas):
+    """Inserta un bloque; los usuario_id inexistentes quedan en NULL (FK)"""
+    ids = {f[0] for f in filas if f[0] is not None}
+    if ids:
+        marcadores = ', '.join(['%s'] * len(ids))
+        cursor.execute(f"SELECT id FROM usuarios WHERE id IN ({marcadores})", tuple(ids))
+        validos = {row[0] for row in cursor.fetchall()}
+        for f in filas:
+            if f[0] not in validos:
+                f[0] = None
+    # executemany de MySQLdb reescribe el INSERT como un solo VALUES multi-fila
+    cursor.executemany(INSERT_BITACORA, filas)
+
+
+def ingerir(db, modulo, logger: JSONLLogger, tamano_bloque=1000):
+    """Ingiere las líneas nuevas de un log. Devuelve cuántas filas insertó."""
+    cursor = db.cursor()
+    total = 0
+    try:
+        desde = punto_de_control(cursor, modulo)
+        bloque = []
+        for seq, entrada in logger.iter_from(desde):
+            bloque.append(a_fila(modulo, seq, entrada))
+            if len(bloque) >= tamano_bloque:
+                insertar_bloque(cursor, bloque)
+                db.commit()   # cada bloque es una transacción corta
+                total += len(bloque)
+                bloque = []
+        if bloque:
+            insertar_bloque(cursor, bloque)
+            db.commit()
+            total += len(bloque)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ingesta de logs JSONL en bitacora')
+    parser.add_argument('--logs', nargs='+', choices=sorted(LOGGERS), default=sorted(LOGGERS))
+    parser.add_argument('--bloque', type=int, default=1000, help='filas por INSERT multi-fila')
+    args = parser.parse_args()
+
+    db = conectar_bd()
+    if not db:
+        return 1
+    try:
+        cursor = db.cursor()
+        asegurar_esquema(cursor)
+        cursor.close()
+        for modulo in args.logs:
+            n = ingerir(db, modulo, LOGGERS[modulo], args.bloque)
+            print(f"✓ {modulo}: {n} registros ingeridos")
+    except Exception as e:
+        print(f"❌ Error en la ingesta: {str(e)}")
+        return 1
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,230 @@
+"""
+log_analytics.py — Analítica incremental de seguridad sobre auth.jsonl
+Novacapital SAS
+
+Arquitectura:
+    AuthAnalytics   Agregador que sigue el log de autenticación desde una
+                    posición guardada y mantiene contadores por minuto
+                    (totales, por IP y por email) de login_exitoso y
+                    login_fallido, con ventana de retención acotada.
+                    Un hilo por proceso lo actualiza en segundo plano; las
+                    consultas solo leen el resumen.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from logger import FileLock, JSONLLogger, auth_logger
+
+
+class AuthAnalytics:
+    """
+    Contadores por minuto de intentos de login, actualizados de forma
+    incremental: cada update() procesa solo los registros escritos desde la
+    última posición (secuencia) guardada, que se persiste junto con los
+    contadores en logs/<log>.analytics.json para no re-escanear al reiniciar.
+
+    El estado es compartido por todos los workers: update() toma el
+    FileLock del archivo de estado, recarga lo que otro proceso haya
+    avanzado y lo reescribe de forma atómica, así cada registro se cuenta
+    una sola vez. start() lanza el hilo que llama a update() periódicamente.
+    """
+
+    EVENTOS = {'login_exitoso': 'exitosos', 'login_fallido': 'fallidos'}
+    LOTE = 5000
+
+    def __init__(self, logger: JSONLLogger, retencion_minutos: int = 24 * 60):
+        self.logger = logger
+        self.retencion_minutos = retencion_minutos
+        self.state_path = logger.filepath[:-len('.jsonl')] + '.analytics.json'
+        self.seq = 0
+        # minuto ('YYYY-MM-DDTHH:MM') -> contadores de ese minuto
+        self.buckets: Dict[str, Dict[str, Any]] = {}
+        self.flock = FileLock(self.state_path + '.lock')
+        self._lock = threading.Lock()          # contadores en memoria
+        self._update_lock = threading.Lock()   # un solo update() a la vez
+        self._start_lock = threading.Lock()
+        self._mtime: Optional[int] = None   # mtime del estado que hay en memoria
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._load()
+
+    # --- estado persistido ---
+
+    @staticmethod
+    def _bucket_vacio() -> Dict[str, Any]:
+        return {'exitosos': 0, 'fallidos': 0,
+                'ip_fallidos': Counter(), 'ip_exitosos': Counter(),
+                'email_fallidos': Counter(), 'email_exitosos': Counter()}
+
+    def _load(self) -> None:
+        """Carga el estado del disco si cambió desde la última lectura o escritura."""
+        try:
+            mtime = os.stat(self.state_path).st_mtime_ns
+            if mtime == self._mtime:
+                return
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        buckets = {}
+        for minuto, b in data.get('buckets', {}).items():
+            bucket = self._bucket_vacio()
+            for k, v in b.items():
+                bucket[k] = Counter(v) if isinstance(v, dict) else v
+            buckets[minuto] = bucket
+        self.seq, self.buckets, self._mtime = int(data.get('seq', 0)), buckets, mtime
+
+    def _save(self) -> None:
+        """Escritura atómica con un temporal propio del proceso (mismo directorio)."""
+        tmp = None
+        try:
+            fd, tmp = tempfile.mkstemp(prefix=os.path.basename(self.state_path) + '.',
+                                       suffix='.tmp', dir=os.path.dirname(self.state_path) or '.')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'seq': self.seq, 'buckets': self.buckets}, f, ensure_ascii=False)
+            os.chmod(tmp, 0o644)   # mkstemp lo crea 0600
+            os.replace(tmp, self.state_path)
+            self._mtime = os.stat(self.state_path).st_mtime_ns
+        except OSError:
+            if tmp and os.path.exists(tmp):
+                os.remove(tmp)
+
+    # --- actualización incremental ---
+
+    def update(self) -> int:
+        """Procesa los registros nuevos del log. Devuelve cuántos leyó."""
+        with self._update_lock, self.flock:
+            with self._lock:
+                self._load()   # otro worker pudo haber avanzado la posición
+                if self.seq > self.logger.total():
+                    self.seq, self.buckets = 0, {}   # la historia fue reemplazada
+            leidos = 0
+            lote: List[Dict[str, Any]] = []
+            for seq, e in self.logger.iter_from(self.seq):
+                lote.append(e)
+                if len(lote) >= self.LOTE:
+                    # Las consultas solo esperan lo que tarda un lote, no el escaneo
+                    self._aplicar(lote, seq + 1)
+                    leidos += len(lote)
+                    lote = []
+            if lote:
+                self._aplicar(lote, self.seq + len(lote))
+                leidos += len(lote)
+            if leidos:
+                with self._lock:
+                    self._purgar()
+                    self._save()
+            return leidos
+
+    def _aplicar(self, lote: List[Dict[str, Any]], seq: int) -> None:
+        with self._lock:
+            for e in lote:
+                campo = self.EVENTOS.get(e.get('event'))
+                if campo is None:
+                    continue
+                minuto = e.get('timestamp', '')[:16]
+                bucket = self.buckets.get(minuto)
+                if bucket is None:
+                    bucket = self.buckets[minuto] = self._bucket_vacio()
+                bucket[campo] += 1
+                if e.get('ip'):
+                    bucket[f'ip_{campo}'][e['ip']] += 1
+                if e.get('email'):
+                    bucket[f'email_{campo}'][e['email']] += 1
+            self.seq = seq
+
+    def start(self, intervalo: float = 30.0) -> None:
+        """Lanza (una vez por proceso) el hilo que actualiza cada `intervalo` segundos."""
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, args=(intervalo,),
+                                            name='auth-analytics', daemon=True)
+            self._thread.start()
+
+    def _run(self, intervalo: float) -> None:
+        while True:
+            try:
+                self.update()
+            except Exception:
+                pass   # el siguiente ciclo reintenta
+            time.sleep(intervalo)
+
+    def refresh(self) -> None:
+        """
+        Recarga lo que el hilo de cualquier worker haya guardado (sin leer el
+        log). Si este proceso está actualizando, lo que hay en memoria ya es
+        lo más reciente.
+        """
+        if self._update_lock.acquire(blocking=False):
+            try:
+                with self._lock:
+                    self._load()
+            finally:
+                self._update_lock.release()
+
+    def _purgar(self) -> None:
+        if not self.buckets:
+            return
+        ultimo = datetime.fromisoformat(max(self.buckets))
+        limite = (ultimo - timedelta(minutes=self.retencion_minutos)).isoformat(timespec='minutes')
+        for minuto in [m for m in self.buckets if m < limite]:
+            del self.buckets[minuto]
+
+    # --- consultas ---
+
+    def summary(self, minutos: int = 60, top: int = 10) -> Dict[str, Any]:
+        """
+        Resumen de la ventana de los últimos `minutos`: totales, tasa de
+        fallos por minuto y principales IPs/emails con logins fallidos.
+        """
+        desde = (datetime.now() - timedelta(minutes=minutos)).isoformat(timespec='minutes')
+        with self._lock:
+            ventana = sorted((m, b) for m, b in self.buckets.items() if m >= desde)
+            totales = Counter()
+            acumulado = {k: Counter() for k in ('ip_fallidos', 'ip_exitosos',
+                                                'email_fallidos', 'email_exitosos')}
+            por_minuto: List[Dict[str, Any]] = []
+            for minuto, b in ventana:
+                totales['exitosos'] += b['exitosos']
+                totales['fallidos'] += b['fallidos']
+                for k in acumulado:
+                    acumulado[k].update(b[k])
+                intentos = b['exitosos'] + b['fallidos']
+                por_minuto.append({
+                    'minuto': minuto,
+                    'exitosos': b['exitosos'],
+                    'fallidos': b['fallidos'],
+                    'tasa_fallo': round(b['fallidos'] / intentos, 4) if intentos else 0.0,
+                })
+
+        intentos = totales['exitosos'] + totales['fallidos']
+
+        def ranking(fallidos: Counter, exitosos: Counter, clave: str) -> List[Dict[str, Any]]:
+            return [{clave: k, 'fallidos': n, 'exitosos': exitosos.get(k, 0)}
+                    for k, n in fallidos.most_common(top)]
+
+        return {
+            'ventana_minutos': minutos,
+            'exitosos': totales['exitosos'],
+            'fallidos': totales['fallidos'],
+            'tasa_fallo': round(totales['fallidos'] / intentos, 4) if intentos else 0.0,
+            'por_minuto': por_minuto,
+            'top_ips': ranking(acumulado['ip_fallidos'], acumulado['ip_exitosos'], 'ip'),
+            'top_emails': ranking(acumulado['email_fallidos'], acumulado['email_exitosos'], 'email'),
+        }
+
+
+# ============================================================
+# INSTANCIA GLOBAL
+# ============================================================
+
+auth_analytics = AuthAnalytics(auth_logger)
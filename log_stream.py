@@ -0,0 +1,160 @@
+"""
+log_stream.py — Seguimiento en vivo de los logs JSONL
+Novacapital SAS
+
+Arquitectura:
+    Subscription    Cola de un visor conectado, con su filtro (tipo/evento) y
+                    la posición de cada log desde la que recibe
+    LogFollower     Un único hilo por proceso que sigue auth/loans/admin.jsonl
+                    (inotify si está disponible, si no sondeo) y reparte solo
+                    las líneas nuevas a todas las suscripciones; termina
+                    cuando se va el último visor
+"""
+
+import itertools
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from logger import JSONLLogger, auth_logger, loan_logger, admin_logger
+
+try:
+    import inotify_simple  # opcional: evita el sondeo periódico en Linux
+except ImportError:
+    inotify_simple = None
+
+
+class Subscription:
+    """Suscripción de un visor: recibe (tipo, secuencia, registro) que cumplen su filtro."""
+
+    def __init__(self, tipo: Optional[str] = None, event: Optional[str] = None,
+                 max_queue: int = 1000):
+        self.tipo = tipo
+        self.event = event
+        self.inicio: Dict[str, int] = {}   # primera secuencia de cada log que llega por la cola
+        self.queue: 'queue.Queue[tuple]' = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+
+    def matches(self, tipo: str, entry: Dict[str, Any]) -> bool:
+        if self.tipo and self.tipo != tipo:
+            return False
+        return not self.event or entry.get('event') == self.event
+
+    def get(self, timeout: float) -> Optional[tuple]:
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class LogFollower:
+    """
+    Sigue varios logs desde su posición actual y reparte las líneas nuevas.
+
+    Todos los visores comparten el mismo hilo y las mismas lecturas: cada
+    línea nueva se lee y decodifica una sola vez por proceso, sin importar
+    cuántos administradores tengan el visor abierto. Si la cola de un visor
+    lento se llena, sus mensajes se descartan (se cuentan en `dropped`).
+    """
+
+    def __init__(self, loggers: Dict[str, JSONLLogger], poll_interval: float = 1.0,
+                 max_replay: int = 1000):
+        self.loggers = loggers
+        self.poll_interval = poll_interval
+        self.max_replay = max_replay
+        self.subscriptions: set = set()
+        self.posiciones: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    # --- suscripciones ---
+
+    def subscribe(self, tipo: str = None, event: str = None) -> Subscription:
+        sub = Subscription(tipo, event)
+        with self._lock:
+            self.subscriptions.add(sub)
+            if self._thread is None:
+                self.posiciones = {nombre: lg.total() for nombre, lg in self.loggers.items()}
+                self._thread = threading.Thread(target=self._run, name='log-follower', daemon=True)
+                self._thread.start()
+            sub.inicio = dict(self.posiciones)
+        return sub
+
+    def replay(self, sub: Subscription, desde: Dict[str, int]) -> Iterator[Tuple[str, int, Dict[str, Any]]]:
+        """
+        Registros escritos entre `desde` (posiciones que el visor ya recibió,
+        p. ej. al reconectar con Last-Event-ID) y el inicio de su cola, hasta
+        `max_replay`: así una reconexión no pierde lo escrito mientras tanto.
+        """
+        def pendientes():
+            for nombre, hasta in sub.inicio.items():
+                if nombre not in desde:
+                    continue
+                for seq, entry in self.loggers[nombre].iter_from(desde[nombre]):
+                    if seq >= hasta:
+                        break
+                    if sub.matches(nombre, entry):
+                        yield nombre, seq, entry
+        return itertools.islice(pendientes(), self.max_replay)
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            self.subscriptions.discard(sub)
+
+    # --- seguimiento ---
+
+    def _publish(self, tipo: str, seq: int, entry: Dict[str, Any]) -> None:
+        # La posición avanza junto con la lista de suscriptores: quien se
+        # suscribe después recibe este registro por replay(), no por la cola
+        with self._lock:
+            self.posiciones[tipo] = seq + 1
+            subs = list(self.subscriptions)
+        for sub in subs:
+            if sub.matches(tipo, entry):
+                try:
+                    sub.queue.put_nowait((tipo, seq, entry))
+                except queue.Full:
+                    sub.dropped += 1
+
+    def poll(self) -> None:
+        """Lee lo escrito desde la última posición de cada log y lo reparte."""
+        for nombre, lg in self.loggers.items():
+            for seq, entry in lg.iter_from(self.posiciones.get(nombre, 0)):
+                self._publish(nombre, seq, entry)
+
+    def _run(self) -> None:
+        watcher = None
+        if inotify_simple is not None:
+            try:
+                watcher = inotify_simple.INotify()
+                flags = inotify_simple.flags
+                watcher.add_watch(JSONLLogger.LOG_DIR,
+                                  flags.MODIFY | flags.CREATE | flags.MOVED_TO)
+            except OSError:
+                watcher = None
+        try:
+            while True:
+                if watcher is not None:
+                    watcher.read(timeout=int(self.poll_interval * 1000))
+                else:
+                    time.sleep(self.poll_interval)
+                with self._lock:
+                    # Sin visores el hilo termina; el próximo subscribe() lo relanza
+                    if not self.subscriptions:
+                        self._thread = None
+                        return
+                try:
+                    self.poll()
+                except OSError:
+                    pass
+        finally:
+            if watcher is not None:
+                watcher.close()
+
+
+# ============================================================
+# INSTANCIA GLOBAL
+# ============================================================
+
+log_follower = LogFollower({'auth': auth_logger, 'loans': loan_logger, 'admin': admin_logger})
@@ -8,20 +8,89 @@ Arquitectura:
     AuthLogger      Subclase: eventos de autenticación  (logs/auth.jsonl)
     LoanLogger      Subclase: eventos de préstamos      (logs/loans.jsonl)
     AdminLogger     Subclase: acciones administrativas  (logs/admin.jsonl)
+    QueryLogger     Subclase: consultas SQL lentas y N+1 (logs/queries.jsonl)
+    LogIndex        Índice lateral (.idx) con offsets y listas por evento/usuario
+    FileLock        Bloqueo consultivo entre procesos (workers WSGI)
+    BackgroundWriter Escritor en segundo plano: cola acotada y escritura por lotes
+    LogArchive      Segmentos rotados y comprimidos + manifiesto por rango de fechas
+    merge_recent    Mezcla perezosa (k-way) de varios logs, más recientes primero
+    query_logs      Consulta paginada con cursor opaco y rango de fechas
 """
 
+import atexit
+import base64
+import bisect
+import contextlib
+import gzip
+import heapq
+import io
+import itertools
 import json
 import os
-from dataclasses import dataclass, field, asdict
+import operator
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field, fields
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import zstandard  # opcional: compresión zstd de segmentos
+except ImportError:
+    zstandard = None
+
+try:
+    import fcntl      # bloqueo entre procesos (no disponible en Windows)
+except ImportError:
+    fcntl = None
+
+try:
+    import msgpack    # opcional: codificación compacta de segmentos
+except ImportError:
+    msgpack = None
 
 
 # ============================================================
 # CLASES DE MODELO — orientadas a objetos
 # ============================================================
 
-@dataclass
+# Serialización compartida: un solo encoder JSON compacto y, por clase,
+# la lista de campos y un attrgetter precalculados (sin asdict()).
+_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+_SERIALIZADORES: Dict[type, Tuple[Tuple[str, ...], Any]] = {}
+
+# Campos con valores muy repetidos que se internan al leer
+_CAMPOS_INTERNADOS = ('event', 'ip', 'email', 'rol', 'resultado', 'razon',
+                      'accion', 'estado_anterior', 'estado_nuevo',
+                      'fingerprint', 'ruta', 'metodo')
+
+
+def _serializador(cls: type) -> Tuple[Tuple[str, ...], Any]:
+    ser = _SERIALIZADORES.get(cls)
+    if ser is None:
+        nombres = tuple(f.name for f in fields(cls))
+        ser = _SERIALIZADORES[cls] = (nombres, operator.attrgetter(*nombres))
+    return ser
+
+
+def decode_entry(raw) -> Dict[str, Any]:
+    """
+    Decodifica una línea JSONL e interna los textos repetidos (evento, email,
+    rol...), de modo que al cargar ventanas grandes de log se comparta una
+    sola copia de cada valor.
+    """
+    data = json.loads(raw)
+    for k in _CAMPOS_INTERNADOS:
+        v = data.get(k)
+        if v.__class__ is str:
+            data[k] = sys.intern(v)
+    return data
+
+
+@dataclass(slots=True)
 class LogEntry:
     """Clase base que representa un registro de log."""
     event: str
@@ -31,14 +100,15 @@ class LogEntry:
 
     def to_dict(self) -> Dict[str, Any]:
         """Serializa la entrada filtrando campos nulos."""
-        return {k: v for k, v in asdict(self).items() if v is not None}
+        nombres, valores = _serializador(type(self))
+        return {k: v for k, v in zip(nombres, valores(self)) if v is not None}
 
     def to_jsonl(self) -> str:
         """Devuelve una línea JSON lista para escribir en el archivo."""
-        return json.dumps(self.to_dict(), ensure_ascii=False)
+        return _ENCODER.encode(self.to_dict())
 
 
-@dataclass
+@dataclass(slots=True)
 class AuthEntry(LogEntry):
     """Registro de evento de autenticación."""
     email: Optional[str] = None
@@ -47,7 +117,7 @@ class AuthEntry(LogEntry):
     razon: Optional[str] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class LoanEntry(LogEntry):
     """Registro de evento relacionado con un préstamo."""
     prestamo_id: Optional[int] = None
@@ -58,7 +128,7 @@ class LoanEntry(LogEntry):
     cliente_id: Optional[int] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class AdminEntry(LogEntry):
     """Registro de acción administrativa."""
     accion: Optional[str] = None
@@ -66,6 +136,650 @@ class AdminEntry(LogEntry):
     detalle: Optional[str] = None
 
 
+@dataclass(slots=True)
+class QueryEntry(LogEntry):
+    """Registro de una consulta SQL lenta o repetida (N+1)."""
+    fingerprint: Optional[str] = None
+    duracion_ms: Optional[float] = None
+    filas: Optional[int] = None
+    repeticiones: Optional[int] = None
+    ruta: Optional[str] = None
+    metodo: Optional[str] = None
+
+
+# ============================================================
+# ÍNDICE LATERAL — offsets y listas de posiciones
+# ============================================================
+
+class FileLock:
+    """
+    Bloqueo consultivo entre procesos (flock) sobre '<archivo>.lock'.
+
+    Coordina a los workers WSGI que escriben el mismo log: el append, el
+    índice lateral y la rotación se hacen con el bloqueo tomado. Es
+    reentrante dentro del proceso; en plataformas sin fcntl no bloquea.
+    shared() toma el bloqueo en modo compartido para las lecturas.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+        self._depth = 0
+
+    def _acquire(self, modo: Optional[int]) -> 'FileLock':
+        if self._depth == 0 and fcntl is not None:
+            try:
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(self._fd, modo)
+            except OSError:
+                if self._fd is not None:
+                    os.close(self._fd)
+                self._fd = None
+        self._depth += 1
+        return self
+
+    def __enter__(self) -> 'FileLock':
+        return self._acquire(fcntl.LOCK_EX if fcntl else None)
+
+    @contextlib.contextmanager
+    def shared(self) -> Iterator['FileLock']:
+        """
+        Bloqueo compartido: varios lectores a la vez, excluye a quien
+        escribe o rota. Un `with lock` anidado no lo promueve a exclusivo.
+        """
+        self._acquire(fcntl.LOCK_SH if fcntl else None)
+        try:
+            yield self
+        finally:
+            self.__exit__()
+
+    def __exit__(self, *exc) -> None:
+        self._depth -= 1
+        if self._depth == 0 and self._fd is not None:
+            try:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            finally:
+                os.close(self._fd)
+                self._fd = None
+
+
+class LogIndex:
+    """
+    Índice lateral de un archivo JSONL, persistido en '<archivo>.idx'.
+
+    Por cada registro válido guarda su offset en bytes, y mantiene listas
+    de posiciones por evento y por user_id, más el conteo total. Así las
+    lecturas cuestan O(resultado) en lugar de O(archivo).
+
+    El .idx es a su vez un JSONL de la forma [offset, largo, event, user_id]
+    y puede reconstruirse por completo desde el archivo de log. Es
+    compartido por todos los procesos: solo se escribe con el FileLock
+    tomado y cada proceso lee incrementalmente lo que agregaron los demás.
+    """
+
+    def __init__(self, log_path: str, lock: FileLock = None):
+        self.log_path = log_path
+        self.path = log_path + '.idx'
+        self.lock = lock or FileLock(log_path + '.lock')
+        self.offsets: List[int] = []
+        self.by_event: Dict[str, List[int]] = {}
+        self.by_user: Dict[Any, List[int]] = {}
+        self.end = 0        # byte del JSONL hasta donde llega el índice
+        self.generation = 0 # aumenta cada vez que el índice se reinicia
+        self._idx_pos = 0   # bytes del .idx ya leídos
+        self._ino = None    # inodo del JSONL indexado (cambia al rotar)
+        self._loaded = False
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    # --- construcción ---
+
+    def _reset(self) -> None:
+        self.offsets = []
+        self.by_event = {}
+        self.by_user = {}
+        self.end = 0
+        self._idx_pos = 0
+        self.generation += 1
+
+    def _add(self, offset: int, length: int, event: Optional[str], user_id: Any) -> None:
+        pos = len(self.offsets)
+        self.offsets.append(offset)
+        if event is not None:
+            self.by_event.setdefault(event, []).append(pos)
+        if user_id is not None:
+            self.by_user.setdefault(user_id, []).append(pos)
+        self.end = offset + length
+
+    def _read_idx(self) -> bool:
+        """
+        Incorpora las filas del .idx escritas desde la última lectura.
+        Devuelve False si el .idx falta, está dañado o no es coherente.
+        """
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(self._idx_pos)
+                for raw in f:
+                    if not raw.endswith(b'\n'):
+                        break  # fila a medio escribir: se lee la próxima vez
+                    offset, length, event, user_id = json.loads(raw)
+                    if offset < self.end:
+                        return False  # filas repetidas o fuera de orden
+                    self._add(offset, length, event, user_id)
+                    self._idx_pos += len(raw)
+        except (OSError, ValueError, TypeError):
+            return False
+        return True
+
+    def _stat_log(self) -> Tuple[Optional[int], int]:
+        try:
+            st = os.stat(self.log_path)
+            return st.st_ino, st.st_size
+        except OSError:
+            return None, 0
+
+    def rebuild(self) -> None:
+        """Reconstruye el índice completo a partir del archivo JSONL."""
+        with self.lock:
+            self._reset()
+            self._ino, _ = self._stat_log()
+            rows = self._scan_from(0)
+            tmp = f'{self.path}.{os.getpid()}.tmp'
+            try:
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    f.write(''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in rows))
+                os.replace(tmp, self.path)
+                self._idx_pos = os.path.getsize(self.path)
+            except OSError:
+                pass
+            self._loaded = True
+
+    def _scan_from(self, start: int) -> List[list]:
+        """Indexa las líneas completas del JSONL a partir del byte `start`."""
+        if not os.path.exists(self.log_path):
+            return []
+        nuevas = []
+        with open(self.log_path, 'rb') as f:
+            f.seek(start)
+            offset = start
+            for raw in f:
+                if not raw.endswith(b'\n'):
+                    break  # línea aún en escritura
+                length = len(raw)
+                line = raw.strip()
+                if line:
+                    try:
+                        data = json.loads(line)
+                        nuevas.append([offset, length, data.get('event'), data.get('user_id')])
+                    except (json.JSONDecodeError, UnicodeDecodeError, AttributeError):
+                        pass
+                offset += length
+        for offset, length, event, user_id in nuevas:
+            self._add(offset, length, event, user_id)
+        return nuevas
+
+    def _persist(self, rows: List[list]) -> None:
+        if not rows:
+            return
+        data = ''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in rows).encode('utf-8')
+        try:
+            with open(self.path, 'ab') as f:
+                f.write(data)
+            self._idx_pos += len(data)
+        except OSError:
+            pass
+
+    # --- mantenimiento ---
+
+    def sync(self, persist: bool = False) -> None:
+        """
+        Deja el índice al día: incorpora lo que otros procesos agregaron al
+        .idx, indexa las líneas del JSONL que aún no están en el .idx y
+        recarga desde cero si el JSONL fue rotado o truncado.
+
+        Con persist=True (solo con el FileLock tomado, desde la escritura)
+        las líneas halladas al recorrer el JSONL se agregan al .idx.
+        """
+        ino, size = self._stat_log()
+        if self._loaded and ino == self._ino and size >= self.end:
+            if not self._read_idx():
+                self.rebuild()
+                return
+        else:
+            self._reset()
+            self._ino = ino
+            self._loaded = True
+            if not self._read_idx():
+                self.rebuild()
+                return
+        if size < self.end:
+            self.rebuild()
+        elif size > self.end:
+            rows = self._scan_from(self.end)
+            if persist:
+                self._persist(rows)
+
+    def record(self, offset: int, length: int, data: Dict[str, Any]) -> None:
+        """
+        Registra una línea recién escrita en `offset` (con el FileLock
+        tomado y tras sync(persist=True), por lo que offset == end).
+        """
+        if offset != self.end:
+            self.sync(persist=True)
+            return
+        row = [offset, length, data.get('event'), data.get('user_id')]
+        self._add(*row)
+        self._persist([row])
+
+    # --- consultas ---
+
+    def positions(self, event: str = None, user_id: int = None) -> List[int]:
+        """Posiciones (en orden de escritura) que cumplen los filtros."""
+        if event and user_id is not None:
+            a = self.by_event.get(event, [])
+            b = self.by_user.get(user_id, [])
+            if len(a) > len(b):
+                a, b = b, a
+            otras = set(b)
+            return [p for p in a if p in otras]
+        if event:
+            return self.by_event.get(event, [])
+        if user_id is not None:
+            return self.by_user.get(user_id, [])
+        return list(range(len(self.offsets)))
+
+
+# ============================================================
+# ARCHIVO HISTÓRICO — segmentos comprimidos + manifiesto
+# ============================================================
+
+def normalizar_ts(valor: Optional[str], fin: bool = False) -> Optional[str]:
+    """
+    Completa un timestamp parcial ('2026-03-25', '2026-03-25T23:10') para
+    compararlo como texto con los timestamps ISO de los registros.
+    Con fin=True completa hacia el final del día/minuto.
+    """
+    if not valor:
+        return None
+    valor = valor.strip().replace(' ', 'T')
+    completo = '0000-00-00T23:59:59' if fin else '0000-00-00T00:00:00'
+    if len(valor) < len(completo):
+        valor += completo[len(valor):]
+    return valor
+
+
+class LogArchive:
+    """
+    Historia rotada de un log: segmentos cerrados en logs/segments/ más un
+    manifiesto (logs/<nombre>.manifest.json) con el primer y último
+    timestamp y el número de registros de cada segmento. Las lecturas por
+    rango de fechas abren solo los segmentos que se solapan.
+
+    Al rotar, el archivo activo solo se mueve a segments/ y se registra sin
+    comprimir ('compression': 'none'), con el lock tomado. compress_pending()
+    lo comprime después, fuera de la petición: escribe el segmento nuevo,
+    cambia la entrada del manifiesto y recién entonces borra el original.
+    Si la compresión falla, el segmento sin comprimir sigue en el manifiesto
+    (legible) y se reintenta en la siguiente rotación.
+    """
+
+    SEGMENT_DIR = 'segments'
+
+    def __init__(self, log_path: str):
+        directorio, nombre = os.path.split(log_path)
+        self.base = nombre[:-len('.jsonl')] if nombre.endswith('.jsonl') else nombre
+        self.segment_dir = os.path.join(directorio, self.SEGMENT_DIR)
+        self.manifest_path = os.path.join(directorio, f'{self.base}.manifest.json')
+        # Instancias propias (su propio descriptor): el hilo de compresión no
+        # comparte la profundidad del FileLock del logger
+        self.lock = FileLock(log_path + '.lock')
+        self._compress_flock = FileLock(self.manifest_path + '.lock')
+        self._compress_lock = threading.Lock()
+        self._segments: List[Dict[str, Any]] = []
+        self._stat = None
+
+    # --- manifiesto ---
+
+    def segments(self) -> List[Dict[str, Any]]:
+        """Segmentos del más antiguo al más reciente (releído si cambió en disco)."""
+        try:
+            st = os.stat(self.manifest_path)
+        except OSError:
+            self._segments, self._stat = [], None
+            return self._segments
+        clave = (st.st_ino, st.st_mtime_ns)   # _save reemplaza el archivo: cambia el inodo
+        if clave != self._stat:
+            try:
+                with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                    self._segments = json.load(f).get('segments', [])
+                self._stat = clave
+            except (OSError, ValueError):
+                self._segments = []
+        return self._segments
+
+    def _save(self, segments: List[Dict[str, Any]]) -> None:
+        tmp = self.manifest_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'segments': segments}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.manifest_path)
+        st = os.stat(self.manifest_path)
+        self._segments, self._stat = segments, (st.st_ino, st.st_mtime_ns)
+
+    def total(self) -> int:
+        return sum(seg.get('count', 0) for seg in self.segments())
+
+    def overlapping(self, desde: str = None, hasta: str = None) -> List[Dict[str, Any]]:
+        """Segmentos (más recientes primero) cuyo rango se solapa con [desde, hasta]."""
+        return [
+            seg for seg in reversed(self.segments())
+            if not (desde and seg['last_ts'] < desde) and not (hasta and seg['first_ts'] > hasta)
+        ]
+
+    # --- segmentos ---
+
+    @staticmethod
+    def _stem(nombre: str) -> str:
+        """'auth.20260325-000000' para 'auth.20260325-000000.jsonl' o '.msgpack.zst'."""
+        for ext in ('.jsonl', '.msgpack'):
+            i = nombre.find(ext)
+            if i != -1:
+                return nombre[:i]
+        return nombre
+
+    def add(self, source: str, first_ts: str, last_ts: str, count: int) -> Dict[str, Any]:
+        """
+        Mueve `source` a segments/ como segmento sin comprimir y lo registra
+        en el manifiesto (con el lock del log tomado). Solo renombra: no lee
+        el archivo.
+        """
+        os.makedirs(self.segment_dir, exist_ok=True)
+        segmentos = self.segments()
+        usados = {self._stem(seg['file']) for seg in segmentos}
+        stamp = first_ts.replace('-', '').replace(':', '').replace('T', '-')
+        stem, n = f'{self.base}.{stamp}', 1
+        while stem in usados or os.path.exists(os.path.join(self.segment_dir, stem + '.jsonl')):
+            n += 1
+            stem = f'{self.base}.{stamp}-{n}'
+        destino = os.path.join(self.segment_dir, stem + '.jsonl')
+
+        os.replace(source, destino)   # los demás procesos abren un archivo activo nuevo
+        seg = {'file': stem + '.jsonl', 'first_ts': first_ts, 'last_ts': last_ts,
+               'count': count, 'compression': 'none', 'encoding': 'jsonl'}
+        try:
+            self._save(segmentos + [seg])
+        except OSError:
+            os.replace(destino, source)   # sin manifiesto el segmento no existiría
+            raise
+        return seg
+
+    def compress_pending(self, compression: str = 'gzip', encoding: str = 'jsonl') -> int:
+        """
+        Comprime los segmentos registrados sin comprimir (los de la última
+        rotación y los que quedaron de un intento fallido). Devuelve cuántos
+        comprimió. Un solo compresor por log a la vez, entre hilos y procesos.
+        """
+        hechos = 0
+        with self._compress_lock, self._compress_flock:
+            # Se relee el manifiesto en cada vuelta: una rotación ocurrida
+            # mientras se comprimía también queda cubierta
+            while True:
+                seg = next((s for s in self.segments() if s.get('compression') == 'none'), None)
+                if seg is None:
+                    return hechos
+                destino = None
+                try:
+                    nuevo, destino = self._compress(seg, compression, encoding)
+                    with self.lock:
+                        segmentos = self.segments()
+                        if seg not in segmentos:
+                            os.remove(destino)
+                            continue
+                        self._save([nuevo if s == seg else s for s in segmentos])
+                except Exception:
+                    # Disco lleno, error del compresor...: el original sigue
+                    # registrado y se reintenta en la próxima rotación
+                    if destino and os.path.exists(destino):
+                        os.remove(destino)
+                    return hechos
+                try:
+                    os.remove(os.path.join(self.segment_dir, seg['file']))
+                except OSError:
+                    pass
+                hechos += 1
+
+    def _compress(self, seg: Dict[str, Any], compression: str,
+                  encoding: str) -> Tuple[Dict[str, Any], str]:
+        """Escribe la versión comprimida de `seg`; devuelve la entrada nueva y su ruta."""
+        if compression == 'zstd' and zstandard is None:
+            compression = 'gzip'
+        if encoding == 'msgpack' and msgpack is None:
+            encoding = 'jsonl'
+        ext = ('.msgpack' if encoding == 'msgpack' else '.jsonl') + ('.zst' if compression == 'zstd' else '.gz')
+        nombre = self._stem(seg['file']) + ext
+        destino = os.path.join(self.segment_dir, nombre)
+        source = os.path.join(self.segment_dir, seg['file'])
+
+        if compression == 'zstd':
+            dst = zstandard.ZstdCompressor().stream_writer(open(destino, 'wb'), closefd=True)
+        else:
+            dst = gzip.open(destino, 'wb')
+        with open(source, 'rb') as src, dst:
+            if encoding == 'msgpack':
+                self._write_msgpack(src, dst)
+            else:
+                while True:
+                    bloque = src.read(1 << 20)
+                    if not bloque:
+                        break
+                    dst.write(bloque)
+        return dict(seg, file=nombre, compression=compression, encoding=encoding), destino
+
+    @staticmethod
+    def _entries(src) -> Iterator[Dict[str, Any]]:
+        for line in src:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    pass
+
+    def _write_msgpack(self, src, dst) -> None:
+        """Cabecera {'events': [...]} seguida de un objeto msgpack por registro."""
+        eventos: Dict[str, int] = {}
+        for e in self._entries(src):
+            eventos.setdefault(e.get('event'), len(eventos))
+        dst.write(msgpack.packb({'v': 1, 'events': list(eventos)}))
+        src.seek(0)
+        packer = msgpack.Packer()
+        for e in self._entries(src):
+            e['event'] = eventos[e.get('event')]
+            dst.write(packer.pack(e))
+
+    def _open(self, seg: Dict[str, Any]):
+        """
+        Abre el archivo de un segmento. Si era uno sin comprimir y el
+        compresor ya lo reemplazó, abre la versión comprimida del manifiesto.
+        """
+        if seg.get('compression') == 'none':
+            try:
+                return open(os.path.join(self.segment_dir, seg['file']), 'rb'), seg
+            except FileNotFoundError:
+                stem = self._stem(seg['file'])
+                seg = next((s for s in self.segments() if self._stem(s['file']) == stem
+                            and s.get('compression') != 'none'), None)
+                if seg is None:
+                    raise
+        ruta = os.path.join(self.segment_dir, seg['file'])
+        if seg.get('compression') == 'zstd':
+            if zstandard is None:
+                return None, seg
+            return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(ruta, 'rb'), closefd=True)), seg
+        return gzip.open(ruta, 'rb'), seg
+
+    def iter_segment(self, seg: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Recorre los registros de un segmento en orden de escritura."""
+        fh, seg = self._open(seg)
+        if fh is None:
+            return
+        with fh:
+            if seg.get('encoding') == 'msgpack':
+                if msgpack is None:
+                    return
+                unpacker = msgpack.Unpacker(fh, raw=False)
+                eventos = [sys.intern(ev) if isinstance(ev, str) else ev
+                           for ev in next(unpacker, {}).get('events', [])]
+                for e in unpacker:
+                    e['event'] = eventos[e['event']]
+                    for k in _CAMPOS_INTERNADOS[1:]:
+                        v = e.get(k)
+                        if v.__class__ is str:
+                            e[k] = sys.intern(v)
+                    yield e
+                return
+            for line in fh:
+                line = line.strip()
+                if line:
+                    try:
+                        yield decode_entry(line)
+                    except (json.JSONDecodeError, UnicodeDecodeError):
+                        pass
+
+    def read_segment(self, seg: Dict[str, Any]) -> List[Dict[str, Any]]:
+        try:
+            return list(self.iter_segment(seg))
+        except (OSError, EOFError):
+            return []
+
+    def tail(self, seg: Dict[str, Any], k: int = None, cumple: Callable[[Dict[str, Any]], bool] = None,
+             fin: int = None) -> List[Tuple[int, Dict[str, Any]]]:
+        """
+        Los últimos `k` registros del segmento que cumplen `cumple` (entre
+        los `fin` primeros), con su posición, más recientes primero. El
+        segmento se recorre en streaming y solo se retienen k registros.
+        """
+        ultimos: 'deque[Tuple[int, Dict[str, Any]]]' = deque(maxlen=k)
+        try:
+            for i, e in enumerate(self.iter_segment(seg)):
+                if fin is not None and i >= fin:
+                    break
+                if cumple is None or cumple(e):
+                    ultimos.append((i, e))
+        except (OSError, EOFError):
+            pass
+        ultimos.reverse()
+        return list(ultimos)
+
+
+# ============================================================
+# ESCRITOR EN SEGUNDO PLANO — cola acotada y lotes
+# ============================================================
+
+class BackgroundWriter:
+    """
+    Saca la escritura del log del hilo de la petición.
+
+    Las entradas van a una cola en memoria de tamaño máximo `max_queue` y un
+    hilo las escribe en lotes de hasta `batch_size` entradas o cada
+    `flush_interval` segundos, con una sola apertura del archivo por lote.
+
+    Política cuando la cola está llena (`overflow`):
+        'block'  el hilo que escribe espera a que haya espacio
+        'drop'   la entrada se descarta (se cuenta en 'dropped')
+        'spill'  el hilo que escribe vacía la cola a disco él mismo,
+                 junto con su entrada, sin perder registros
+    """
+
+    POLITICAS = ('block', 'drop', 'spill')
+
+    def __init__(self, logger: 'JSONLLogger', max_queue: int = 10000,
+                 batch_size: int = 500, flush_interval: float = 0.5,
+                 overflow: str = 'block'):
+        if overflow not in self.POLITICAS:
+            raise ValueError(f"Política de desborde inválida: {overflow}")
+        self.logger = logger
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.queue: 'queue.Queue[Dict[str, Any]]' = queue.Queue(maxsize=max_queue)
+        self.counters = {'queued': 0, 'flushed': 0, 'dropped': 0, 'spilled': 0}
+        self._counter_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'log-writer:{os.path.basename(logger.filepath)}',
+                                        daemon=True)
+        self._thread.start()
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._counter_lock:
+            self.counters[key] += n
+
+    def put(self, data: Dict[str, Any]) -> None:
+        """Encola una entrada ya serializada a dict."""
+        try:
+            self.queue.put_nowait(data)
+            self._count('queued')
+            return
+        except queue.Full:
+            pass
+        if self.overflow == 'drop':
+            self._count('dropped')
+        elif self.overflow == 'spill':
+            self._write(self._drain() + [data])
+            self._count('spilled')
+        else:
+            self.queue.put(data)
+            self._count('queued')
+
+    def _drain(self, limit: int = None) -> List[Dict[str, Any]]:
+        rows = []
+        while limit is None or len(rows) < limit:
+            try:
+                rows.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def _write(self, rows: List[Dict[str, Any]]) -> None:
+        if rows:
+            self.logger._append(rows)
+            self._count('flushed', len(rows))
+
+    def _run(self) -> None:
+        while not (self._stop.is_set() and self.queue.empty()):
+            try:
+                first = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and not self._stop.is_set():
+                restante = deadline - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=restante))
+                except queue.Empty:
+                    break
+            batch.extend(self._drain(self.batch_size - len(batch)))
+            self._write(batch)
+
+    def flush(self) -> None:
+        """Escribe de inmediato lo pendiente en la cola."""
+        self._write(self._drain())
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Detiene el hilo tras vaciar la cola (drenaje al apagar)."""
+        self._stop.set()
+        self._thread.join(timeout)
+        self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        with self._counter_lock:
+            stats = dict(self.counters)
+        stats['pending'] = self.queue.qsize()
+        return stats
+
+
 # ============================================================
 # CLASE DE PERSISTENCIA — lectura y escritura JSONL
 # ============================================================
@@ -74,58 +788,461 @@ class JSONLLogger:
     """
     Maneja la persistencia de registros LogEntry en archivos JSONL.
     Cada línea del archivo es un objeto JSON independiente.
+    Las lecturas se resuelven con el LogIndex lateral del archivo activo y,
+    para la historia rotada, con los segmentos del LogArchive.
     """
 
     LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs')
 
+    # Rotación: un segmento por día o al superar MAX_BYTES (0 = sin límite)
+    ROTATE_DAILY = True
+    MAX_BYTES = 64 * 1024 * 1024
+    COMPRESSION = 'gzip'   # 'gzip' | 'zstd' (requiere el paquete zstandard)
+    ENCODING = 'jsonl'     # segmentos: 'jsonl' | 'msgpack' (requiere el paquete msgpack)
+
     def __init__(self, filename: str):
         self.filepath = os.path.join(self.LOG_DIR, filename)
         os.makedirs(self.LOG_DIR, exist_ok=True)
+        self.flock = FileLock(self.filepath + '.lock')
+        self.index = LogIndex(self.filepath, self.flock)
+        self.archive = LogArchive(self.filepath)
+        self._lock = threading.Lock()
+        self._first_ts = None       # (generación del índice, timestamp de la 1a línea)
+        self._compresor: Optional[threading.Thread] = None
+        self.writer: Optional[BackgroundWriter] = None
 
     # --- escritura ---
 
     def write(self, entry: LogEntry) -> None:
         """Agrega una entrada al final del archivo JSONL (append)."""
+        data = entry.to_dict()
+        if self.writer is not None:
+            self.writer.put(data)
+        else:
+            self._append([data])
+
+    def _append(self, rows: List[Dict[str, Any]]) -> None:
+        """
+        Escribe un lote de registros con una sola llamada write().
+
+        Seguro entre procesos: el archivo se abre con O_APPEND y el lote se
+        escribe con el FileLock tomado, así las líneas de distintos workers
+        nunca se intercalan y el índice lateral queda en orden.
+        """
+        lines = [(_ENCODER.encode(data) + '\n').encode('utf-8') for data in rows]
+        data = b''.join(lines)
+        rotado = False
         try:
-            with open(self.filepath, 'a', encoding='utf-8') as f:
-                f.write(entry.to_jsonl() + '\n')
+            with self._lock, self.flock:
+                try:
+                    rotado = self._maybe_rotate(rows[0].get('timestamp', ''))
+                except OSError:
+                    pass  # se reintenta en la próxima escritura; el lote se escribe igual
+                self.index.sync(persist=True)
+                fd = os.open(self.filepath, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    offset = os.fstat(fd).st_size
+                    escrito = 0
+                    while escrito < len(data):
+                        escrito += os.write(fd, data[escrito:])
+                finally:
+                    os.close(fd)
+                for data_row, raw in zip(rows, lines):
+                    self.index.record(offset, len(raw), data_row)
+                    offset += len(raw)
         except OSError:
             pass  # No interrumpir la aplicación si el log falla
+        if rotado:
+            self._compress_background()
+
+    # --- rotación ---
+
+    def _line_ts(self, pos: int) -> str:
+        entries = self._read_positions([pos])
+        return entries[0].get('timestamp', '') if entries else ''
+
+    def _maybe_rotate(self, timestamp: str) -> bool:
+        """Rota el archivo activo si cambió el día o superó MAX_BYTES."""
+        self.index.sync(persist=True)
+        if not len(self.index):
+            return False
+        if self.MAX_BYTES and self.index.end >= self.MAX_BYTES:
+            self._rotate()
+            return True
+        if self.ROTATE_DAILY and timestamp:
+            if self._first_ts is None or self._first_ts[0] != self.index.generation:
+                self._first_ts = (self.index.generation, self._line_ts(0))
+            if self._first_ts[1][:10] != timestamp[:10]:
+                self._rotate()
+                return True
+        return False
+
+    def _rotate(self) -> None:
+        """
+        Cierra el archivo activo como segmento (con el lock tomado). Solo lo
+        renombra y lo registra en el manifiesto; la compresión corre después,
+        sin bloquear las escrituras.
+        """
+        count = len(self.index)
+        first_ts, last_ts = self._line_ts(0), self._line_ts(count - 1)
+        self.archive.add(self.filepath, first_ts, last_ts, count)
+        self.index.rebuild()
+
+    def _compress_background(self) -> None:
+        """Comprime los segmentos pendientes en un hilo (uno por logger)."""
+        with self._lock:
+            if self._compresor is not None and self._compresor.is_alive():
+                return
+            self._compresor = threading.Thread(
+                target=self.archive.compress_pending, args=(self.COMPRESSION, self.ENCODING),
+                name=f'log-compress:{os.path.basename(self.filepath)}', daemon=True)
+            self._compresor.start()
+
+    def rotate(self) -> None:
+        """
+        Fuerza la rotación del archivo activo (p. ej. desde una tarea
+        programada) y comprime lo pendiente en el mismo hilo.
+        """
+        with self._lock, self.flock:
+            self.index.sync()
+            if len(self.index):
+                self._rotate()
+        self.archive.compress_pending(self.COMPRESSION, self.ENCODING)
+
+    def start_background(self, **opciones) -> None:
+        """
+        Activa la escritura en segundo plano (ver BackgroundWriter para las
+        opciones). La cola se drena automáticamente al terminar el proceso.
+        """
+        if self.writer is None:
+            self.writer = BackgroundWriter(self, **opciones)
+            atexit.register(self.stop_background)
+
+    def stop_background(self) -> None:
+        """Drena la cola pendiente y vuelve a la escritura síncrona."""
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    def writer_stats(self) -> Dict[str, int]:
+        """Contadores del escritor: queued, flushed, dropped, spilled, pending."""
+        if self.writer is None:
+            return {}
+        return self.writer.stats()
 
     # --- lectura ---
 
     def read_all(self) -> List[Dict[str, Any]]:
-        """Lee todos los registros del archivo JSONL."""
-        if not os.path.exists(self.filepath):
-            return []
+        """Lee todos los registros (segmentos rotados + archivo activo)."""
         entries = []
+        for seg in self.archive.segments():
+            entries.extend(self.archive.read_segment(seg))
+        if not os.path.exists(self.filepath):
+            return entries
         with open(self.filepath, 'r', encoding='utf-8') as f:
             for line in f:
                 line = line.strip()
                 if line:
                     try:
-                        entries.append(json.loads(line))
+                        entries.append(decode_entry(line))
                     except json.JSONDecodeError:
                         pass
         return entries
 
+    def _read_positions(self, positions: List[int]) -> List[Dict[str, Any]]:
+        """Lee los registros en las posiciones indicadas del índice."""
+        if not positions:
+            return []
+        offsets = self.index.offsets
+        entries = []
+        with open(self.filepath, 'rb') as f:
+            siguiente = None
+            for pos in positions:
+                offset = offsets[pos]
+                if offset != siguiente:
+                    f.seek(offset)
+                line = f.readline()
+                siguiente = offset + len(line)
+                try:
+                    entries.append(decode_entry(line))
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    pass
+        return entries
+
     def read_last(self, n: int = 100) -> List[Dict[str, Any]]:
         """Devuelve los últimos N registros (más recientes primero)."""
-        all_entries = self.read_all()
-        return list(reversed(all_entries[-n:]))
+        with self._lock, self.flock.shared():
+            segmentos = self.archive.overlapping()
+            self.index.sync()
+            total = len(self.index)
+            positions = list(range(max(total - n, 0), total))
+            entries = list(reversed(self._read_positions(positions)))
+        for seg in segmentos:
+            if len(entries) >= n:
+                break
+            entries.extend(e for _, e in self.archive.tail(seg, n - len(entries)))
+        return entries
 
-    def read_filtered(self, event: str = None, user_id: int = None) -> List[Dict[str, Any]]:
-        """Filtra registros por tipo de evento y/o usuario."""
-        entries = self.read_all()
-        if event:
-            entries = [e for e in entries if e.get('event') == event]
-        if user_id is not None:
-            entries = [e for e in entries if e.get('user_id') == user_id]
-        return list(reversed(entries))
+    def read_filtered(self, event: str = None, user_id: int = None,
+                      desde: str = None, hasta: str = None,
+                      limite: int = None) -> List[Dict[str, Any]]:
+        """
+        Filtra registros por tipo de evento, usuario y/o rango de fechas
+        (más recientes primero). En el archivo activo el rango se ubica por
+        búsqueda binaria, solo se abren los segmentos rotados que se solapan
+        con [desde, hasta] y la lectura se detiene al llegar a `limite`.
+        """
+        desde, hasta = normalizar_ts(desde), normalizar_ts(hasta, fin=True)
+        return [e for _, e in self.iter_seq(event, user_id, desde, hasta, limite=limite)]
+
+    def _bisect_ts(self, ts: str, despues: bool = False) -> int:
+        """
+        Búsqueda binaria sobre los offsets del índice: primera posición del
+        archivo activo con timestamp >= ts (> ts si despues=True). Se apoya
+        en que los timestamps crecen en orden de escritura.
+        """
+        lo, hi = 0, len(self.index)
+        with open(self.filepath, 'rb') as f:
+            while lo < hi:
+                mid = (lo + hi) // 2
+                f.seek(self.index.offsets[mid])
+                try:
+                    actual = json.loads(f.readline()).get('timestamp', '')
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    actual = ''
+                if actual < ts or (despues and actual == ts):
+                    lo = mid + 1
+                else:
+                    hi = mid
+        return lo
+
+    def iter_seq(self, event: str = None, user_id: int = None,
+                 desde: str = None, hasta: str = None,
+                 antes_seq: int = None, filtros: Dict[str, Any] = None,
+                 limite: int = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Recorre (secuencia, registro) del más reciente al más antiguo.
+
+        La secuencia es la posición absoluta del registro en toda la
+        historia (segmentos + activo) y no cambia al rotar, por lo que
+        sirve de cursor estable. En el archivo activo los límites del rango
+        de fechas se ubican por búsqueda binaria y el cursor se resuelve
+        con los offsets del índice, sin recorrer el archivo. `filtros`
+        compara otros campos por igualdad; con `limite` se detiene al
+        llegar a N y de cada segmento retiene a lo sumo N registros.
+        """
+        filtros = filtros or {}
+        # Manifiesto e índice en una sola foto: la rotación los cambia con
+        # el bloqueo exclusivo, así la secuencia base + posición es coherente
+        with self._lock, self.flock.shared():
+            segmentos = self.archive.segments()
+            base = sum(seg.get('count', 0) for seg in segmentos)
+            self.index.sync()
+            if len(self.index):
+                lo = self._bisect_ts(desde) if desde else 0
+                hi = self._bisect_ts(hasta, despues=True) if hasta else len(self.index)
+            else:
+                lo = hi = 0
+            if antes_seq is not None:
+                hi = min(hi, antes_seq - base)
+            hi = max(hi, lo)
+            # Sin filtros extra, más allá de `limite` posiciones no se lee nada
+            tope = limite if limite is not None and not filtros else None
+            if event or user_id is not None:
+                candidatas = self.index.positions(event, user_id)
+                i, j = bisect.bisect_left(candidatas, lo), bisect.bisect_left(candidatas, hi)
+                if tope is not None:
+                    i = max(i, j - tope)
+                positions = candidatas[i:j][::-1]
+            else:
+                if tope is not None:
+                    lo = max(lo, hi - tope)
+                positions = range(hi - 1, lo - 1, -1)
+            # Los offsets solo crecen al final: la referencia vale fuera del candado
+            offsets = self.index.offsets
+            # Abierto dentro de la foto: una rotación posterior no cambia el archivo leído
+            f = open(self.filepath, 'rb') if positions else None
+
+        def cumple(e: Dict[str, Any]) -> bool:
+            ts = e.get('timestamp', '')
+            if (desde and ts < desde) or (hasta and ts > hasta):
+                return False
+            if event and e.get('event') != event:
+                return False
+            if user_id is not None and e.get('user_id') != user_id:
+                return False
+            return all(e.get(k) == v for k, v in filtros.items())
+
+        emitidos = 0
+        if f is not None:
+            with f:
+                for pos in positions:
+                    if limite is not None and emitidos >= limite:
+                        return
+                    f.seek(offsets[pos])
+                    try:
+                        e = decode_entry(f.readline())
+                    except (json.JSONDecodeError, UnicodeDecodeError):
+                        continue
+                    if all(e.get(k) == v for k, v in filtros.items()):
+                        emitidos += 1
+                        yield base + pos, e
+
+        fin = base
+        for seg in reversed(segmentos):
+            if limite is not None and emitidos >= limite:
+                return
+            inicio = fin - seg.get('count', 0)
+            solapa = not (desde and seg['last_ts'] < desde) and not (hasta and seg['first_ts'] > hasta)
+            if solapa and (antes_seq is None or inicio < antes_seq):
+                corte = None if antes_seq is None or antes_seq >= fin else antes_seq - inicio
+                k = None if limite is None else limite - emitidos
+                for i, e in self.archive.tail(seg, k, cumple, corte):
+                    emitidos += 1
+                    yield inicio + i, e
+            fin = inicio
+
+    def iter_from(self, seq: int = 0) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Recorre (secuencia, registro) en orden de escritura a partir de la
+        secuencia `seq`: salta los segmentos ya vistos según el manifiesto y
+        en el archivo activo arranca directo en el offset del índice. Sirve
+        para consumidores incrementales que guardan su posición.
+        """
+        with self._lock, self.flock.shared():
+            segmentos = self.archive.segments()
+            inicio = sum(seg.get('count', 0) for seg in segmentos)
+            self.index.sync()
+            desde = max(seq - inicio, 0)
+            total = len(self.index)
+            offset = self.index.offsets[desde] if desde < total else None
+            f = open(self.filepath, 'rb') if offset is not None else None
+
+        try:
+            fin = 0
+            for seg in segmentos:
+                primero, fin = fin, fin + seg.get('count', 0)
+                if fin > seq:
+                    try:
+                        for i, e in enumerate(self.archive.iter_segment(seg)):
+                            if primero + i >= seq:
+                                yield primero + i, e
+                    except (OSError, EOFError):
+                        pass
+            if f is None:
+                return
+            f.seek(offset)
+            pos = desde
+            for raw in f:
+                if pos >= total or not raw.endswith(b'\n'):
+                    break
+                if raw.strip():
+                    try:
+                        e = decode_entry(raw)
+                    except (json.JSONDecodeError, UnicodeDecodeError):
+                        continue
+                    yield inicio + pos, e
+                    pos += 1
+        finally:
+            if f is not None:
+                f.close()
+
+    def export_jsonl(self) -> Iterator[str]:
+        """
+        Exporta toda la historia (segmentos en cualquier codificación +
+        archivo activo) como líneas JSONL, en orden de escritura.
+        """
+        for seg in self.archive.segments():
+            for e in self.archive.iter_segment(seg):
+                yield _ENCODER.encode(e) + '\n'
+        if os.path.exists(self.filepath):
+            with open(self.filepath, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.endswith('\n') and line.strip():
+                        yield line
 
     def total(self) -> int:
-        """Cuenta el número total de registros."""
-        return len(self.read_all())
+        """Cuenta el número total de registros (activos + rotados)."""
+        with self._lock, self.flock.shared():
+            self.index.sync()
+            return len(self.index) + self.archive.total()
+
+    def rebuild_index(self) -> None:
+        """Reconstruye el índice lateral desde el JSONL (si se perdió o dañó)."""
+        with self._lock, self.flock:
+            self.index.rebuild()
+
+
+# ============================================================
+# LECTURA COMBINADA — mezcla k-way por timestamp
+# ============================================================
+
+def merge_recent(loggers: Dict[str, JSONLLogger], n: int = 200,
+                 cursor: str = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Devuelve los N registros más recientes de varios logs a la vez.
+
+    Cada log se recorre perezosamente del más nuevo al más viejo y los
+    flujos se mezclan con un heap por (timestamp, secuencia), deteniéndose
+    en N. La paginación usa el cursor opaco de query_logs (la secuencia del
+    último registro mostrado de cada log) y no el timestamp, que tiene
+    resolución de segundos: los registros que comparten segundo con el
+    último de la página aparecen en la siguiente.
+    """
+    return query_logs(loggers, cursor=cursor, limite=n)
+
+
+def encode_cursor(posiciones: Dict[str, int]) -> str:
+    """Cursor opaco (base64 URL-safe) a partir de las secuencias por log."""
+    raw = json.dumps(posiciones, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: Optional[str]) -> Dict[str, int]:
+    """Inverso de encode_cursor; un cursor inválido equivale a empezar de nuevo."""
+    if not cursor:
+        return {}
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        data = json.loads(raw)
+        return {str(k): int(v) for k, v in data.items()}
+    except (ValueError, TypeError, AttributeError):
+        return {}
+
+
+def query_logs(loggers: Dict[str, JSONLLogger], filtros: Dict[str, Any] = None,
+               desde: str = None, hasta: str = None, cursor: str = None,
+               limite: int = 100) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Consulta paginada sobre uno o varios logs, más recientes primero.
+
+    `filtros` admite event, user_id, ip, email y prestamo_id. Devuelve la
+    página (cada registro con su origen en 'log') y el cursor opaco de la
+    siguiente página, o None si no hay más resultados.
+    """
+    filtros = {k: v for k, v in (filtros or {}).items() if v not in (None, '')}
+    desde, hasta = normalizar_ts(desde), normalizar_ts(hasta, fin=True)
+    posiciones = decode_cursor(cursor)
+    event = filtros.pop('event', None)
+    user_id = filtros.pop('user_id', None)
+
+    def flujo(nombre: str, lg: JSONLLogger) -> Iterator[Tuple[str, int, Dict[str, Any]]]:
+        # Ningún log aporta más de limite + 1 filas a la página
+        for seq, e in lg.iter_seq(event, user_id, desde, hasta, posiciones.get(nombre),
+                                  filtros, limite + 1):
+            yield e.get('timestamp', ''), seq, nombre, e
+
+    flujos = [flujo(nombre, lg) for nombre, lg in loggers.items()]
+    mezcla = heapq.merge(*flujos, key=lambda t: (t[0], t[1]), reverse=True)
+    pagina = list(itertools.islice(mezcla, limite + 1))
+
+    hay_mas = len(pagina) > limite
+    entradas = []
+    for _, seq, nombre, e in pagina[:limite]:
+        posiciones[nombre] = seq
+        entradas.append(dict(e, log=nombre))
+    # Los logs que no aportaron filas conservan su posición (o ninguna)
+    return entradas, encode_cursor(posiciones) if hay_mas else None
 
 
 # ============================================================
@@ -255,6 +1372,83 @@ class AdminLogger(JSONLLogger):
         )
         self.write(entry)
 
+    def log_asignacion_masiva(self, asesor_id: int, total: int, previos: Dict[int, int],
+                              admin_id: int, ip: str) -> None:
+        """Un solo registro para toda una reasignación masiva."""
+        origen = ', '.join(f'{n} de asesor {a}' if a else f'{n} sin asesor'
+                           for a, n in sorted(previos.items(), key=lambda x: x[0] or 0))
+        entry = AdminEntry(
+            event='asignacion_masiva',
+            user_id=admin_id,
+            ip=ip,
+            accion='asignacion_masiva',
+            objetivo_id=asesor_id,
+            detalle=f'{total} clientes asignados a asesor {asesor_id} ({origen})',
+        )
+        self.write(entry)
+
+    def log_difusion(self, difusion_id: int, enviados: int, total: Optional[int],
+                     segmento: Dict[str, str], estado: str, admin_id: int, ip: str) -> None:
+        filtro = ', '.join(f'{k}={v}' for k, v in sorted(segmento.items()) if v) or 'todos'
+        entry = AdminEntry(
+            event='difusion_notificaciones',
+            user_id=admin_id,
+            ip=ip,
+            accion='difusion_notificaciones',
+            objetivo_id=difusion_id,
+            detalle=f'Difusión {estado}: {enviados}/{total or 0} notificaciones ({filtro})',
+        )
+        self.write(entry)
+
+    def log_exportacion(self, entidad: str, formato: str, columnas: List[str],
+                        filtros: Dict[str, str], admin_id: int, ip: str) -> None:
+        """Extracto descargado: qué tabla, columnas y filtros (auditoría)."""
+        filtro = ', '.join(f'{k}={v}' for k, v in sorted(filtros.items())
+                           if v and k not in ('formato', 'columnas')) or 'sin filtros'
+        entry = AdminEntry(
+            event='exportacion',
+            user_id=admin_id,
+            ip=ip,
+            accion='exportacion',
+            detalle=f'{entidad}.{formato}: {", ".join(columnas)} ({filtro})',
+        )
+        self.write(entry)
+
+
+class QueryLogger(JSONLLogger):
+    """Logger para consultas SQL lentas o repetidas → logs/queries.jsonl"""
+
+    def __init__(self):
+        super().__init__('queries.jsonl')
+
+    def log_slow_query(self, fingerprint: str, duracion_ms: float, filas: int,
+                       ruta: str, metodo: str, user_id: int, ip: str) -> None:
+        entry = QueryEntry(
+            event='consulta_lenta',
+            user_id=user_id,
+            ip=ip,
+            fingerprint=fingerprint,
+            duracion_ms=round(duracion_ms, 2),
+            filas=filas,
+            ruta=ruta,
+            metodo=metodo,
+        )
+        self.write(entry)
+
+    def log_n_plus_one(self, fingerprint: str, repeticiones: int, duracion_ms: float,
+                       ruta: str, metodo: str, user_id: int, ip: str) -> None:
+        entry = QueryEntry(
+            event='posible_n_mas_1',
+            user_id=user_id,
+            ip=ip,
+            fingerprint=fingerprint,
+            repeticiones=repeticiones,
+            duracion_ms=round(duracion_ms, 2),
+            ruta=ruta,
+            metodo=metodo,
+        )
+        self.write(entry)
+
 
 # ============================================================
 # INSTANCIAS GLOBALES (singleton por módulo)
@@ -263,3 +1457,4 @@ class AdminLogger(JSONLLogger):
 auth_logger  = AuthLogger()
 loan_logger  = LoanLogger()
 admin_logger = AdminLogger()
+query_logger = QueryLogger()
@@ -0,0 +1,193 @@
+"""
+metricas.py — Métricas de la aplicación en formato de texto Prometheus
+Novacapital SAS
+
+Arquitectura:
+    Histograma      Buckets acumulados + suma + conteo por combinación de etiquetas
+    Metricas        Registro en memoria del proceso: latencia por endpoint,
+                    códigos de estado, peticiones en curso, tiempo de bcrypt
+                    y tiempo en BD; render() produce el texto para /metrics
+    init_app        Middleware Flask que alimenta el registro en cada petición
+
+Las métricas son por proceso: con varios workers cada uno expone las suyas
+y el scraper (o la agregación en Prometheus) las suma.
+"""
+
+import bisect
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Tuple
+
+from flask import g, request
+
+from sql_instrumentacion import estadisticas_actuales
+
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_BCRYPT = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0)
+BUCKETS_DB = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+Etiquetas = Tuple[Tuple[str, str], ...]
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _etiquetas(etiquetas: Etiquetas, extra: str = '') -> str:
+    partes = [f'{k}="{_escapar(v)}"' for k, v in etiquetas]
+    if extra:
+        partes.append(extra)
+    return '{' + ','.join(partes) + '}' if partes else ''
+
+
+def _numero(valor: float) -> str:
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Histograma:
+    """Histograma con etiquetas (buckets no acumulados internamente)."""
+
+    def __init__(self, nombre: str, ayuda: str, buckets: Iterable[float]):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.buckets = tuple(buckets)
+        # etiquetas -> [conteo por bucket..., +Inf], suma
+        self._series: Dict[Etiquetas, List] = {}
+
+    def observar(self, valor: float, etiquetas: Etiquetas = ()) -> None:
+        serie = self._series.get(etiquetas)
+        if serie is None:
+            serie = self._series[etiquetas] = [[0] * (len(self.buckets) + 1), 0.0]
+        serie[0][bisect.bisect_left(self.buckets, valor)] += 1
+        serie[1] += valor
+
+    def render(self) -> List[str]:
+        lineas = [f'# HELP {self.nombre} {self.ayuda}', f'# TYPE {self.nombre} histogram']
+        for etiquetas, (conteos, suma) in sorted(self._series.items()):
+            acumulado = 0
+            for limite, n in zip(self.buckets + (float('inf'),), conteos):
+                acumulado += n
+                le = 'le="%s"' % ('+Inf' if limite == float('inf') else repr(limite))
+                lineas.append(f'{self.nombre}_bucket{_etiquetas(etiquetas, le)} {acumulado}')
+            lineas.append(f'{self.nombre}_sum{_etiquetas(etiquetas)} {_numero(suma)}')
+            lineas.append(f'{self.nombre}_count{_etiquetas(etiquetas)} {acumulado}')
+        return lineas
+
+
+class Metricas:
+    """Registro de métricas del proceso."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencia = Histograma('http_request_duration_seconds',
+                                   'Latencia de las peticiones por endpoint', BUCKETS_LATENCIA)
+        self.tiempo_db = Histograma('http_request_db_seconds',
+                                    'Tiempo en la base de datos por petición', BUCKETS_DB)
+        self.bcrypt = Histograma('bcrypt_duration_seconds',
+                                 'Duración de las operaciones bcrypt', BUCKETS_BCRYPT)
+        self.respuestas: Dict[Etiquetas, int] = defaultdict(int)
+        self.consultas_db: Dict[Etiquetas, int] = defaultdict(int)
+        self.en_curso = 0
+        self.fuentes = []   # callables -> [(nombre, ayuda, tipo, etiquetas, valor)]
+
+    # --- registro ---
+
+    def inicio_peticion(self) -> None:
+        with self._lock:
+            self.en_curso += 1
+
+    def fin_peticion(self) -> None:
+        with self._lock:
+            self.en_curso -= 1
+
+    def observar_peticion(self, endpoint: str, metodo: str, estado: int,
+                          duracion: float, db_tiempo: float = None, db_consultas: int = 0) -> None:
+        ruta = (('endpoint', endpoint), ('method', metodo))
+        with self._lock:
+            self.latencia.observar(duracion, ruta)
+            self.respuestas[ruta + (('status', str(estado)),)] += 1
+            if db_tiempo is not None:
+                self.tiempo_db.observar(db_tiempo, (('endpoint', endpoint),))
+                self.consultas_db[(('endpoint', endpoint),)] += db_consultas
+
+    @contextmanager
+    def medir_bcrypt(self, operacion: str):
+        """Mide una llamada a bcrypt: with metricas.medir_bcrypt('checkpw'): ..."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.bcrypt.observar(time.perf_counter() - inicio, (('operation', operacion),))
+
+    def registrar_fuente(self, fuente) -> None:
+        """Agrega métricas calculadas al exportar (p. ej. estado del pool)."""
+        self.fuentes.append(fuente)
+
+    # --- exportación ---
+
+    def render(self) -> str:
+        with self._lock:
+            lineas = self.latencia.render()
+            lineas += ['# HELP http_requests_total Respuestas por endpoint, método y código',
+                       '# TYPE http_requests_total counter']
+            lineas += [f'http_requests_total{_etiquetas(e)} {n}'
+                       for e, n in sorted(self.respuestas.items())]
+            lineas += ['# HELP http_requests_in_flight Peticiones en curso',
+                       '# TYPE http_requests_in_flight gauge',
+                       f'http_requests_in_flight {self.en_curso}']
+            lineas += self.tiempo_db.render()
+            lineas += ['# HELP db_queries_total Consultas SQL por endpoint',
+                       '# TYPE db_queries_total counter']
+            lineas += [f'db_queries_total{_etiquetas(e)} {n}'
+                       for e, n in sorted(self.consultas_db.items())]
+            lineas += self.bcrypt.render()
+
+        for fuente in self.fuentes:
+            vistos = set()
+            for nombre, ayuda, tipo, etiquetas, valor in fuente():
+                if nombre not in vistos:
+                    vistos.add(nombre)
+                    lineas += [f'# HELP {nombre} {ayuda}', f'# TYPE {nombre} {tipo}']
+                lineas.append(f'{nombre}{_etiquetas(etiquetas)} {_numero(valor)}')
+        return '\n'.join(lineas) + '\n'
+
+
+# ============================================================
+# INTEGRACIÓN CON FLASK
+# ============================================================
+
+def init_app(app, metricas: 'Metricas') -> None:
+    """Mide cada petición: latencia, código de estado, en curso y tiempo en BD."""
+
+    @app.before_request
+    def _inicio_metricas():
+        g._metricas_inicio = time.perf_counter()
+        metricas.inicio_peticion()
+
+    @app.after_request
+    def _fin_metricas(response):
+        inicio = g.get('_metricas_inicio')
+        if inicio is not None:
+            stats = estadisticas_actuales()
+            metricas.observar_peticion(
+                request.endpoint or 'sin_ruta', request.method, response.status_code,
+                time.perf_counter() - inicio,
+                stats.tiempo if stats is not None else None,
+                stats.consultas if stats is not None else 0,
+            )
+        return response
+
+    @app.teardown_request
+    def _cerrar_metricas(exc):
+        if g.pop('_metricas_inicio', None) is not None:
+            metricas.fin_peticion()
+
+
+# ============================================================
+# INSTANCIA GLOBAL
+# ============================================================
+
+metricas = Metricas()
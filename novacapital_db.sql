@@ -58,7 +58,7 @@ DROP TABLE IF EXISTS `bitacora`;
 /*!50503 SET character_set_client = utf8mb4 */;
 CREATE TABLE `bitacora` (
   `id` int NOT NULL AUTO_INCREMENT,
-  `usuario_id` int NOT NULL,
+  `usuario_id` int DEFAULT NULL,
   `accion` varchar(100) NOT NULL,
   `modulo` varchar(50) DEFAULT NULL,
   `tabla_afectada` varchar(50) DEFAULT NULL,
@@ -66,8 +66,12 @@ CREATE TABLE `bitacora` (
   `descripcion` text,
   `ip_address` varchar(45) DEFAULT NULL,
   `fecha` timestamp NULL DEFAULT CURRENT_TIMESTAMP,
+  `log_seq` bigint DEFAULT NULL,
   PRIMARY KEY (`id`),
+  UNIQUE KEY `uk_bitacora_log` (`modulo`,`log_seq`),
   KEY `usuario_id` (`usuario_id`),
+  KEY `idx_bitacora_fecha` (`fecha`),
+  KEY `idx_bitacora_accion` (`accion`,`fecha`),
   CONSTRAINT `bitacora_ibfk_1` FOREIGN KEY (`usuario_id`) REFERENCES `usuarios` (`id`)
 ) ENGINE=InnoDB AUTO_INCREMENT=5 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 /*!40101 SET character_set_client = @saved_cs_client */;
@@ -78,7 +82,7 @@ CREATE TABLE `bitacora` (
 
 LOCK TABLES `bitacora` WRITE;
 /*!40000 ALTER TABLE `bitacora` DISABLE KEYS */;
-INSERT INTO `bitacora` VALUES (3,7,'INSERT',NULL,'prestamos',4,'Préstamo creado: PRE202600001',NULL,'2026-03-22 19:09:09'),(4,7,'INSERT',NULL,'prestamos',5,'Préstamo creado: PRE202600002',NULL,'2026-03-22 20:13:57');
+INSERT INTO `bitacora` VALUES (3,7,'INSERT',NULL,'prestamos',4,'Préstamo creado: PRE202600001',NULL,'2026-03-22 19:09:09',NULL),(4,7,'INSERT',NULL,'prestamos',5,'Préstamo creado: PRE202600002',NULL,'2026-03-22 20:13:57',NULL);
 /*!40000 ALTER TABLE `bitacora` ENABLE KEYS */;
 UNLOCK TABLES;
 
@@ -113,6 +117,37 @@ LOCK TABLES `campanas` WRITE;
 /*!40000 ALTER TABLE `campanas` ENABLE KEYS */;
 UNLOCK TABLES;
 
+--
+-- Table structure for table `checkpoints_batch`
+--
+
+DROP TABLE IF EXISTS `checkpoints_batch`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `checkpoints_batch` (
+  `proceso` varchar(50) NOT NULL,
+  `fecha_corte` date NOT NULL,
+  `ultimo_vencimiento` date DEFAULT NULL,
+  `ultimo_id` int DEFAULT NULL,
+  `bloques` int unsigned NOT NULL DEFAULT '0',
+  `filas_revisadas` int unsigned NOT NULL DEFAULT '0',
+  `filas_actualizadas` int unsigned NOT NULL DEFAULT '0',
+  `estado` enum('en_curso','completado') NOT NULL DEFAULT 'en_curso',
+  `inicio` timestamp NULL DEFAULT CURRENT_TIMESTAMP,
+  `actualizado` timestamp NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`proceso`,`fecha_corte`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Dumping data for table `checkpoints_batch`
+--
+
+LOCK TABLES `checkpoints_batch` WRITE;
+/*!40000 ALTER TABLE `checkpoints_batch` DISABLE KEYS */;
+/*!40000 ALTER TABLE `checkpoints_batch` ENABLE KEYS */;
+UNLOCK TABLES;
+
 --
 -- Table structure for table `clientes`
 --
@@ -137,12 +172,13 @@ CREATE TABLE `clientes` (
   `tipo_cliente` enum('empleado_publico','pensionado') NOT NULL,
   `entidad_empleadora` varchar(200) DEFAULT NULL,
   `salario_mensual` decimal(15,2) DEFAULT NULL,
-  `fecha_registro` timestamp NULL DEFAULT CURRENT_TIMESTAMP,
+  `fecha_registro` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
   `estado` enum('activo','inactivo','bloqueado') DEFAULT 'activo',
   PRIMARY KEY (`id`),
   UNIQUE KEY `numero_documento` (`numero_documento`),
   KEY `idx_clientes_documento` (`numero_documento`),
   KEY `idx_usuario_id` (`usuario_id`),
+  KEY `idx_clientes_registro` (`fecha_registro`,`id`),
   FULLTEXT KEY `idx_fulltext_clientes` (`nombres`,`apellidos`,`email`)
 ) ENGINE=InnoDB AUTO_INCREMENT=3 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 /*!40101 SET character_set_client = @saved_cs_client */;
@@ -189,6 +225,69 @@ INSERT INTO `configuracion_sistema` VALUES (1,'tasa_interes_base','1.9','number'
 /*!40000 ALTER TABLE `configuracion_sistema` ENABLE KEYS */;
 UNLOCK TABLES;
 
+--
+-- Table structure for table `difusiones`
+--
+
+DROP TABLE IF EXISTS `difusiones`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `difusiones` (
+  `id` int NOT NULL AUTO_INCREMENT,
+  `titulo` varchar(200) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL,
+  `mensaje` text CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL,
+  `tipo` enum('info','success','warning','error') CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci DEFAULT 'info',
+  `segmento` json NOT NULL,
+  `estado` enum('pendiente','en_curso','completada','error') CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL DEFAULT 'pendiente',
+  `total` int unsigned DEFAULT NULL,
+  `enviados` int unsigned NOT NULL DEFAULT '0',
+  `error` varchar(500) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci DEFAULT NULL,
+  `admin_id` int DEFAULT NULL,
+  `ip` varchar(45) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci DEFAULT NULL,
+  `trabajador` varchar(100) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci DEFAULT NULL,
+  `latido` timestamp NULL DEFAULT NULL,
+  `inicio` timestamp NULL DEFAULT CURRENT_TIMESTAMP,
+  `fin` timestamp NULL DEFAULT NULL,
+  PRIMARY KEY (`id`),
+  KEY `idx_estado_latido` (`estado`,`latido`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Dumping data for table `difusiones`
+--
+
+LOCK TABLES `difusiones` WRITE;
+/*!40000 ALTER TABLE `difusiones` DISABLE KEYS */;
+/*!40000 ALTER TABLE `difusiones` ENABLE KEYS */;
+UNLOCK TABLES;
+
+--
+-- Table structure for table `difusiones_destinatarios`
+--
+
+DROP TABLE IF EXISTS `difusiones_destinatarios`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `difusiones_destinatarios` (
+  `difusion_id` int NOT NULL,
+  `usuario_id` int NOT NULL,
+  `enviado` tinyint(1) NOT NULL DEFAULT '0',
+  PRIMARY KEY (`difusion_id`,`usuario_id`),
+  KEY `idx_difusion_enviado` (`difusion_id`,`enviado`,`usuario_id`),
+  CONSTRAINT `difusiones_destinatarios_ibfk_1` FOREIGN KEY (`difusion_id`) REFERENCES `difusiones` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Dumping data for table `difusiones_destinatarios`
+--
+
+LOCK TABLES `difusiones_destinatarios` WRITE;
+/*!40000 ALTER TABLE `difusiones_destinatarios` DISABLE KEYS */;
+/*!40000 ALTER TABLE `difusiones_destinatarios` ENABLE KEYS */;
+UNLOCK TABLES;
+
 --
 -- Table structure for table `documentos`
 --
@@ -343,7 +442,7 @@ CREATE TABLE `prestamos` (
   `tasa_interes` decimal(5,2) NOT NULL,
   `plazo_meses` int NOT NULL,
   `cuota_mensual` decimal(15,2) DEFAULT NULL,
-  `fecha_solicitud` timestamp NULL DEFAULT CURRENT_TIMESTAMP,
+  `fecha_solicitud` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
   `fecha_aprobacion` timestamp NULL DEFAULT NULL,
   `fecha_desembolso` timestamp NULL DEFAULT NULL,
   `estado` enum('solicitado','en_analisis','aprobado','rechazado','desembolsado','finalizado') NOT NULL,
@@ -356,6 +455,8 @@ CREATE TABLE `prestamos` (
   KEY `usuario_aprobador_id` (`usuario_aprobador_id`),
   KEY `idx_prestamos_cliente` (`cliente_id`),
   KEY `idx_prestamos_estado` (`estado`),
+  KEY `idx_prestamos_solicitud` (`fecha_solicitud`,`id`),
+  KEY `idx_prestamos_estado_solicitud` (`estado`,`fecha_solicitud`,`id`),
   FULLTEXT KEY `idx_fulltext_prestamos` (`numero_prestamo`,`observaciones`),
   CONSTRAINT `prestamos_ibfk_1` FOREIGN KEY (`cliente_id`) REFERENCES `clientes` (`id`),
   CONSTRAINT `prestamos_ibfk_2` FOREIGN KEY (`usuario_aprobador_id`) REFERENCES `usuarios` (`id`)
@@ -394,6 +495,30 @@ DELIMITER ;
 /*!50003 SET character_set_results = @saved_cs_results */ ;
 /*!50003 SET collation_connection  = @saved_col_connection */ ;
 
+--
+-- Table structure for table `secuencias_prestamo`
+--
+
+DROP TABLE IF EXISTS `secuencias_prestamo`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `secuencias_prestamo` (
+  `anio` smallint unsigned NOT NULL,
+  `ultimo` int unsigned NOT NULL DEFAULT '0',
+  PRIMARY KEY (`anio`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Dumping data for table `secuencias_prestamo`
+--
+
+LOCK TABLES `secuencias_prestamo` WRITE;
+/*!40000 ALTER TABLE `secuencias_prestamo` DISABLE KEYS */;
+INSERT INTO `secuencias_prestamo` VALUES (2026,2);
+/*!40000 ALTER TABLE `secuencias_prestamo` ENABLE KEYS */;
+UNLOCK TABLES;
+
 --
 -- Table structure for table `usuarios`
 --
@@ -100,6 +100,24 @@ def corregir_estructura_bd():
         else:
             print("✓ Columna usuario_id ya existe")
         
+        # Paginación por (fecha, id): las fechas de registro/solicitud no pueden ser NULL.
+        # Las que falten quedan como fecha desconocida, al final de los listados.
+        for tabla, columna, respaldo in (
+                ('clientes', 'fecha_registro', "'1970-01-02 00:00:00'"),
+                ('prestamos', 'fecha_solicitud',
+                 "COALESCE(fecha_aprobacion, fecha_desembolso, '1970-01-02 00:00:00')")):
+            cursor.execute(f"SHOW COLUMNS FROM {tabla} LIKE '{columna}'")
+            if cursor.fetchone()[2] == 'YES':
+                print(f"🔧 Haciendo {tabla}.{columna} NOT NULL...")
+                cursor.execute(f"UPDATE {tabla} SET {columna} = {respaldo} WHERE {columna} IS NULL")
+                cursor.execute(f"""
+                    ALTER TABLE {tabla}
+                    MODIFY {columna} timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP
+                """)
+                print(f"✓ {tabla}.{columna} corregido")
+            else:
+                print(f"✓ {tabla}.{columna} ya es NOT NULL")
+        
         db.commit()
         print("\n✅ Estructura corregida exitosamente\n")
         
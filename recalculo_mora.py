@@ -0,0 +1,232 @@
+"""
+Recálculo nocturno de mora en `pagos` - Novacapital
+Ejecutable desde cron en la ventana de mantenimiento: actualiza dias_mora y
+el estado (pendiente / mora / vencido) de las cuotas vencidas no pagadas.
+
+Recorre idx_pagos_fecha_vencimiento por rangos (fecha_vencimiento, id) de
+`--bloque` filas: cada rango es un único UPDATE por conjunto y su propia
+transacción, así que los bloqueos duran lo que tarda un bloque. El punto de
+control (último fecha_vencimiento, id) se guarda en la misma transacción que
+el bloque: si el job se corta, la siguiente ejecución con la misma fecha de
+corte continúa donde quedó sin repetir trabajo.
+
+Uso:
+    python recalculo_mora.py
+    python recalculo_mora.py --fecha 2026-10-17 --bloque 10000 --pausa 0.05
+"""
+
+import argparse
+import os
+import re
+import time
+from datetime import date, datetime
+
+import MySQLdb
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PROCESO = 'recalculo_mora'
+INICIO_RANGO = (date(1000, 1, 1), 0)
+
+SQL_CREAR_CHECKPOINT = """
+    CREATE TABLE IF NOT EXISTS checkpoints_batch (
+        proceso VARCHAR(50) NOT NULL,
+        fecha_corte DATE NOT NULL,
+        ultimo_vencimiento DATE DEFAULT NULL,
+        ultimo_id INT DEFAULT NULL,
+        bloques INT UNSIGNED NOT NULL DEFAULT 0,
+        filas_revisadas INT UNSIGNED NOT NULL DEFAULT 0,
+        filas_actualizadas INT UNSIGNED NOT NULL DEFAULT 0,
+        estado ENUM('en_curso','completado') NOT NULL DEFAULT 'en_curso',
+        inicio TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP,
+        actualizado TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        PRIMARY KEY (proceso, fecha_corte)
+    ) ENGINE=InnoDB
+"""
+
+# Posición (fecha_vencimiento, id) que cierra el siguiente bloque. Solo lee
+# el índice secundario (que ya incluye el id), sin tocar las filas.
+SQL_FIN_BLOQUE = """
+    SELECT fecha_vencimiento, id
+    FROM pagos FORCE INDEX (idx_pagos_fecha_vencimiento)
+    WHERE fecha_vencimiento < %s
+      AND (fecha_vencimiento > %s OR (fecha_vencimiento = %s AND id > %s))
+    ORDER BY fecha_vencimiento, id
+    LIMIT 1 OFFSET %s
+"""
+
+# dias_mora y estado de las cuotas no pagadas del rango. MySQL no reescribe
+# las filas que ya tienen esos valores: rowcount cuenta solo las modificadas
+# y las encontradas salen de connection.info() ("Rows matched: N ...").
+SQL_ACTUALIZAR = """
+    UPDATE pagos
+    SET dias_mora = DATEDIFF(%(corte)s, fecha_vencimiento),
+        estado = CASE
+            WHEN DATEDIFF(%(corte)s, fecha_vencimiento) > %(dias_vencido)s THEN 'vencido'
+            WHEN DATEDIFF(%(corte)s, fecha_vencimiento) > %(dias_gracia)s THEN 'mora'
+            ELSE 'pendiente'
+        END
+    WHERE (fecha_vencimiento > %(desde_fecha)s
+           OR (fecha_vencimiento = %(desde_fecha)s AND id > %(desde_id)s))
+      AND {hasta}
+      AND estado <> 'pagado'
+"""
+
+HASTA_BLOQUE = """(fecha_vencimiento < %(hasta_fecha)s
+           OR (fecha_vencimiento = %(hasta_fecha)s AND id <= %(hasta_id)s))"""
+HASTA_CORTE = "fecha_vencimiento < %(corte)s"
+
+_FILAS_ENCONTRADAS = re.compile(r'Rows matched: (\d+)')
+
+
+def conectar_bd():
+    """Conecta a la base de datos"""
+    try:
+        return MySQLdb.connect(
+            host=os.getenv('MYSQL_HOST', 'localhost'),
+            user=os.getenv('MYSQL_USER', 'novacapital'),
+            password=os.getenv('MYSQL_PASSWORD', 'Novacapital123$'),
+            db=os.getenv('MYSQL_DB', 'novacapital_db'),
+            charset='utf8mb4'
+        )
+    except Exception as e:
+        print(f"❌ Error al conectar: {str(e)}")
+        return None
+
+
+def dias_gracia(cursor, defecto=5):
+    """Días de gracia antes de marcar mora (configuracion_sistema.dias_gracia_mora)"""
+    cursor.execute("SELECT valor FROM configuracion_sistema WHERE clave = 'dias_gracia_mora'")
+    fila = cursor.fetchone()
+    try:
+        return int(float(fila[0])) if fila and fila[0] is not None else defecto
+    except ValueError:
+        return defecto
+
+
+def leer_checkpoint(cursor, corte):
+    """Estado guardado del recálculo para la fecha de corte (o None)"""
+    cursor.execute("""
+        SELECT ultimo_vencimiento, ultimo_id, bloques, filas_revisadas,
+               filas_actualizadas, estado
+        FROM checkpoints_batch
+        WHERE proceso = %s AND fecha_corte = %s
+    """, (PROCESO, corte))
+    return cursor.fetchone()
+
+
+def guardar_checkpoint(cursor, corte, posicion, revisadas, actualizadas, completado=False):
+    """Avanza el punto de control; va en la misma transacción que el bloque"""
+    cursor.execute("""
+        INSERT INTO checkpoints_batch
+        (proceso, fecha_corte, ultimo_vencimiento, ultimo_id, bloques,
+         filas_revisadas, filas_actualizadas, estado)
+        VALUES (%s, %s, %s, %s, 1, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            ultimo_vencimiento = VALUES(ultimo_vencimiento),
+            ultimo_id = VALUES(ultimo_id),
+            bloques = bloques + 1,
+            filas_revisadas = filas_revisadas + VALUES(filas_revisadas),
+            filas_actualizadas = filas_actualizadas + VALUES(filas_actualizadas),
+            estado = VALUES(estado)
+    """, (PROCESO, corte, posicion[0], posicion[1], revisadas, actualizadas,
+          'completado' if completado else 'en_curso'))
+
+
+def recalcular(db, corte, bloque=5000, dias_vencido=90, pausa=0.0, reiniciar=False):
+    """
+    Recalcula la mora de todas las cuotas vencidas antes de `corte`.
+    Devuelve el resumen: bloques, filas revisadas y filas actualizadas.
+    """
+    cursor = db.cursor()
+    # READ COMMITTED: el UPDATE por rango no toma bloqueos de hueco (gap locks)
+    cursor.execute("SET SESSION TRANSACTION ISOLATION LEVEL READ COMMITTED")
+    cursor.execute(SQL_CREAR_CHECKPOINT)
+    gracia = dias_gracia(cursor)
+
+    if reiniciar:
+        cursor.execute("DELETE FROM checkpoints_batch WHERE proceso = %s AND fecha_corte = %s",
+                       (PROCESO, corte))
+    db.commit()
+
+    previo = leer_checkpoint(cursor, corte)
+    if previo and previo[5] == 'completado':
+        print(f"✓ El recálculo del {corte} ya se completó ({previo[4]} filas actualizadas). "
+              f"Usa --reiniciar para repetirlo.")
+        cursor.close()
+        return {'bloques': 0, 'revisadas': 0, 'actualizadas': 0, 'reanudado': False}
+
+    posicion = (previo[0], previo[1]) if previo and previo[0] is not None else INICIO_RANGO
+    if previo:
+        print(f"↻ Reanudando desde vencimiento {posicion[0]}, id {posicion[1]}")
+
+    resumen = {'bloques': 0, 'revisadas': 0, 'actualizadas': 0, 'reanudado': bool(previo)}
+    params = {'corte': corte, 'dias_vencido': dias_vencido, 'dias_gracia': gracia}
+    while True:
+        cursor.execute(SQL_FIN_BLOQUE, (corte, posicion[0], posicion[0], posicion[1], bloque - 1))
+        fin = cursor.fetchone()
+        params.update(desde_fecha=posicion[0], desde_id=posicion[1])
+        if fin:
+            params.update(hasta_fecha=fin[0], hasta_id=fin[1])
+            cursor.execute(SQL_ACTUALIZAR.format(hasta=HASTA_BLOQUE), params)
+        else:
+            # Último bloque: del punto actual hasta la fecha de corte
+            cursor.execute(SQL_ACTUALIZAR.format(hasta=HASTA_CORTE), params)
+        actualizadas = cursor.rowcount
+        encontradas = _FILAS_ENCONTRADAS.search(db.info() or '')
+        revisadas = int(encontradas.group(1)) if encontradas else actualizadas
+        guardar_checkpoint(cursor, corte, fin or posicion, revisadas, actualizadas,
+                           completado=fin is None)
+        db.commit()
+
+        resumen['bloques'] += 1
+        resumen['revisadas'] += revisadas
+        resumen['actualizadas'] += actualizadas
+        if fin is None:
+            break
+        posicion = fin
+        if resumen['bloques'] % 20 == 0:
+            print(f"  · {resumen['bloques']} bloques, hasta {fin[0]}: "
+                  f"{resumen['actualizadas']} filas actualizadas")
+        if pausa:
+            time.sleep(pausa)
+
+    cursor.close()
+    return resumen
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Recálculo por lotes de la mora de las cuotas')
+    parser.add_argument('--fecha', help='fecha de corte YYYY-MM-DD (por defecto, hoy)')
+    parser.add_argument('--bloque', type=int, default=5000, help='filas por transacción')
+    parser.add_argument('--dias-vencido', type=int, default=90,
+                        help="días de atraso a partir de los cuales la cuota pasa a 'vencido'")
+    parser.add_argument('--pausa', type=float, default=0.0,
+                        help='segundos de espera entre bloques (respiro para la réplica)')
+    parser.add_argument('--reiniciar', action='store_true',
+                        help='ignora el punto de control de la fecha y empieza de nuevo')
+    args = parser.parse_args()
+
+    corte = datetime.strptime(args.fecha, '%Y-%m-%d').date() if args.fecha else date.today()
+
+    db = conectar_bd()
+    if not db:
+        return 1
+    try:
+        inicio = time.perf_counter()
+        resumen = recalcular(db, corte, args.bloque, args.dias_vencido, args.pausa, args.reiniciar)
+        print(f"✓ Corte {corte}: {resumen['bloques']} bloques, "
+              f"{resumen['revisadas']} cuotas impagas revisadas, {resumen['actualizadas']} actualizadas "
+              f"en {time.perf_counter() - inicio:.1f} s")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error en el recálculo: {str(e)}")
+        return 1
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
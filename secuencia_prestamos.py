@@ -0,0 +1,121 @@
+"""
+secuencia_prestamos.py — Numeración de préstamos por año
+Novacapital SAS
+
+Arquitectura:
+    Tabla `secuencias_prestamo` (anio PK, ultimo): un contador por año.
+    Cada número (o bloque de números) se obtiene con un único
+    INSERT ... ON DUPLICATE KEY UPDATE sobre la clave primaria, que bloquea
+    solo la fila del año hasta el commit. Dos solicitudes concurrentes nunca
+    reciben el mismo número y, si la transacción se deshace, el contador
+    también, así que no quedan huecos.
+
+La tabla forma parte de novacapital_db.sql. Para una base existente se crea
+y siembra fuera de las peticiones (la DDL confirma implícitamente la
+transacción en curso):
+    python secuencia_prestamos.py
+"""
+
+import os
+from datetime import datetime
+from typing import List
+
+import MySQLdb
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SQL_CREAR = """
+    CREATE TABLE IF NOT EXISTS secuencias_prestamo (
+        anio SMALLINT UNSIGNED NOT NULL,
+        ultimo INT UNSIGNED NOT NULL DEFAULT 0,
+        PRIMARY KEY (anio)
+    ) ENGINE=InnoDB
+"""
+
+# Parte del último número ya emitido en cada año (PREAAAANNNNN)
+SQL_SEMBRAR = """
+    INSERT INTO secuencias_prestamo (anio, ultimo)
+    SELECT CAST(SUBSTRING(numero_prestamo, 4, 4) AS UNSIGNED),
+           MAX(CAST(SUBSTRING(numero_prestamo, 8) AS UNSIGNED))
+    FROM prestamos
+    WHERE numero_prestamo REGEXP '^PRE[0-9]{9,}$'
+    GROUP BY 1
+    ON DUPLICATE KEY UPDATE ultimo = GREATEST(ultimo, VALUES(ultimo))
+"""
+
+# LAST_INSERT_ID(expr) deja el nuevo valor en cursor.lastrowid: un solo viaje
+SQL_AVANZAR = """
+    INSERT INTO secuencias_prestamo (anio, ultimo)
+    VALUES (%s, LAST_INSERT_ID(%s))
+    ON DUPLICATE KEY UPDATE ultimo = LAST_INSERT_ID(ultimo + %s)
+"""
+
+def formatear(anio: int, numero: int) -> str:
+    return f"PRE{anio}{numero:05d}"
+
+
+def reservar_bloque(cursor, cantidad: int, anio: int = None) -> List[str]:
+    """
+    Reserva `cantidad` números consecutivos del año en un solo viaje a la BD
+    (p. ej. para importaciones masivas). Deben usarse dentro de la misma
+    transacción: al hacer commit quedan consumidos, con rollback se liberan.
+    """
+    if cantidad < 1:
+        raise ValueError('La cantidad a reservar debe ser positiva')
+    anio = anio or datetime.now().year
+    cursor.execute(SQL_AVANZAR, (anio, cantidad, cantidad))
+    ultimo = cursor.lastrowid
+    return [formatear(anio, n) for n in range(ultimo - cantidad + 1, ultimo + 1)]
+
+
+def siguiente_numero(cursor, anio: int = None) -> str:
+    """Siguiente número de préstamo del año (p. ej. PRE202600003)."""
+    return reservar_bloque(cursor, 1, anio)[0]
+
+
+def conectar_bd():
+    """Conecta a la base de datos"""
+    try:
+        return MySQLdb.connect(
+            host=os.getenv('MYSQL_HOST', 'localhost'),
+            user=os.getenv('MYSQL_USER', 'novacapital'),
+            password=os.getenv('MYSQL_PASSWORD', 'Novacapital123$'),
+            db=os.getenv('MYSQL_DB', 'novacapital_db'),
+            charset='utf8mb4'
+        )
+    except Exception as e:
+        print(f"❌ Error al conectar: {str(e)}")
+        return None
+
+
+def migrar(db) -> None:
+    """Crea la tabla si falta y la siembra con los números ya emitidos (idempotente)."""
+    cursor = db.cursor()
+    cursor.execute(SQL_CREAR)
+    cursor.execute(SQL_SEMBRAR)
+    db.commit()
+    cursor.execute("SELECT anio, ultimo FROM secuencias_prestamo ORDER BY anio")
+    for anio, ultimo in cursor.fetchall():
+        print(f"  · {anio}: último número {formatear(anio, ultimo)}")
+    cursor.close()
+
+
+def main():
+    db = conectar_bd()
+    if not db:
+        return 1
+    try:
+        migrar(db)
+        print("✓ Tabla secuencias_prestamo lista")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error en la migración: {str(e)}")
+        return 1
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
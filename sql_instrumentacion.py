@@ -0,0 +1,187 @@
+"""
+sql_instrumentacion.py — Medición de las consultas SQL de cada petición
+Novacapital SAS
+
+Arquitectura:
+    fingerprint         Normaliza una sentencia (literales -> ?) para agrupar
+                        las ejecuciones de una misma consulta
+    EstadisticasPeticion Consultas, tiempo en BD y repeticiones por fingerprint
+                        de la petición en curso (vive en flask.g)
+    InstrumentedCursor  Envuelve un cursor MySQLdb y mide execute/executemany
+    InstrumentedConnection Envuelve la conexión para entregar cursores medidos
+    SQLInstrumentacion  Integración con Flask: cabeceras X-DB-Queries /
+                        X-DB-Time-Ms, log de consultas lentas y aviso de N+1
+"""
+
+import re
+import time
+from collections import Counter, defaultdict
+from functools import lru_cache
+from typing import Dict
+
+from flask import g, has_request_context, request, session
+
+from logger import query_logger
+
+_COMENTARIOS = re.compile(r'/\*.*?\*/|--[^\n]*', re.S)
+_CADENAS = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMEROS = re.compile(r'\b\d+(?:\.\d+)?\b')
+_MARCADORES = re.compile(r'%s|%\(\w+\)s')
+_LISTAS = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_VALUES = re.compile(r'(VALUES\s*\(\?\+?\))(?:\s*,\s*\(\?\+?\))+', re.I)
+_ESPACIOS = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(sql: str) -> str:
+    """
+    Forma canónica de la sentencia: sin comentarios, literales y marcadores
+    reemplazados por ?, listas IN (...) y VALUES multi-fila colapsadas y
+    espacios normalizados. Las sentencias de app.py son constantes, así que
+    la caché evita repetir las expresiones regulares.
+    """
+    fp = _COMENTARIOS.sub(' ', sql)
+    fp = _CADENAS.sub('?', fp)
+    fp = _MARCADORES.sub('?', fp)
+    fp = _NUMEROS.sub('?', fp)
+    fp = _ESPACIOS.sub(' ', fp).strip()
+    fp = _LISTAS.sub('(?+)', fp)
+    fp = _VALUES.sub(r'\1', fp)
+    return fp
+
+
+class EstadisticasPeticion:
+    """Acumulado de las consultas de una petición."""
+
+    __slots__ = ('consultas', 'tiempo', 'repeticiones', 'tiempo_por_fp')
+
+    def __init__(self):
+        self.consultas = 0
+        self.tiempo = 0.0                          # segundos en BD
+        self.repeticiones: Counter = Counter()     # fingerprint -> ejecuciones
+        self.tiempo_por_fp: Dict[str, float] = defaultdict(float)
+
+
+def estadisticas_actuales():
+    """Estadísticas de la petición en curso (None fuera de una petición)."""
+    return g.get('_sql_stats') if has_request_context() else None
+
+
+def _contexto():
+    """Ruta, método, usuario e IP de la petición para los registros."""
+    return (request.endpoint or request.path, request.method,
+            session.get('user_id'), request.remote_addr)
+
+
+class InstrumentedCursor:
+    """Cursor que mide cada ejecución y la suma a las estadísticas de la petición."""
+
+    def __init__(self, cursor, instrumentacion: 'SQLInstrumentacion'):
+        self._cursor = cursor
+        self._inst = instrumentacion
+
+    def _medir(self, metodo, sql, args):
+        inicio = time.perf_counter()
+        try:
+            return metodo(sql, args)
+        finally:
+            self._inst.registrar(sql, time.perf_counter() - inicio, self._cursor.rowcount)
+
+    def execute(self, sql, args=None):
+        return self._medir(self._cursor.execute, sql, args)
+
+    def executemany(self, sql, args):
+        return self._medir(self._cursor.executemany, sql, args)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+
+class InstrumentedConnection:
+    """Conexión cuyo cursor() devuelve cursores instrumentados."""
+
+    def __init__(self, conexion, instrumentacion: 'SQLInstrumentacion'):
+        self._conexion = conexion
+        self._inst = instrumentacion
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._conexion.cursor(*args, **kwargs), self._inst)
+
+    def __getattr__(self, nombre):
+        return getattr(self._conexion, nombre)
+
+
+class SQLInstrumentacion:
+    """
+    Instrumentación SQL por petición.
+
+    - Cada consulta suma su duración y fingerprint a las estadísticas de la
+      petición; la respuesta lleva X-DB-Queries y X-DB-Time-Ms.
+    - Las consultas que superan `lenta_ms` se escriben en logs/queries.jsonl.
+    - Si un mismo fingerprint se ejecuta `n_mas_1` veces o más en una sola
+      petición se registra un aviso de posible N+1.
+    """
+
+    def __init__(self, app=None, lenta_ms: float = 200.0, n_mas_1: int = 10):
+        self.lenta_ms = lenta_ms
+        self.n_mas_1 = n_mas_1
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        self.app = app
+        app.before_request(self._inicio)
+        app.after_request(self._fin)
+
+    def envolver(self, conexion) -> InstrumentedConnection:
+        return InstrumentedConnection(conexion, self)
+
+    # --- ciclo de la petición ---
+
+    def _inicio(self):
+        g._sql_stats = EstadisticasPeticion()
+
+    def _fin(self, response):
+        stats = g.get('_sql_stats')
+        if stats is None:
+            return response
+        response.headers['X-DB-Queries'] = str(stats.consultas)
+        response.headers['X-DB-Time-Ms'] = f'{stats.tiempo * 1000:.1f}'
+
+        repetidas = [(fp, n) for fp, n in stats.repeticiones.items() if n >= self.n_mas_1]
+        if repetidas:
+            ruta, metodo, user_id, ip = _contexto()
+            for fp, n in repetidas:
+                self.app.logger.warning('Posible N+1 en %s: %d ejecuciones de %s', ruta, n, fp)
+                query_logger.log_n_plus_one(fp, n, stats.tiempo_por_fp[fp] * 1000,
+                                            ruta, metodo, user_id, ip)
+        return response
+
+    # --- registro de cada consulta ---
+
+    def registrar(self, sql, duracion: float, filas: int) -> None:
+        if isinstance(sql, bytes):
+            sql = sql.decode('utf-8', 'replace')
+        fp = fingerprint(sql)
+        stats = estadisticas_actuales()
+        if stats is not None:
+            stats.consultas += 1
+            stats.tiempo += duracion
+            stats.repeticiones[fp] += 1
+            stats.tiempo_por_fp[fp] += duracion
+        if duracion * 1000 >= self.lenta_ms:
+            if has_request_context():
+                ruta, metodo, user_id, ip = _contexto()
+            else:
+                ruta, metodo, user_id, ip = None, None, None, None
+            query_logger.log_slow_query(fp, duracion * 1000, filas, ruta, metodo, user_id, ip)
@@ -0,0 +1,159 @@
+"""
+Pruebas del cronograma francés (amortizacion.py) y del cotizador (cotizador.py).
+
+Ejecutar con:
+    python -m pytest -q test_amortizacion.py
+"""
+
+from datetime import date
+
+import numpy as np
+import pytest
+
+from amortizacion import SQL_PENDIENTES, calcular_cronogramas, generar_pagos
+from cotizador import ParametrosPrestamo, cotizar, cuadricula, cuota_mensual
+
+PRESTAMOS = [
+    # (monto, tasa % mensual, plazo)
+    (1000000.0, 1.9, 12),
+    (15750000.0, 2.35, 72),
+    (50000000.0, 1.1, 60),
+    (3333333.0, 1.9, 7),
+    (1000001.0, 0.75, 36),
+]
+
+PARAMETROS = ParametrosPrestamo(tasa=1.9, monto_minimo=1000000, monto_maximo=50000000,
+                                plazo_minimo=6, plazo_maximo=72)
+
+
+def _cronogramas(prestamos=PRESTAMOS, fecha='2026-03-15'):
+    montos, tasas, plazos = zip(*prestamos)
+    return calcular_cronogramas(range(1, len(prestamos) + 1), montos, tasas, plazos,
+                                [fecha] * len(prestamos))
+
+
+def _centavos(valores) -> int:
+    return int(np.rint(np.asarray(valores) * 100).sum())
+
+
+@pytest.mark.parametrize('i', range(len(PRESTAMOS)))
+def test_capital_suma_exactamente_el_monto(i):
+    c = _cronogramas()
+    monto, _, plazo = PRESTAMOS[i]
+    assert _centavos(c.capital[i, :plazo]) == _centavos(monto)
+    assert c.saldo[i, plazo - 1] == 0.0
+    assert np.all(np.diff(c.saldo[i, :plazo]) < 0)
+
+
+@pytest.mark.parametrize('i', range(len(PRESTAMOS)))
+def test_ultima_cuota_liquida_el_saldo(i):
+    c = _cronogramas()
+    monto, tasa, plazo = PRESTAMOS[i]
+    # Todas las cuotas menos la última son la cuota fija
+    assert np.all(c.valor_cuota[i, :plazo - 1] == c.cuota[i])
+    # La última paga el saldo restante más su interés, a centavos de la fija
+    saldo_anterior = c.saldo[i, plazo - 2]
+    assert c.capital[i, plazo - 1] == saldo_anterior
+    assert c.interes[i, plazo - 1] == round(saldo_anterior * tasa / 100, 2)
+    assert c.valor_cuota[i, plazo - 1] == round(c.capital[i, plazo - 1] + c.interes[i, plazo - 1], 2)
+    assert abs(c.valor_cuota[i, plazo - 1] - c.cuota[i]) < 0.01 * plazo
+    # Cada cuota es capital + interés
+    assert np.allclose(c.valor_cuota[i, :plazo], c.capital[i, :plazo] + c.interes[i, :plazo])
+
+
+def test_periodos_fuera_del_plazo_en_cero():
+    c = _cronogramas()
+    filas = c.filas()
+    assert len(filas) == sum(p for _, _, p in PRESTAMOS)
+    for matriz in (c.valor_cuota, c.capital, c.interes, c.saldo):
+        assert np.all(matriz[~c.validos] == 0.0)
+
+
+def test_tasa_cero():
+    c = _cronogramas([(1000000.0, 0.0, 7)])
+    assert c.cuota[0] == round(1000000.0 / 7, 2)
+    assert np.all(c.interes[0] == 0.0)
+    assert _centavos(c.capital[0]) == _centavos(1000000.0)
+    assert c.saldo[0, -1] == 0.0
+    assert cuota_mensual(1000000.0, 7, 0.0) == c.cuota[0]
+
+
+@pytest.mark.parametrize('desembolso, esperados', [
+    ('2026-01-31', ['2026-02-28', '2026-03-31', '2026-04-30', '2026-05-31']),
+    ('2028-01-31', ['2028-02-29', '2028-03-31', '2028-04-30', '2028-05-31']),
+    ('2026-03-30', ['2026-04-30', '2026-05-30', '2026-06-30', '2026-07-30']),
+    ('2026-12-15', ['2027-01-15', '2027-02-15', '2027-03-15', '2027-04-15']),
+])
+def test_vencimientos_ajustan_fin_de_mes(desembolso, esperados):
+    c = _cronogramas([(1000000.0, 1.9, 4)], fecha=desembolso)
+    assert [str(d) for d in c.vencimiento[0]] == esperados
+
+
+@pytest.mark.parametrize('monto, tasa, plazo', PRESTAMOS + [(1000000.0, 0.0, 12)])
+def test_cuota_mensual_igual_al_cronograma(monto, tasa, plazo):
+    c = _cronogramas([(monto, tasa, plazo)])
+    assert cuota_mensual(monto, plazo, tasa) == c.cuota[0]
+
+
+def test_cotizar_y_cuadricula_coinciden_con_el_cronograma():
+    cotizacion = cotizar(15750000.0, 48, PARAMETROS, fecha=date(2026, 1, 31))
+    c = _cronogramas([(15750000.0, PARAMETROS.tasa, 48)], fecha='2026-01-31')
+    assert cotizacion['cuota'] == c.cuota[0] == cuota_mensual(15750000.0, 48, PARAMETROS.tasa)
+    assert cotizacion['ultima_cuota'] == c.valor_cuota[0, 47]
+    assert cotizacion['primer_vencimiento'] == '2026-02-28'
+    assert cotizacion['total_pagar'] == round(float(c.valor_cuota[0].sum()), 2)
+    assert _centavos([a['capital'] for a in cotizacion['resumen_anual']]) == _centavos(15750000.0)
+    assert cotizacion['resumen_anual'][-1]['saldo'] == 0.0
+
+    grilla = cuadricula([1000000.0, 15750000.0], PARAMETROS, plazos=(12, 48))
+    for i, monto in enumerate(grilla['montos']):
+        for j, plazo in enumerate(grilla['plazos']):
+            assert grilla['cuotas'][i][j] == cuota_mensual(monto, plazo, PARAMETROS.tasa)
+
+
+class CursorFalso:
+    """
+    Cursor en memoria para generar_pagos: SQL_PENDIENTES devuelve los
+    préstamos desembolsados sin cuotas en `pagos` (lo que hace el NOT EXISTS
+    de la consulta real) y executemany agrega las cuotas.
+    """
+
+    def __init__(self, prestamos):
+        self.prestamos = prestamos   # id -> (monto, tasa, plazo, fecha, estado)
+        self.pagos = []
+        self.consultas = []
+        self._resultado = []
+
+    def execute(self, query, params=()):
+        self.consultas.append(query)
+        assert query.startswith(SQL_PENDIENTES)
+        ids = set(params) if params else set(self.prestamos)
+        con_pagos = {p[0] for p in self.pagos}
+        self._resultado = [
+            (pid, monto, tasa, plazo, fecha)
+            for pid, (monto, tasa, plazo, fecha, estado) in sorted(self.prestamos.items())
+            if pid in ids and estado == 'desembolsado' and pid not in con_pagos
+        ]
+
+    def fetchall(self):
+        return self._resultado
+
+    def executemany(self, query, filas):
+        self.pagos.extend(filas)
+
+
+def test_generar_pagos_es_idempotente():
+    cursor = CursorFalso({
+        1: (1000000.0, 1.9, 12, date(2026, 1, 31), 'desembolsado'),
+        2: (5000000.0, 2.1, 24, date(2026, 2, 10), 'aprobado'),
+        3: (2000000.0, 1.5, 6, date(2026, 2, 28), 'desembolsado'),
+    })
+    assert generar_pagos(cursor, [1]) == 12
+    # El desembolso se vuelve a registrar: no se duplican cuotas
+    assert generar_pagos(cursor, [1]) == 0
+    assert generar_pagos(cursor, []) == 0
+    assert generar_pagos(cursor) == 6          # backfill: solo el préstamo 3
+    assert generar_pagos(cursor) == 0
+    assert len(cursor.pagos) == 18
+    assert len({(p[0], p[1]) for p in cursor.pagos}) == len(cursor.pagos)
+    assert all('NOT EXISTS' in q and q.rstrip().endswith('FOR UPDATE') for q in cursor.consultas)